@@ -6,7 +6,9 @@ import sys
 
 def main():
     """Run administrative tasks."""
-    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'mysite.settings')
+    # The tests run with the fast settings of mysite/test_settings.py.
+    default = 'mysite.test_settings' if sys.argv[1:2] == ['test'] else 'mysite.settings'
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', default)
     try:
         from django.core.management import execute_from_command_line
     except ImportError as exc:
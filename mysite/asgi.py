@@ -10,6 +10,12 @@ import os
 
 from django.core.asgi import get_asgi_application
 
+from polls.startup import preload
+
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'mysite.settings')
+# Serve the polls pages with the async views, set POLLS_ASYNC_VIEWS=false to use the sync views.
+os.environ.setdefault('POLLS_ASYNC_VIEWS', 'true')
 
 application = get_asgi_application()
+# Load the pages now, before `gunicorn --preload` fork the workers.
+preload()
@@ -0,0 +1,16 @@
+"""Mysite URL Configuration of the ASGI profile.
+
+Same as mysite/urls.py but the polls pages are served by the async views.
+"""
+from django.contrib import admin
+from django.urls import include, path
+
+from polls import views as polls_views
+from . import views
+
+urlpatterns = [
+    path('', views.index, name='main_index'),
+    path('admin/', admin.site.urls),
+    path('metrics', polls_views.metrics, name='metrics'),
+    path('polls/', include('polls.async_urls')),
+]
@@ -0,0 +1,20 @@
+"""Settings of the test suite, used by `manage.py test` unless DJANGO_SETTINGS_MODULE is set.
+
+They are the settings of mysite/settings.py with the slow parts that the tests do
+not need replaced by fast ones.
+"""
+from .settings import *  # noqa: F401,F403
+from .settings import DATABASES, LOGGING
+
+# The tests create and log in many users, a fast hash is enough for their passwords.
+PASSWORD_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
+
+DATABASES = {alias: dict(database) for alias, database in DATABASES.items()}
+if DATABASES['default']['ENGINE'] == 'django.db.backends.sqlite3':
+    # An empty test name make an in-memory database that every thread of the process share.
+    DATABASES['default']['TEST'] = {}
+
+# The records of the views are not written to views.log or the console.
+LOGGING = dict(LOGGING, handlers={
+    'polls': dict(LOGGING['handlers']['polls'], filename='', console=False),
+})
@@ -16,10 +16,12 @@ Including another URLconf
 from django.contrib import admin
 from django.urls import include, path
 
+from polls import views as polls_views
 from . import views
 
 urlpatterns = [
     path('', views.index, name='main_index'),
     path('admin/', admin.site.urls),
+    path('metrics', polls_views.metrics, name='metrics'),
     path('polls/', include('polls.urls')),
 ]
@@ -10,6 +10,10 @@ import os
 
 from django.core.wsgi import get_wsgi_application
 
+from polls.startup import preload
+
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'mysite.settings')
 
 application = get_wsgi_application()
+# Load the pages now, before `gunicorn --preload` fork the workers.
+preload()
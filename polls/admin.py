@@ -13,6 +13,7 @@ class ChoiceInline(admin.TabularInline):
 
     model = Choice
     extra = 3
+    readonly_fields = ('vote_count',)
 
 
 class QuestionAdmin(admin.ModelAdmin):
@@ -26,9 +27,21 @@ class QuestionAdmin(admin.ModelAdmin):
                               'classes': ['collapse']}),
     ]
     inlines = [ChoiceInline]
-    list_display = ('question_text', 'pub_date', 'end_date', 'is_published')
-    list_filter = ['pub_date', 'end_date']
+    list_display = ('question_text', 'pub_date', 'end_date', 'published')
+    list_filter = ['pub_date', 'end_date', 'archived']
     search_fields = ['question_text']
 
+    def get_queryset(self, request):
+        """Annotate the state of the questions so the list need no work per row."""
+        return super().get_queryset(request).with_status()
+
+    def published(self, obj):
+        """Return whether the question is already published."""
+        return obj.published
+
+    published.short_description = 'Published?'
+    published.boolean = True
+    published.admin_order_field = 'pub_date'
+
 
 admin.site.register(Question, QuestionAdmin)
@@ -9,3 +9,7 @@ from django.apps import AppConfig
 class PollsConfig(AppConfig):
     """To config the polls app."""
     name = 'polls'
+
+    def ready(self):
+        """Connect the signal receivers of the polls app."""
+        from . import signals  # noqa: F401
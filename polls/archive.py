@@ -0,0 +1,163 @@
+"""This script is use to archive the votes of the closed polls of the KU Polls web application.
+
+A closed question never change, so its votes can leave the vote table and its indexes.
+Archiving a question write its vote rows to a compressed file, keep the tally and the
+choice of every user in one `ArchivedResult` row and delete the vote rows. A vote on a
+question that was opened again restore its votes first.
+"""
+import array
+import bisect
+import gzip
+import itertools
+import os
+import struct
+import sys
+import zlib
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import ArchivedResult, Choice, Question, Vote
+from .objectcache import invalidate_poll
+from .transfer import export_records, write_records
+
+CHUNK_SIZE = 5000
+
+
+def pack_ballots(users, positions):
+    """Return the ballots of a question in a compact form.
+
+    Args:
+        users: array('I') of the user ids in increasing order, stored as the difference
+            with the previous id.
+        positions: array('H') of the position of the choice of each user in the totals.
+
+    Returns: the bytes of the count, the user differences and the positions as
+        little-endian integers, compressed with zlib.
+    """
+    if sys.byteorder == 'big':
+        users, positions = array.array('I', users), array.array('H', positions)
+        users.byteswap()
+        positions.byteswap()
+    return zlib.compress(struct.pack('<I', len(users)) + users.tobytes() + positions.tobytes())
+
+
+def unpack_ballots(data):
+    """Return the sorted user ids and the choice positions of packed ballots."""
+    data = zlib.decompress(data)
+    count, = struct.unpack_from('<I', data)
+    differences, positions = array.array('I'), array.array('H')
+    differences.frombytes(data[4:4 + 4 * count])
+    positions.frombytes(data[4 + 4 * count:])
+    if sys.byteorder == 'big':
+        differences.byteswap()
+        positions.byteswap()
+    return list(itertools.accumulate(differences)), positions
+
+
+def archived_choice(result, user_id):
+    """Return the id of the choice of the user in the archived result, or None if the user did not vote."""
+    users, positions = unpack_ballots(result.ballots)
+    index = bisect.bisect_left(users, user_id)
+    if index < len(users) and users[index] == user_id:
+        return result.totals[positions[index]][0]
+    return None
+
+
+def write_archive(question, directory):
+    """Write the question, its choices and its vote rows to a gzip JSON Lines file and return its path."""
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    path = directory / 'question-{}.jsonl.gz'.format(question.pk)
+    partial = path.with_name(path.name + '.partial')
+    with gzip.open(partial, 'wt', encoding='utf-8') as stream:
+        write_records(export_records(question, chunk_size=CHUNK_SIZE), stream, 'jsonl')
+    os.replace(partial, path)
+    return str(path)
+
+
+def archive_question(question, directory=None):
+    """Move the votes of a closed question out of the vote table.
+
+    The tally of the choices is counted again from the votes and frozen in the archived
+    result. The votes without a user or a choice are only kept in the file.
+
+    Args:
+        question: the closed question to archive.
+        directory: the directory of the archive files, `POLLS_ARCHIVE_DIR` if not given.
+            An empty string do not write the file.
+
+    Returns: the `ArchivedResult` of the question.
+
+    Raises:
+        ValueError: if the question is not closed or is already archived.
+    """
+    directory = settings.POLLS_ARCHIVE_DIR if directory is None else directory
+    with transaction.atomic():
+        question = Question.objects.select_for_update().get(pk=question.pk)
+        if question.archived:
+            raise ValueError('Question {} is already archived.'.format(question.pk))
+        if question.end_date >= timezone.now():
+            raise ValueError('Question {} is not closed yet.'.format(question.pk))
+        choice_ids = list(Choice.objects.filter(question=question).order_by('id').values_list('id', flat=True))
+        position_of = {choice_id: position for position, choice_id in enumerate(choice_ids)}
+        counts = [0] * len(choice_ids)
+        users, positions = array.array('I'), array.array('H')
+        previous = 0
+        for user_id, choice_id in (Vote.objects.filter(question=question, user__isnull=False, choice__isnull=False)
+                                   .order_by('user_id').values_list('user_id', 'choice_id')
+                                   .iterator(chunk_size=CHUNK_SIZE)):
+            users.append(user_id - previous)
+            positions.append(position_of[choice_id])
+            counts[position_of[choice_id]] += 1
+            previous = user_id
+        path = write_archive(question, directory) if directory else ''
+        totals = [[choice_id, count] for choice_id, count in zip(choice_ids, counts)]
+        result = ArchivedResult.objects.create(question=question, total_votes=len(users), totals=totals,
+                                               ballots=pack_ballots(users, positions), path=path)
+        # Delete without loading the rows, the tally must not be decremented by the signal.
+        table = connection.ops.quote_name(Vote._meta.db_table)
+        column = connection.ops.quote_name(Vote._meta.get_field('question').column)
+        with connection.cursor() as cursor:
+            cursor.execute('DELETE FROM {} WHERE {} = %s'.format(table, column), [question.pk])
+        Choice.objects.bulk_update([Choice(id=choice_id, vote_count=count)
+                                    for choice_id, count in zip(choice_ids, counts)], ['vote_count'])
+        Question.objects.filter(pk=question.pk).update(archived=True, modified=timezone.now())
+        invalidate_poll([question.pk])
+    return result
+
+
+def restore_question(question):
+    """Move the archived votes of the question back to the vote table.
+
+    The votes of the users and the choices deleted since the archive are dropped.
+
+    Args:
+        question: the archived question, its `archived` flag is cleared.
+    """
+    with transaction.atomic():
+        result = ArchivedResult.objects.select_for_update().filter(question_id=question.pk).first()
+        if result is not None:
+            users, positions = unpack_ballots(result.ballots)
+            choice_ids = [choice_id for choice_id, _ in result.totals]
+            existing = set(Choice.objects.filter(question_id=question.pk).values_list('id', flat=True))
+            counts = dict.fromkeys(existing, 0)
+            for start in range(0, len(users), CHUNK_SIZE):
+                chunk = users[start:start + CHUNK_SIZE]
+                valid = set(User.objects.filter(pk__in=chunk).values_list('pk', flat=True))
+                votes = []
+                for user_id, position in zip(chunk, positions[start:start + CHUNK_SIZE]):
+                    choice_id = choice_ids[position]
+                    if user_id in valid and choice_id in existing:
+                        votes.append(Vote(question_id=question.pk, user_id=user_id, choice_id=choice_id))
+                        counts[choice_id] += 1
+                Vote.objects.bulk_create(votes)
+            Choice.objects.bulk_update([Choice(id=choice_id, vote_count=count) for choice_id, count in counts.items()],
+                                       ['vote_count'])
+            result.delete()
+        Question.objects.filter(pk=question.pk).update(archived=False, modified=timezone.now())
+        invalidate_poll([question.pk])
+    question.archived = False
@@ -0,0 +1,18 @@
+"""This script is use to handle the url of the KU Polls web application with the async views."""
+from django.urls import path
+
+from . import async_views, views
+
+app_name = 'polls'
+urlpatterns = [
+    path('', async_views.index, name='index'),
+    path('<int:pk>/', async_views.detail, name='detail'),
+    path('<int:pk>/results/', async_views.results, name='results'),
+    path('<int:pk>/results.json', views.ResultsJsonView.as_view(), name='results_json'),
+    path('<int:pk>/results/live/', async_views.live_results, name='results_live'),
+    path('<int:question_id>/vote/', async_views.vote, name='vote'),
+
+    path('login/', views.login_page, name='login'),
+    path('logout/', views.logout_user, name='logout'),
+    path('register/', views.register_page, name='register')
+]
@@ -0,0 +1,146 @@
+"""This script is use to handle the async view page of the KU Polls web application.
+
+The async views are served instead of the views in views.py by the ASGI profile
+(see mysite/asgi.py). The database is read with the async queryset methods when
+Django has them and with `sync_to_async` otherwise, the template rendering and the
+vote transaction run in the thread of `sync_to_async`.
+"""
+import asyncio
+import functools
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib import messages
+from django.contrib.auth.views import redirect_to_login
+from django.db.models import QuerySet
+from django.http import Http404, HttpResponse, HttpResponseRedirect, StreamingHttpResponse
+from django.shortcuts import get_object_or_404, redirect, render, resolve_url
+from django.urls import reverse
+
+from .live import EVENT_STREAM, RETRY_MS, astream_events, format_event, get_broker
+from .models import Question
+from .objectcache import get_poll
+from .throttle import throttle
+from .views import DetailView, IndexView, ResultsView, event_stream_response, logger, record_vote
+
+# Django 4.1 and later can run the queries of a queryset without a thread.
+ASYNC_ORM = hasattr(QuerySet, 'aget')
+# Django 4.2 and later can stream an async iterator without blocking the event loop.
+ASYNC_STREAMING = hasattr(StreamingHttpResponse, 'is_async')
+
+
+async def aget_object_or_404(queryset, **kwargs):
+    """Return the object of the queryset that match the lookups, or raise Http404."""
+    if not ASYNC_ORM:
+        return await sync_to_async(get_object_or_404)(queryset, **kwargs)
+    try:
+        return await queryset.aget(**kwargs)
+    except queryset.model.DoesNotExist:
+        raise Http404('No {} matches the given query.'.format(queryset.model._meta.object_name))
+
+
+async def get_user(request):
+    """Return the user of the request, loading it from the session outside the event loop."""
+    if hasattr(request, 'auser'):
+        return await request.auser()
+    # Touching the lazy user load it, so request.user need no query afterward.
+    await sync_to_async(lambda: request.user.is_authenticated)()
+    return request.user
+
+
+def async_login_required(view):
+    """Redirect the anonymous users of the async view to the login page."""
+
+    @functools.wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        user = await get_user(request)
+        if not user.is_authenticated:
+            return redirect_to_login(request.get_full_path(), resolve_url('polls:login'))
+        return await view(request, *args, **kwargs)
+
+    return wrapper
+
+
+async def index(request):
+    """Async version of `IndexView`."""
+    view = IndexView()
+    view.setup(request)
+    await get_user(request)
+    view.object_list = view.get_queryset()
+    return await sync_to_async(view.respond)()
+
+
+@async_login_required
+async def detail(request, pk):
+    """Async version of `DetailView`."""
+    view = DetailView()
+    view.setup(request, pk=pk)
+    # The queryset read the user of the session.
+    queryset = await sync_to_async(view.get_queryset)()
+    view.object = await aget_object_or_404(queryset, pk=pk)
+    context = await sync_to_async(view.get_context_data)(object=view.object)
+    return await sync_to_async(render)(request, view.template_name, context)
+
+
+async def results(request, pk):
+    """Async version of `ResultsView`."""
+    view = ResultsView()
+    view.setup(request, pk=pk)
+    await get_user(request)
+    view.object = await aget_object_or_404(view.get_queryset(), pk=pk)
+    return await sync_to_async(view.respond)()
+
+
+@async_login_required
+async def vote(request, question_id: int):
+    """Async version of `vote`, the vote itself is saved in one transaction in a thread."""
+    limited = await sync_to_async(throttle)(request, 'vote')
+    if limited is not None:
+        return limited
+    try:
+        poll = await sync_to_async(get_poll)(question_id)
+    except Question.DoesNotExist:
+        raise Http404('No Question matches the given query.')
+    question = poll.question
+    if not question.can_vote():
+        messages.error(request, "Polls not published yet or does not exist")
+        logger.error("Vote: This %s tried to access invalid question", request.user.username,
+                     extra={'event': 'vote'})
+        return redirect('polls:index')
+    try:
+        select_choice = poll.choices[int(request.POST['choice'])]
+    except (KeyError, ValueError):
+        logger.exception("%s didn't select a choice.", request.user.username, extra={'event': 'vote'})
+        question = await aget_object_or_404(Question.objects.prefetch_related('choice_set'), pk=question_id)
+        return await sync_to_async(render)(request, 'polls/detail.html',
+                                           {'question': question, 'error_message': "You didn't select a choice."})
+    await sync_to_async(record_vote)(request, question, select_choice)
+    logger.info('Vote: This %s vote at question id:%s', request.user.username, question.id,
+                extra={'event': 'vote'})
+    return HttpResponseRedirect(reverse('polls:results', args=(question.id,)))
+
+
+async def live_results(request, pk):
+    """Async version of `live_results`, the viewers wait in the event loop instead of in threads.
+
+    Django before 4.2 iterate a stream inside the event loop, so there every response
+    carry the events of one window and the browser reconnect to get the next one.
+    """
+    await aget_object_or_404(Question.objects.all(), pk=pk)
+    broker = get_broker()
+    subscribe = sync_to_async(broker.subscribe)
+    keepalive = settings.POLLS_LIVE_KEEPALIVE
+    if ASYNC_STREAMING:
+        return event_stream_response(astream_events(subscribe, pk, keepalive, settings.POLLS_LIVE_MAX_DURATION))
+    subscription = await subscribe(pk, asyncio.get_running_loop())
+    try:
+        events = subscription.take()
+        # A browser that already have the snapshot wait for the next change.
+        if request.headers.get('Last-Event-ID') == str(events[-1]['id']):
+            events = await subscription.aget(keepalive)
+    finally:
+        subscription.close()
+    body = 'retry: {}\n\n'.format(RETRY_MS) + ''.join(map(format_event, events))
+    response = HttpResponse(body, content_type=EVENT_STREAM)
+    response['Cache-Control'] = 'no-cache'
+    return response
@@ -0,0 +1,39 @@
+"""This script is use to keep the logged in users in the cache of the KU Polls web application.
+
+Every request of a logged in user load the user from the id in its session. The
+backend keep the loaded user in the cache of the polls app for
+`POLLS_USER_CACHE_TIMEOUT` seconds, so only the first request of a user read the user
+table. The cached user is removed when the user is saved or deleted, a change made
+with `QuerySet.update()` is seen after the timeout. The groups and the permissions are
+not cached with the user. The session is still checked against the hash of the password
+of the cached user, so changing the password still log out the other sessions.
+"""
+from django.conf import settings
+from django.contrib.auth.backends import ModelBackend
+
+from .caching import get_cache
+
+USER_KEY = 'polls:user:{}'
+
+
+class CachedModelBackend(ModelBackend):
+    """`ModelBackend` that read the user of a session from the cache."""
+
+    def get_user(self, user_id):
+        """Return the active user of the id, from the cache when it is there."""
+        timeout = settings.POLLS_USER_CACHE_TIMEOUT
+        if not timeout:
+            return super().get_user(user_id)
+        cache = get_cache()
+        key = USER_KEY.format(user_id)
+        user = cache.get(key)
+        if user is None:
+            user = super().get_user(user_id)
+            if user is not None:
+                cache.set(key, user, timeout)
+        return user
+
+
+def forget_user(user_id):
+    """Remove the cached copy of the user, the next request load it again."""
+    get_cache().delete(USER_KEY.format(user_id))
@@ -0,0 +1,229 @@
+"""This script is use to generate data and measure the performance of the KU Polls web application.
+
+The helpers are shared by the benchmark management commands.
+"""
+import datetime
+import math
+import random
+import statistics
+import time
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.utils import timezone
+
+from .models import Choice, Question, Vote
+
+BENCH_PREFIX = 'bench'
+BENCH_USER_PREFIX = 'bench-user-'
+BENCH_PASSWORD = 'benchmark-password'
+
+
+def seed(questions=10000, choices=4, users=1000, votes=1000000, batch_size=5000, seed_value=0, stdout=None):
+    """Create questions, choices, users and votes for the benchmark.
+
+    About five percent of the questions are published in the future and the rest are spread
+    over the last year, so the index page has a realistic mix of open and closed polls.
+    Every user vote at most once per question and the vote tally is filled in.
+
+    Args:
+        questions: number of questions to create.
+        choices: number of choices of each question.
+        users: number of users that vote.
+        votes: total number of votes to create.
+        batch_size: number of rows per bulk insert.
+        seed_value: seed of the random generator so runs are repeatable.
+        stdout: optional stream to report the progress.
+
+    Returns: the number of votes created.
+    """
+    rng = random.Random(seed_value)
+    now = timezone.now()
+    start = Question.objects.order_by('-id').values_list('id', flat=True).first() or 0
+
+    def report(message):
+        if stdout is not None:
+            stdout.write(message)
+
+    password = make_password(BENCH_PASSWORD)
+    bench_users = User.objects.filter(username__startswith=BENCH_USER_PREFIX)
+    existing = set(bench_users.values_list('username', flat=True))
+    usernames = ['{}{}'.format(BENCH_USER_PREFIX, number) for number in range(users)]
+    User.objects.bulk_create((User(username=username, password=password)
+                              for username in usernames if username not in existing), batch_size=batch_size)
+    user_ids = list(bench_users.order_by('id').values_list('id', flat=True)[:users])
+    report('{} users ready.'.format(len(user_ids)))
+
+    new_questions = []
+    for number in range(questions):
+        if rng.random() < 0.05:
+            pub_date = now + datetime.timedelta(days=rng.uniform(1, 30))
+        else:
+            pub_date = now - datetime.timedelta(days=rng.uniform(0, 365))
+        end_date = pub_date + datetime.timedelta(days=rng.uniform(1, 60))
+        new_questions.append(Question(question_text='{} question {}'.format(BENCH_PREFIX, start + number),
+                                      pub_date=pub_date, end_date=end_date))
+    Question.objects.bulk_create(new_questions, batch_size=batch_size)
+    question_ids = list(Question.objects.filter(id__gt=start).order_by('id').values_list('id', flat=True))
+    report('{} questions created.'.format(len(question_ids)))
+
+    Choice.objects.bulk_create((Choice(question_id=question_id, choice_text='choice {}'.format(number))
+                                for question_id in question_ids for number in range(choices)),
+                               batch_size=batch_size)
+    choice_ids = {}
+    for choice_id, question_id in (Choice.objects.filter(question_id__gt=start)
+                                   .order_by('id').values_list('id', 'question_id')):
+        choice_ids.setdefault(question_id, []).append(choice_id)
+
+    tally = {}
+    per_question = min(len(user_ids), votes // max(len(question_ids), 1))
+    batch = []
+    created = 0
+    for question_id in question_ids:
+        for user_id in rng.sample(user_ids, per_question):
+            choice_id = rng.choice(choice_ids[question_id])
+            tally[choice_id] = tally.get(choice_id, 0) + 1
+            batch.append(Vote(question_id=question_id, user_id=user_id, choice_id=choice_id))
+        if len(batch) >= batch_size:
+            Vote.objects.bulk_create(batch, batch_size=batch_size)
+            created += len(batch)
+            batch = []
+            report('{} votes created.'.format(created))
+    Vote.objects.bulk_create(batch, batch_size=batch_size)
+    created += len(batch)
+    Choice.objects.bulk_update([Choice(id=choice_id, vote_count=count) for choice_id, count in tally.items()],
+                               ['vote_count'], batch_size=batch_size)
+    report('{} votes created.'.format(created))
+    return created
+
+
+def percentile(samples, percent):
+    """Return the value below which the given percent of the samples fall.
+
+    Args:
+        samples: list of measured values.
+        percent: the percentile between 0 and 100.
+
+    Returns: the percentile of the samples, or 0.0 if there is no sample.
+    """
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = max(0, math.ceil(percent / 100 * len(ordered)) - 1)
+    return ordered[index]
+
+
+def summarize(samples):
+    """Return the statistics of a list of durations in seconds as milliseconds.
+
+    Args:
+        samples: list of durations in seconds.
+
+    Returns: dictionary with the count, mean, p50, p95 and p99 in milliseconds.
+    """
+    return {
+        'count': len(samples),
+        'mean_ms': round(statistics.mean(samples) * 1000, 3) if samples else 0.0,
+        'p50_ms': round(percentile(samples, 50) * 1000, 3),
+        'p95_ms': round(percentile(samples, 95) * 1000, 3),
+        'p99_ms': round(percentile(samples, 99) * 1000, 3),
+    }
+
+
+def measure(function, repeat, setup=None):
+    """Call the function many times and return the duration of each call in seconds.
+
+    Args:
+        function: callable without argument to measure.
+        repeat: number of calls.
+        setup: optional callable run before each call, outside of the measured time.
+
+    Returns: list of durations in seconds.
+    """
+    samples = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        started = time.perf_counter()
+        function()
+        samples.append(time.perf_counter() - started)
+    return samples
+
+
+class QueryCounter:
+    """Database execute wrapper that count the queries run inside `connection.execute_wrapper`."""
+
+    def __init__(self):
+        """Start counting from zero."""
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        """Count the query and run it."""
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+def parse_mix(text):
+    """Return the weight of every endpoint of a traffic mix like 'index=50,vote=10'.
+
+    Args:
+        text: comma separated pairs of endpoint name and positive weight.
+
+    Returns: dictionary of endpoint name to weight.
+
+    Raises:
+        ValueError: if a pair is malformed or no weight is positive.
+    """
+    mix = {}
+    for pair in text.split(','):
+        name, _, weight = pair.partition('=')
+        mix[name.strip()] = float(weight)
+    if not mix or min(mix.values()) < 0 or not sum(mix.values()):
+        raise ValueError('The traffic mix need at least one positive weight: {!r}'.format(text))
+    return mix
+
+
+def compare_runs(baseline, current):
+    """Return the change of the throughput and the latency of every endpoint between two load test reports.
+
+    Args:
+        baseline: the report of the earlier run, as saved by `loadtest --output`.
+        current: the report of the new run.
+
+    Returns: list of (endpoint, metric, baseline value, current value, change in percent) for the
+        endpoints of both reports.
+    """
+    rows = []
+    for name, stats in current['endpoints'].items():
+        before = baseline['endpoints'].get(name)
+        if before is None:
+            continue
+        for metric in ('throughput', 'p50_ms', 'p95_ms', 'p99_ms'):
+            old, new = before[metric], stats[metric]
+            rows.append((name, metric, old, new, (new - old) / old * 100 if old else 0.0))
+    return rows
+
+
+def import_profile(text):
+    """Return the import time of every top-level package from the output of `python -X importtime`.
+
+    Args:
+        text: the standard error of the interpreter, the lines that are not part of the
+            import time report are ignored.
+
+    Returns: list of (package, seconds spent in its own modules, number of modules), the
+        slowest package first.
+    """
+    packages = {}
+    for line in text.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        own, _, name = line[len('import time:'):].split('|')
+        if not own.strip().isdigit():
+            # The header line of the report.
+            continue
+        package = name.strip().split('.')[0]
+        seconds, count = packages.get(package, (0.0, 0))
+        packages[package] = (seconds + int(own) / 1e6, count + 1)
+    return sorted(((package, seconds, count) for package, (seconds, count) in packages.items()),
+                  key=lambda row: row[1], reverse=True)
@@ -0,0 +1,85 @@
+"""This script is use to handle the cache of the pages of the KU Polls web application.
+
+The cached fragments of the index page are keyed by a token. The token is removed when a
+question or a choice is changed, and it expire by itself at the next publish date or
+end date, because the index page change when a poll open or close.
+
+The cached result table of a question is keyed by the question id and the times of the
+last change and the last vote of the question, which change with its tally.
+"""
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.utils import make_template_fragment_key
+from django.utils import timezone
+
+from .models import Question
+
+INDEX_TOKEN_KEY = 'polls:index:token'
+
+
+def get_cache():
+    """Return the cache backend used by the polls app."""
+    return caches[settings.POLLS_CACHE_ALIAS]
+
+
+def next_boundary(now):
+    """Return the first publish date or end date after now, or None if there is none.
+
+    Both lookups read only the first row of the date indexes of the question.
+
+    Args:
+        now: the current time.
+
+    Returns: the datetime of the next boundary.
+    """
+    dates = [Question.objects.filter(**{field + '__gt': now}).order_by(field).values_list(field, flat=True).first()
+             for field in ('pub_date', 'end_date')]
+    dates = [date for date in dates if date is not None]
+    return min(dates) if dates else None
+
+
+def index_cache_state():
+    """Return the token and the remaining lifetime of the cached index fragments.
+
+    Returns: dictionary with the `token` of the current index version and the `timeout`
+        in seconds until the next publish or end date.
+    """
+    cache = get_cache()
+    state = cache.get(INDEX_TOKEN_KEY)
+    if state is None:
+        now = timezone.now()
+        timeout = settings.POLLS_INDEX_CACHE_TIMEOUT
+        boundary = next_boundary(now)
+        if boundary is not None:
+            timeout = max(1, min(timeout, int((boundary - now).total_seconds()) + 1))
+        state = {'token': uuid.uuid4().hex, 'expires': time.time() + timeout}
+        cache.set(INDEX_TOKEN_KEY, state, timeout)
+    return {'token': state['token'], 'timeout': max(1, int(state['expires'] - time.time()))}
+
+
+def invalidate_index():
+    """Make every cached fragment of the index page stale."""
+    get_cache().delete(INDEX_TOKEN_KEY)
+
+
+def results_version(question):
+    """Return the version of the result table of the question, a part of the key of its cached fragment.
+
+    The version is read from the question row, which every process load from the
+    database, so a vote or a change made by another process make the table stale too.
+
+    Args:
+        question: the question with its `modified` and `last_vote_at` times.
+
+    Returns: the text of both times.
+    """
+    last_vote_at = question.last_vote_at.isoformat() if question.last_vote_at else ''
+    return '{}:{}'.format(question.modified.isoformat(), last_vote_at)
+
+
+def expire_results(question):
+    """Remove the cached result table of the current version of the question."""
+    get_cache().delete(make_template_fragment_key('polls_results', [question.pk, results_version(question)]))
@@ -0,0 +1,393 @@
+"""This script is use to handle the write-behind vote queue of the KU Polls web application.
+
+In the queue mode the vote view only validate the vote, append it to the journal file
+of the process and return. A drainer thread apply the journal to the database in
+batches, so the requests do not wait for the database write lock when a poll is
+about to close.
+"""
+import datetime
+import itertools
+import json
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.signals import setting_changed
+from django.db import close_old_connections, transaction
+from django.dispatch import receiver
+
+from .archive import archived_choice, restore_question
+from .models import Choice, Question, Vote, adjust_vote_counts
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - not available on Windows
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+PENDING_SESSION_KEY = 'polls_pending_votes'
+
+# Keep the number of query parameters of one batch under the SQLite limit.
+APPLY_CHUNK_SIZE = 250
+
+
+def apply_votes(entries):
+    """Write a batch of journal entries to the database.
+
+    Only the latest entry of each user and question by its time `t` is kept, because
+    the segments of different processes are not applied in the order of the votes.
+    The existing votes are read once and an entry older than the saved vote is
+    skipped. Then the new votes are inserted with `bulk_create`, the switched votes
+    are updated with `bulk_update` and the tally of the choices is updated with one
+    statement. Applying the same entries again, or an older segment after a newer
+    one, change nothing, so a batch can be retried after a crash.
+
+    Args:
+        entries: list of dictionaries with the question id `q`, user id `u`, choice id `c`
+            and the time of the vote `t` in seconds since the epoch.
+
+    Returns: the number of votes created or switched.
+    """
+    latest = {}
+    for entry in entries:
+        key = (entry['q'], entry['u'])
+        voted_at = entry.get('t', 0)
+        # Of two entries with the same time the later one in the journal win.
+        if key not in latest or voted_at >= latest[key][1]:
+            latest[key] = (entry['c'], voted_at)
+    items = [(key, (choice_id, datetime.datetime.fromtimestamp(voted_at, tz=datetime.timezone.utc)))
+             for key, (choice_id, voted_at) in latest.items()]
+    changes = 0
+    for start in range(0, len(items), APPLY_CHUNK_SIZE):
+        changes += _apply_chunk(items[start:start + APPLY_CHUNK_SIZE])
+    return changes
+
+
+def _apply_chunk(items):
+    question_ids = {question_id for (question_id, _), _ in items}
+    user_ids = {user_id for (_, user_id), _ in items}
+    with transaction.atomic():
+        # A question opened again after its archive get its votes back first.
+        for question in Question.objects.filter(pk__in=question_ids, archived=True):
+            restore_question(question)
+        # Skip the votes whose choice or user was deleted after the vote was queued.
+        valid_choices = set(Choice.objects.filter(pk__in={choice_id for _, (choice_id, _) in items})
+                            .values_list('pk', flat=True))
+        valid_users = set(User.objects.filter(pk__in=user_ids).values_list('pk', flat=True))
+        existing = {(vote.question_id, vote.user_id): vote
+                    for vote in Vote.objects.select_for_update().filter(question_id__in=question_ids,
+                                                                        user_id__in=user_ids)}
+        new_votes, switched_votes, updated_votes, deltas = [], [], [], {}
+        for (question_id, user_id), (choice_id, voted_at) in items:
+            if choice_id not in valid_choices or user_id not in valid_users:
+                continue
+            vote = existing.get((question_id, user_id))
+            if vote is None:
+                new_votes.append(Vote(question_id=question_id, user_id=user_id, choice_id=choice_id,
+                                      voted_at=voted_at))
+                deltas[choice_id] = deltas.get(choice_id, 0) + 1
+                continue
+            if vote.voted_at is not None and vote.voted_at >= voted_at:
+                # The saved vote is newer than this entry.
+                continue
+            if vote.choice_id != choice_id:
+                deltas[vote.choice_id] = deltas.get(vote.choice_id, 0) - 1
+                deltas[choice_id] = deltas.get(choice_id, 0) + 1
+                vote.choice_id = choice_id
+                switched_votes.append(vote)
+            vote.voted_at = voted_at
+            updated_votes.append(vote)
+        Vote.objects.bulk_create(new_votes)
+        Vote.objects.bulk_update(updated_votes, ['choice', 'voted_at'])
+        adjust_vote_counts(deltas, question_ids)
+    return len(new_votes) + len(switched_votes)
+
+
+class VoteQueue:
+    """Durable append-only queue of votes for one process.
+
+    The votes are appended to `votes-<pid>.log`. When the queue is drained the file is
+    renamed to a numbered `.ready` segment, the segment is applied to the database and
+    then removed. The process hold a lock on `votes-<pid>.lock` while it is alive, so
+    another process can recover the journals of a process that crashed.
+    """
+
+    def __init__(self, directory, batch_size=500, max_pending=10000, interval=0.5, fsync=True):
+        """Create the queue and recover the journals left by crashed processes.
+
+        Args:
+            directory: directory of the journal files.
+            batch_size: number of entries written to the database per transaction.
+            max_pending: number of queued votes after which the request drain the queue itself.
+            interval: seconds between two drains of the background thread, 0 disable the thread.
+            fsync: whether every vote is flushed to the disk before the request return.
+        """
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.batch_size = batch_size
+        self.max_pending = max_pending
+        self.interval = interval
+        self.fsync = fsync
+        self.pid = os.getpid()
+        self.pending = 0
+        # Start after the segments of an earlier process that had the same pid.
+        self._sequence = itertools.count(int(time.time() * 1000))
+        self._file = None
+        self._lock = threading.Lock()
+        self._drain_lock = threading.Lock()
+        self._thread = None
+        self._stopped = threading.Event()
+        self._owner_lock = open(self.directory / 'votes-{}.lock'.format(self.pid), 'a')
+        if fcntl is not None:
+            try:
+                fcntl.flock(self._owner_lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                # Another queue of this process already hold the lock.
+                pass
+        self.recover()
+
+    @property
+    def journal_path(self):
+        """Return the path of the journal that this process append to."""
+        return self.directory / 'votes-{}.log'.format(self.pid)
+
+    def enqueue(self, user_id, question_id, choice_id):
+        """Append a validated vote to the journal.
+
+        If too many votes are waiting the calling request drain the queue before
+        adding its vote, which slow the producers down to the speed of the database.
+
+        Args:
+            user_id: id of the user that vote.
+            question_id: id of the question.
+            choice_id: id of the selected choice.
+        """
+        if self.pending >= self.max_pending:
+            self.drain()
+        line = json.dumps({'q': question_id, 'u': user_id, 'c': choice_id, 't': time.time()}) + '\n'
+        with self._lock:
+            if self._file is None:
+                self._file = open(self.journal_path, 'a', encoding='utf-8')
+            self._file.write(line)
+            self._file.flush()
+            if self.fsync:
+                os.fsync(self._file.fileno())
+            self.pending += 1
+        self.start()
+
+    def drain(self):
+        """Apply every queued vote of this process to the database.
+
+        Returns: the number of journal entries applied.
+        """
+        with self._drain_lock:
+            self._rotate()
+            applied = 0
+            for segment in sorted(self.directory.glob('votes-{}-*.ready'.format(self.pid))):
+                entries = self._read(segment)
+                for start in range(0, len(entries), self.batch_size):
+                    apply_votes(entries[start:start + self.batch_size])
+                segment.unlink()
+                with self._lock:
+                    self.pending = max(0, self.pending - len(entries))
+                applied += len(entries)
+            return applied
+
+    def recover(self, force=False):
+        """Take over the journals of the processes that are not running anymore.
+
+        Args:
+            force: take every journal even when the lock of the owner cannot be checked.
+
+        Returns: the number of journal files taken over.
+        """
+        owners = {}
+        for path in self.directory.glob('votes-*'):
+            pid = path.name.split('-')[1].split('.')[0]
+            if pid != str(self.pid):
+                owners.setdefault(pid, []).append(path)
+        recovered = 0
+        for pid, paths in owners.items():
+            lock = self.directory / 'votes-{}.lock'.format(pid)
+            if not force and not self._owner_is_gone(lock):
+                continue
+            # The ready segments are older than the journal of the same process.
+            journals = sorted((path for path in paths if path != lock),
+                              key=lambda item: (item.suffix == '.log', item.name))
+            for path in journals:
+                segment = self._next_segment()
+                try:
+                    path.rename(segment)
+                except FileNotFoundError:
+                    continue
+                recovered += 1
+                with self._lock:
+                    self.pending += len(self._read(segment))
+            if lock in paths:
+                lock.unlink()
+        if recovered:
+            logger.warning('Vote queue: recovered %s journal file(s) of stopped processes', recovered)
+        return recovered
+
+    def start(self):
+        """Start the background drainer thread if it is enabled and not running."""
+        if self.interval and (self._thread is None or not self._thread.is_alive()):
+            self._stopped.clear()
+            self._thread = threading.Thread(target=self._run, name='polls-vote-drainer', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """Stop the drainer thread, apply what is left and close the journal."""
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.drain()
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+        self._owner_lock.close()
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            try:
+                self.drain()
+            except Exception:
+                logger.exception('Vote queue: drain failed, the votes stay queued for the next try')
+            finally:
+                close_old_connections()
+
+    def _rotate(self):
+        with self._lock:
+            if self._file is None:
+                return
+            self._file.close()
+            self._file = None
+            try:
+                self.journal_path.rename(self._next_segment())
+            except FileNotFoundError:
+                pass
+
+    def _next_segment(self):
+        return self.directory / 'votes-{}-{:015d}.ready'.format(self.pid, next(self._sequence))
+
+    @staticmethod
+    def _owner_is_gone(lock):
+        if fcntl is None:
+            return False
+        try:
+            with open(lock, 'rb') as handle:
+                fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                fcntl.flock(handle, fcntl.LOCK_UN)
+        except FileNotFoundError:
+            return True
+        except OSError:
+            return False
+        return True
+
+    @staticmethod
+    def _read(segment):
+        entries = []
+        with open(segment, encoding='utf-8') as handle:
+            for line in handle:
+                try:
+                    entries.append(json.loads(line))
+                except ValueError:
+                    # A process that crash while writing leave a partial last line.
+                    logger.warning('Vote queue: skipped a damaged entry in %s', segment.name)
+        return entries
+
+
+_queue = None
+_queue_lock = threading.Lock()
+
+
+def get_vote_queue():
+    """Return the vote queue of this process, created from the settings on first use."""
+    global _queue
+    with _queue_lock:
+        if _queue is None or _queue.pid != os.getpid():
+            _queue = VoteQueue(settings.POLLS_VOTE_QUEUE_DIR,
+                               batch_size=settings.POLLS_VOTE_QUEUE_BATCH_SIZE,
+                               max_pending=settings.POLLS_VOTE_QUEUE_MAX_PENDING,
+                               interval=settings.POLLS_VOTE_QUEUE_INTERVAL,
+                               fsync=settings.POLLS_VOTE_QUEUE_FSYNC)
+        return _queue
+
+
+@receiver(setting_changed)
+def reset_vote_queue(setting, **kwargs):
+    """Forget the vote queue when its settings are changed, for example in the tests."""
+    global _queue
+    if setting.startswith('POLLS_VOTE_QUEUE'):
+        with _queue_lock:
+            _queue = None
+
+
+def remember_pending_vote(request, question_id, choice_id):
+    """Keep the queued vote and its time in the session so the user see it before it is applied."""
+    pending = request.session.get(PENDING_SESSION_KEY, {})
+    pending[str(question_id)] = [choice_id, time.time()]
+    request.session[PENDING_SESSION_KEY] = pending
+
+
+def forget_pending_vote(request, question):
+    """Remove the queued vote of the question from the session."""
+    pending = request.session.get(PENDING_SESSION_KEY, {})
+    if pending.pop(str(question.id), None) is not None:
+        request.session[PENDING_SESSION_KEY] = pending
+
+
+def pending_choice(request, question):
+    """Return the choice id of the queued vote of the user for the question, or None.
+
+    A vote that is older than `POLLS_VOTE_QUEUE_PENDING_AGE` seconds was applied or
+    dropped by the drainer, it is removed from the session.
+    """
+    if not request.user.is_authenticated:
+        return None
+    entry = request.session.get(PENDING_SESSION_KEY, {}).get(str(question.id))
+    if entry is None:
+        return None
+    # The sessions of older versions keep only the choice id.
+    choice_id, queued_at = entry if isinstance(entry, list) else (entry, 0)
+    if time.time() - queued_at > settings.POLLS_VOTE_QUEUE_PENDING_AGE:
+        forget_pending_vote(request, question)
+        return None
+    return choice_id
+
+
+def has_pending_vote(request, question):
+    """Return True if the user has a vote for the question that may still be in the vote queue."""
+    return pending_choice(request, question) is not None
+
+
+def show_pending_vote(request, question, choices):
+    """Count the queued vote of the user in the choices until the drainer apply it.
+
+    Args:
+        request: the request of the result page.
+        question: the question of the result page.
+        choices: the choices of the question, their `vote_count` is changed in place.
+    """
+    choice_id = pending_choice(request, question)
+    if choice_id is None:
+        return
+    if question.archived:
+        current = archived_choice(question.archive, request.user.id)
+    else:
+        current = Vote.objects.filter(question=question, user=request.user).values_list('choice_id', flat=True).first()
+    # The vote is applied, or the drainer dropped it because its choice was deleted.
+    if current == choice_id or all(choice.id != choice_id for choice in choices):
+        forget_pending_vote(request, question)
+        return
+    for choice in choices:
+        if choice.id == choice_id:
+            choice.vote_count += 1
+        elif choice.id == current:
+            choice.vote_count -= 1
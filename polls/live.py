@@ -0,0 +1,342 @@
+"""This script is use to push the live result of the polls of the KU Polls web application.
+
+A vote send the change of the tally of its choices to the broker when its transaction
+commit. The broker keep one publisher per watched question, the publisher add up the
+changes of a short window and send them as one event to every open result page, so N
+viewers cost one update instead of N result queries.
+
+The events are sent as server-sent events. Every event carry the whole tally of the
+question, so a page that reconnect after missing events is up to date again. Only the
+async views keep the stream open, a sync server answer the snapshot and close the
+response, so a stream never hold a thread of a WSGI worker.
+"""
+import asyncio
+import collections
+import json
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.db import close_old_connections
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+
+from .models import Choice
+
+logger = logging.getLogger(__name__)
+
+EVENT_STREAM = 'text/event-stream'
+
+# Milliseconds the browser wait before it reconnect.
+RETRY_MS = 1000
+# Milliseconds the browser wait before it ask a sync server for the snapshot again.
+POLL_RETRY_MS = 5000
+
+
+def load_counts(question_id):
+    """Return the tally of the choices of the question as a dictionary of choice id to votes."""
+    return dict(Choice.objects.filter(question_id=question_id).values_list('id', 'vote_count'))
+
+
+def format_event(event):
+    """Return the event as the text of a server-sent event."""
+    return 'id: {}\nevent: {}\ndata: {}\n\n'.format(event['id'], event['event'], json.dumps(event['data']))
+
+
+class Subscription:
+    """Events of one question for one viewer, read by a thread or by an event loop."""
+
+    def __init__(self, publisher, loop=None):
+        """Create the subscription.
+
+        Args:
+            publisher: the publisher of the question.
+            loop: the event loop of an async reader, None for a thread.
+        """
+        self.publisher = publisher
+        self._events = collections.deque()
+        self._condition = threading.Condition()
+        self._loop = loop
+        self._ready = None
+
+    def put(self, event):
+        """Add an event and wake the reader."""
+        with self._condition:
+            self._events.append(event)
+            self._condition.notify()
+        if self._loop is not None:
+            try:
+                self._loop.call_soon_threadsafe(self._wake)
+            except RuntimeError:
+                # The loop of the reader is already closed.
+                pass
+
+    def _wake(self):
+        if self._ready is not None:
+            self._ready.set()
+
+    def take(self):
+        """Return the waiting events without blocking."""
+        with self._condition:
+            events = list(self._events)
+            self._events.clear()
+            return events
+
+    def get(self, timeout):
+        """Wait up to timeout seconds for events and return them, an empty list on timeout."""
+        with self._condition:
+            self._condition.wait_for(lambda: self._events, timeout)
+        return self.take()
+
+    async def aget(self, timeout):
+        """Async version of `get` that wait in the event loop of the subscription."""
+        if self._ready is None:
+            self._ready = asyncio.Event()
+        deadline = self._loop.time() + timeout
+        while True:
+            events = self.take()
+            remaining = deadline - self._loop.time()
+            if events or remaining <= 0:
+                return events
+            # `put` set the event from the loop after it add the event, so no wakeup is lost.
+            self._ready.clear()
+            try:
+                await asyncio.wait_for(self._ready.wait(), remaining)
+            except asyncio.TimeoutError:
+                pass
+
+    def close(self):
+        """Stop receiving the events."""
+        self.publisher.broker.unsubscribe(self)
+
+
+class Publisher:
+    """Tally of one question shared by all its viewers, changed only under the lock of the broker."""
+
+    def __init__(self, broker, question_id, counts, now):
+        """Create the publisher from the tally read from the database."""
+        self.broker = broker
+        self.question_id = question_id
+        self.counts = counts
+        self.pending = {}
+        self.subscribers = set()
+        self.sequence = 0
+        self.synced = now
+        self.idle_since = now
+
+    def event(self, name, deltas=None):
+        """Return an event with the current tally."""
+        data = {'question': self.question_id, 'counts': self.counts}
+        if deltas is not None:
+            data['deltas'] = deltas
+        return {'id': self.sequence, 'event': name, 'data': data}
+
+    def flush(self):
+        """Apply the waiting changes and send them to every subscriber as one event."""
+        deltas = {choice_id: delta for choice_id, delta in self.pending.items() if delta}
+        self.pending = {}
+        if not deltas:
+            return
+        counts = dict(self.counts)
+        for choice_id, delta in deltas.items():
+            counts[choice_id] = counts.get(choice_id, 0) + delta
+        self.counts = counts
+        self.sequence += 1
+        event = self.event('delta', deltas)
+        for subscription in self.subscribers:
+            subscription.put(event)
+
+    def resync(self, counts, now):
+        """Queue the difference between the database and the tally as changes.
+
+        The in-memory broker only see the votes of its own process, the votes of the
+        other processes and the recounts show up here. A vote committed while the
+        tally was read can be counted late, the next resync correct it.
+        """
+        self.synced = now
+        for choice_id in set(counts) | set(self.counts):
+            expected = self.counts.get(choice_id, 0) + self.pending.get(choice_id, 0)
+            difference = counts.get(choice_id, 0) - expected
+            if difference:
+                self.pending[choice_id] = self.pending.get(choice_id, 0) + difference
+
+
+class LocalBroker:
+    """In-memory broker of the live results, shared by the requests of one process.
+
+    Another broker can be configured with `POLLS_LIVE_BROKER`, it need the methods
+    `subscribe`, `unsubscribe` and `publish` of this class.
+    """
+
+    def __init__(self, window=0.5, resync=30, idle=15):
+        """Create the broker.
+
+        Args:
+            window: seconds during which the changes are added up before they are sent.
+            resync: seconds between two reads of the tally of a watched question.
+            idle: seconds a question stay in memory after its last viewer left.
+        """
+        self.window = window
+        self.resync = resync
+        self.idle = idle
+        self._lock = threading.Lock()
+        self._publishers = {}
+        self._choices = {}
+        self._thread = None
+
+    def subscribe(self, question_id, loop=None):
+        """Start receiving the events of the question.
+
+        The first event of the subscription is a `snapshot` with the current tally.
+
+        Args:
+            question_id: the id of the question to watch.
+            loop: the event loop of an async reader, None for a thread.
+
+        Returns: the subscription, close it when the viewer leave.
+        """
+        counts = None
+        while True:
+            with self._lock:
+                publisher = self._publishers.get(question_id)
+                if publisher is None and counts is not None:
+                    publisher = Publisher(self, question_id, counts, time.monotonic())
+                    self._publishers[question_id] = publisher
+                    self._choices.update(dict.fromkeys(counts, publisher))
+                if publisher is not None:
+                    subscription = Subscription(publisher, loop)
+                    subscription.put(publisher.event('snapshot'))
+                    publisher.subscribers.add(subscription)
+                    publisher.idle_since = None
+                    if self._thread is None and self.window:
+                        self._thread = threading.Thread(target=self._run, name='polls-live-broker', daemon=True)
+                        self._thread.start()
+                    return subscription
+            # Read the tally outside the lock, the publishing votes do not wait for the database.
+            counts = load_counts(question_id)
+
+    def unsubscribe(self, subscription):
+        """Stop sending events to the subscription."""
+        with self._lock:
+            publisher = subscription.publisher
+            publisher.subscribers.discard(subscription)
+            if not publisher.subscribers and publisher.idle_since is None:
+                publisher.idle_since = time.monotonic()
+
+    def publish(self, deltas):
+        """Queue the committed changes of the tally of the choices.
+
+        Args:
+            deltas: dictionary that map the id of the choice to the number of votes added.
+        """
+        with self._lock:
+            for choice_id, delta in deltas.items():
+                publisher = self._choices.get(choice_id)
+                if publisher is not None:
+                    publisher.pending[choice_id] = publisher.pending.get(choice_id, 0) + delta
+
+    def flush(self):
+        """Send the changes of the last window and read again the tallies that are due.
+
+        Returns: True while some question is watched.
+        """
+        now = time.monotonic()
+        due = []
+        with self._lock:
+            for question_id, publisher in list(self._publishers.items()):
+                if not publisher.subscribers and now - publisher.idle_since >= self.idle:
+                    self._forget(publisher)
+                    continue
+                publisher.flush()
+                if publisher.subscribers and now - publisher.synced >= self.resync:
+                    due.append(publisher)
+        for publisher in due:
+            counts = load_counts(publisher.question_id)
+            with self._lock:
+                publisher.resync(counts, now)
+                self._choices.update(dict.fromkeys(counts, publisher))
+        with self._lock:
+            if not self._publishers:
+                self._thread = None
+            return bool(self._publishers)
+
+    def _forget(self, publisher):
+        del self._publishers[publisher.question_id]
+        for choice_id in publisher.counts:
+            if self._choices.get(choice_id) is publisher:
+                del self._choices[choice_id]
+
+    def _run(self):
+        watching = True
+        while watching:
+            time.sleep(self.window)
+            try:
+                watching = self.flush()
+            except Exception:
+                logger.exception('Live results: flush failed')
+            finally:
+                close_old_connections()
+
+
+def snapshot_events(broker, question_id, retry=POLL_RETRY_MS):
+    """Return the server-sent events of the current tally of the question, for a response that close at once.
+
+    Args:
+        broker: the broker of the live results.
+        question_id: the id of the question.
+        retry: the milliseconds that the browser wait before it ask again.
+
+    Returns: the text of the `retry` line and of the `snapshot` event.
+    """
+    subscription = broker.subscribe(question_id)
+    try:
+        events = subscription.take()
+    finally:
+        subscription.close()
+    return 'retry: {}\n\n'.format(retry) + ''.join(map(format_event, events))
+
+
+async def astream_events(subscribe, question_id, keepalive, duration):
+    """Yield the server-sent events of the question until the duration is over.
+
+    The subscription is made on the first iteration, so a response that is never
+    sent hold no subscription. `subscribe` is the async version of `subscribe` of
+    the broker.
+    """
+    subscription = await subscribe(question_id, asyncio.get_running_loop())
+    deadline = time.monotonic() + duration
+    try:
+        yield 'retry: {}\n\n'.format(RETRY_MS)
+        while True:
+            events = await subscription.aget(keepalive)
+            yield ''.join(map(format_event, events)) if events else ': keepalive\n\n'
+            if time.monotonic() >= deadline:
+                break
+    finally:
+        subscription.close()
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    """Return the broker of the live results, created from the settings on first use."""
+    global _broker
+    with _broker_lock:
+        if _broker is None:
+            _broker = import_string(settings.POLLS_LIVE_BROKER)(window=settings.POLLS_LIVE_WINDOW,
+                                                                resync=settings.POLLS_LIVE_RESYNC,
+                                                                idle=settings.POLLS_LIVE_KEEPALIVE)
+        return _broker
+
+
+@receiver(setting_changed)
+def reset_broker(setting, **kwargs):
+    """Forget the broker when its settings are changed, for example in the tests."""
+    global _broker
+    if setting.startswith('POLLS_LIVE'):
+        with _broker_lock:
+            _broker = None
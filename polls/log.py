@@ -0,0 +1,191 @@
+"""This script is use to handle the logging of the KU Polls web application.
+
+The request threads only put the log records in a queue, a background thread format
+them as JSON lines and write them to the log file and the console. The records carry
+the id of the request that logged them, and the high-volume events can be sampled.
+See `LOGGING` in mysite/settings.py.
+"""
+import asyncio
+import atexit
+import contextvars
+import datetime
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import threading
+import uuid
+
+from django.utils.decorators import sync_and_async_middleware
+
+REQUEST_ID_HEADER = 'X-Request-ID'
+
+request_id = contextvars.ContextVar('polls_request_id', default=None)
+
+# The attributes of every record, the other attributes come from `extra`.
+RECORD_ATTRIBUTES = set(vars(logging.LogRecord('', 0, '', 0, '', None, None))) | {'message', 'asctime'}
+
+
+class JsonFormatter(logging.Formatter):
+    """Format a record as one JSON object per line."""
+
+    def format(self, record):
+        """Return the record as JSON with its time, level, logger, message and extra fields."""
+        data = {
+            'time': datetime.datetime.fromtimestamp(record.created, datetime.timezone.utc).isoformat(),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in RECORD_ATTRIBUTES and not key.startswith('_'):
+                data[key] = value
+        if record.exc_info:
+            data['exception'] = self.formatException(record.exc_info)
+        return json.dumps(data, default=str)
+
+
+class RequestIdFilter(logging.Filter):
+    """Add the id of the current request to the record as `request_id`."""
+
+    def filter(self, record):
+        """Set `request_id` and keep the record."""
+        record.request_id = request_id.get()
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """Keep only a part of the records of the high-volume events.
+
+    A record with `extra={'event': name}` is kept with the probability given for the
+    name in the rates, the warnings and errors are always kept.
+    """
+
+    def __init__(self, rates=None):
+        """Create the filter from a dictionary of event name to rate between 0 and 1."""
+        super().__init__()
+        self.rates = dict(rates or {})
+
+    def filter(self, record):
+        """Return whether the record is kept."""
+        if record.levelno >= logging.WARNING:
+            return True
+        rate = self.rates.get(getattr(record, 'event', None), 1.0)
+        return rate >= 1.0 or random.random() < rate
+
+
+class BackgroundHandler(logging.handlers.QueueHandler):
+    """Handler that queue the records for a background writer thread.
+
+    The writer thread is started on the first record of the process and stopped at exit.
+    The formatter of this handler is used by the writer thread. When the queue is full
+    the records are dropped and counted in `dropped` instead of blocking the request.
+    """
+
+    def __init__(self, filename='', console=True, max_size=10000, handlers=None):
+        """Create the handler.
+
+        Args:
+            filename: path of the log file, an empty string to not write a file.
+            console: whether the records are written to the standard error too.
+            max_size: number of records that can wait in the queue.
+            handlers: the handlers of the writer thread, instead of the file and the console.
+        """
+        super().__init__(queue.Queue(max_size))
+        if handlers is None:
+            handlers = []
+            if filename:
+                handlers.append(logging.FileHandler(filename, encoding='utf-8', delay=True))
+            if console:
+                handlers.append(logging.StreamHandler(sys.stderr))
+        self.handlers = handlers
+        self.dropped = 0
+        self._listener = None
+        self._pid = None
+        self._start_lock = threading.Lock()
+
+    def setFormatter(self, fmt):
+        """Format the records with the formatter in the writer thread."""
+        for handler in self.handlers:
+            handler.setFormatter(fmt)
+
+    def prepare(self, record):
+        """Merge the arguments into the message, the record is formatted by the writer thread."""
+        record = logging.makeLogRecord(vars(record))
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record):
+        """Queue the record, or drop it when the queue is full."""
+        if self._pid != os.getpid():
+            self.start()
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def start(self):
+        """Start the writer thread of this process."""
+        with self._start_lock:
+            if self._pid == os.getpid():
+                return
+            # A forked worker get a copy of the queue but not the thread.
+            self._listener = logging.handlers.QueueListener(self.queue, *self.handlers, respect_handler_level=True)
+            self._listener.start()
+            self._pid = os.getpid()
+            atexit.register(self.flush)
+
+    def flush(self):
+        """Wait until the queued records are written, then keep the writer running."""
+        with self._start_lock:
+            if self._listener is None or self._pid != os.getpid():
+                return
+            self._listener.stop()
+            self._listener.start()
+        for handler in self.handlers:
+            handler.flush()
+
+    def close(self):
+        """Write the queued records and stop the writer thread."""
+        with self._start_lock:
+            if self._listener is not None and self._pid == os.getpid():
+                self._listener.stop()
+            self._listener = None
+            self._pid = None
+        for handler in self.handlers:
+            handler.close()
+        super().close()
+
+
+def start_request(request):
+    """Set the id of the request from its header, or a new one, and return the context token."""
+    request.request_id = request.headers.get(REQUEST_ID_HEADER) or uuid.uuid4().hex
+    return request_id.set(request.request_id)
+
+
+@sync_and_async_middleware
+def request_id_middleware(get_response):
+    """Give every request an id that is added to its log records and to the response."""
+    if asyncio.iscoroutinefunction(get_response):
+        async def middleware(request):
+            token = start_request(request)
+            try:
+                response = await get_response(request)
+            finally:
+                request_id.reset(token)
+            response[REQUEST_ID_HEADER] = request.request_id
+            return response
+    else:
+        def middleware(request):
+            token = start_request(request)
+            try:
+                response = get_response(request)
+            finally:
+                request_id.reset(token)
+            response[REQUEST_ID_HEADER] = request.request_id
+            return response
+    return middleware
@@ -0,0 +1,47 @@
+"""This script is use to move the votes of the closed polls out of the vote table."""
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from polls.archive import archive_question, restore_question
+from polls.models import Question
+
+
+class Command(BaseCommand):
+    """Command that archive the questions closed for some days, or restore one question."""
+
+    help = 'Archive the votes of the closed questions, or restore the votes of an archived question.'
+
+    def add_arguments(self, parser):
+        """Add the options of the command."""
+        parser.add_argument('--days', type=float, default=7,
+                            help='Archive the questions closed for at least this many days.')
+        parser.add_argument('--question', type=int, help='Only archive this question id.')
+        parser.add_argument('--restore', type=int, metavar='QUESTION', help='Restore the votes of this question id.')
+        parser.add_argument('--dry-run', action='store_true', help='List the questions without archiving them.')
+
+    def handle(self, *args, **options):
+        """Archive or restore the questions."""
+        if options['restore'] is not None:
+            try:
+                question = Question.objects.get(pk=options['restore'], archived=True)
+            except Question.DoesNotExist:
+                raise CommandError('Question {} is not archived.'.format(options['restore']))
+            restore_question(question)
+            self.stdout.write(self.style.SUCCESS('Restored question {}.'.format(question.pk)))
+            return
+        before = timezone.now() - datetime.timedelta(days=options['days'])
+        questions = Question.objects.filter(archived=False, end_date__lt=before).order_by('end_date')
+        if options['question'] is not None:
+            questions = questions.filter(pk=options['question'])
+        archived = 0
+        for question in questions.iterator():
+            if options['dry_run']:
+                self.stdout.write('Question {}: {}'.format(question.pk, question))
+                continue
+            result = archive_question(question)
+            archived += 1
+            self.stdout.write('Question {}: {} votes archived in {} bytes.'.format(
+                question.pk, result.total_votes, len(result.ballots)))
+        self.stdout.write(self.style.SUCCESS('{} question(s) archived.'.format(archived)))
@@ -0,0 +1,91 @@
+"""This script is use to measure the response time of the polls pages."""
+import random
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from polls.benchmark import BENCH_USER_PREFIX, QueryCounter, measure, summarize
+from polls.models import Choice, Question, Vote
+
+
+class Command(BaseCommand):
+    """Command that time the index, detail, vote and results pages on the seeded data.
+
+    Run `manage.py seed_polls` first. With `--compare-indexes` the indexes of the
+    polls models are dropped for a first run and created again for a second run.
+    """
+
+    help = 'Benchmark the index, detail, vote and results endpoints.'
+
+    def add_arguments(self, parser):
+        """Add the options of the command."""
+        parser.add_argument('--repeat', type=int, default=200, help='Requests per endpoint.')
+        parser.add_argument('--compare-indexes', action='store_true',
+                            help='Also run without the indexes of the polls models.')
+        parser.add_argument('--seed', type=int, default=0, help='Seed of the random generator.')
+
+    def handle(self, *args, **options):
+        """Run the benchmark and print one line per endpoint."""
+        user = User.objects.filter(username__startswith=BENCH_USER_PREFIX).order_by('id').first()
+        if user is None:
+            raise CommandError('No benchmark data, run "manage.py seed_polls" first.')
+        if options['compare_indexes']:
+            with connection.schema_editor() as editor:
+                for model in (Question, Vote):
+                    for index in model._meta.indexes:
+                        editor.remove_index(model, index)
+            try:
+                self.run(user, 'without indexes', options)
+            finally:
+                with connection.schema_editor() as editor:
+                    for model in (Question, Vote):
+                        for index in model._meta.indexes:
+                            editor.add_index(model, index)
+        self.run(user, 'with indexes', options)
+
+    def run(self, user, label, options):
+        """Time every endpoint and write the result."""
+        rng = random.Random(options['seed'])
+        now = timezone.now()
+        published = list(Question.objects.filter(pub_date__lte=now).values_list('id', flat=True)[:1000])
+        open_choices = list(Choice.objects.filter(question__pub_date__lte=now, question__end_date__gte=now)
+                            .values_list('question_id', 'id')[:1000])
+        if not published or not open_choices:
+            raise CommandError('The benchmark data has no published or open question.')
+        client = Client()
+        client.force_login(user)
+
+        def vote():
+            question_id, choice_id = rng.choice(open_choices)
+            return client.post(reverse('polls:vote', args=(question_id,)), {'choice': choice_id})
+
+        def checked(name, status, send):
+            # A request answered with another status, like a 429 of the throttle, would time the wrong path.
+            def request():
+                response = send()
+                if response.status_code != status:
+                    raise CommandError('The {} request answered {} instead of {}.'.format(
+                        name, response.status_code, status))
+            return name, request
+
+        endpoints = [
+            checked('index', 200, lambda: client.get(reverse('polls:index'))),
+            checked('detail', 200, lambda: client.get(reverse('polls:detail', args=(rng.choice(published),)))),
+            checked('vote', 302, vote),
+            checked('results', 200, lambda: client.get(reverse('polls:results', args=(rng.choice(published),)))),
+        ]
+        self.stdout.write(self.style.MIGRATE_HEADING('Endpoints {}:'.format(label)))
+        # One client send every vote, the rate limits would answer most of them with 429.
+        with override_settings(ALLOWED_HOSTS=['testserver'], POLLS_RATE_LIMITS={}):
+            for name, request in endpoints:
+                queries = QueryCounter()
+                with connection.execute_wrapper(queries):
+                    request()
+                stats = summarize(measure(request, options['repeat']))
+                self.stdout.write('  {:<8} mean {mean_ms:>9.3f} ms  p50 {p50_ms:>9.3f} ms  p95 {p95_ms:>9.3f} ms  '
+                                  'p99 {p99_ms:>9.3f} ms  queries {queries}'.format(
+                                      name, queries=queries.count, **stats))
@@ -0,0 +1,76 @@
+"""This script is use to measure the time that the views spend on logging."""
+import logging
+import os
+import tempfile
+import threading
+
+from django.core.management.base import BaseCommand
+
+from polls.benchmark import measure, summarize
+from polls.log import BackgroundHandler, JsonFormatter, RequestIdFilter
+
+
+class Command(BaseCommand):
+    """Command that compare the blocking log handlers with the background handler.
+
+    The blocking setup is the one polls/views.py used before: a file handler and a
+    stream handler that format and write in the request thread. Every thread log like
+    a vote request, so the lock of the handlers is shared like under a threaded server.
+    """
+
+    help = 'Benchmark the per-request cost of the blocking and the background log handlers.'
+
+    def add_arguments(self, parser):
+        """Add the options of the command."""
+        parser.add_argument('--records', type=int, default=2000, help='Records logged per thread.')
+        parser.add_argument('--threads', type=int, default=8, help='Number of threads that log at once.')
+
+    def handle(self, *args, **options):
+        """Run the benchmark and print one line per setup."""
+        with tempfile.TemporaryDirectory() as directory, open(os.devnull, 'w') as console:
+            blocking = [logging.FileHandler(os.path.join(directory, 'blocking.log')), logging.StreamHandler(console)]
+            for handler in blocking:
+                handler.setFormatter(logging.Formatter('%(asctime)s: %(name)s:%(message)s'))
+            background = BackgroundHandler(handlers=[logging.FileHandler(os.path.join(directory, 'background.log')),
+                                                     logging.StreamHandler(console)])
+            background.setFormatter(JsonFormatter())
+            background.addFilter(RequestIdFilter())
+
+            self.run('blocking', blocking, eager=True, options=options)
+            self.run('background', [background], eager=False, options=options)
+            background.close()
+            for handler in blocking:
+                handler.close()
+
+    def run(self, label, handlers, eager, options):
+        """Log from many threads at once through the handlers and write the time per record."""
+        logger = logging.getLogger('polls.bench.{}'.format(label))
+        logger.propagate = False
+        logger.setLevel(logging.INFO)
+        for handler in handlers:
+            logger.addHandler(handler)
+        samples = []
+        lock = threading.Lock()
+
+        def log():
+            if eager:
+                logger.info('Vote: This {} vote at question id:{}'.format('bench-user', 42))
+            else:
+                logger.info('Vote: This %s vote at question id:%s', 'bench-user', 42, extra={'event': 'vote'})
+
+        def worker():
+            durations = measure(log, options['records'])
+            with lock:
+                samples.extend(durations)
+
+        threads = [threading.Thread(target=worker) for _ in range(options['threads'])]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        for handler in handlers:
+            logger.removeHandler(handler)
+        stats = summarize(samples)
+        self.stdout.write('  {:<10} mean {:>9.1f} us  p50 {:>9.1f} us  p95 {:>9.1f} us  p99 {:>9.1f} us'.format(
+            label, stats['mean_ms'] * 1000, stats['p50_ms'] * 1000, stats['p95_ms'] * 1000,
+            stats['p99_ms'] * 1000))
@@ -0,0 +1,51 @@
+"""This script is use to compare the offset and keyset pages of the index page."""
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from polls.benchmark import measure, summarize
+from polls.models import Question
+from polls.pagination import ORDERING, after_cursor, encode_cursor, keyset_page, offset_page
+
+
+class Command(BaseCommand):
+    """Command that time the offset and keyset queries of the index page at several page depths.
+
+    Seed the questions first, for example `manage.py seed_polls --questions 100000 --votes 0`.
+    """
+
+    help = 'Benchmark offset and keyset pagination of the index page.'
+
+    def add_arguments(self, parser):
+        """Add the options of the command."""
+        parser.add_argument('--pages', default='1,10,100,1000,4000', help='Comma separated page numbers.')
+        parser.add_argument('--page-size', type=int, default=20)
+        parser.add_argument('--repeat', type=int, default=50)
+
+    def handle(self, *args, **options):
+        """Time both kinds of page at every depth and print one line per depth."""
+        now = timezone.now()
+        questions = Question.objects.with_status(now).published(now)
+        total = questions.count()
+        if not total:
+            raise CommandError('No published question, run "manage.py seed_polls" first.')
+        size = options['page_size']
+        self.stdout.write('{} published questions, {} per page.'.format(total, size))
+        for number in (int(value) for value in options['pages'].split(',')):
+            if (number - 1) * size >= total:
+                self.stdout.write('  page {:>6}: skipped, only {} questions'.format(number, total))
+                continue
+            cursor = None
+            if number > 1:
+                cursor = encode_cursor(questions.order_by(*ORDERING)[(number - 1) * size - 1])
+
+            def keyset():
+                if cursor is None:
+                    return keyset_page(questions, size)
+                return keyset_page(after_cursor(Question.objects.with_status(now), cursor).published(now), size,
+                                   cursor)
+
+            offset = summarize(measure(lambda: offset_page(questions, number, size), options['repeat']))
+            keyset = summarize(measure(keyset, options['repeat']))
+            self.stdout.write('  page {:>6}: offset p50 {:>8.3f} ms p95 {:>8.3f} ms | keyset p50 {:>8.3f} ms '
+                              'p95 {:>8.3f} ms'.format(number, offset['p50_ms'], offset['p95_ms'],
+                                                       keyset['p50_ms'], keyset['p95_ms']))
@@ -0,0 +1,50 @@
+"""This script is use to measure the cost of the session and the user of the authenticated requests."""
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from polls.benchmark import BENCH_USER_PREFIX, QueryCounter, measure, summarize
+from polls.models import Question
+
+ENGINES = ['db', 'cached_db', 'signed_cookies']
+
+
+class Command(BaseCommand):
+    """Command that time a logged in request to the detail page with every session mode.
+
+    Every session engine is run with the user read from the database and with the user
+    read from the cache. Run `manage.py seed_polls` first. The local memory cache of the
+    default settings is enough to compare the modes in one process.
+    """
+
+    help = 'Benchmark the authenticated request path with every session engine.'
+
+    def add_arguments(self, parser):
+        """Add the options of the command."""
+        parser.add_argument('--repeat', type=int, default=500, help='Requests per mode.')
+
+    def handle(self, *args, **options):
+        """Run the benchmark and print one line per session engine and user cache."""
+        user = User.objects.filter(username__startswith=BENCH_USER_PREFIX).order_by('id').first()
+        question = Question.objects.published(timezone.now()).order_by('-pub_date').first()
+        if user is None or question is None:
+            raise CommandError('No benchmark data, run "manage.py seed_polls" first.')
+        url = reverse('polls:detail', args=(question.pk,))
+        for engine in ENGINES:
+            for timeout in (0, 300):
+                with override_settings(ALLOWED_HOSTS=['testserver'], POLLS_USER_CACHE_TIMEOUT=timeout,
+                                       SESSION_ENGINE='django.contrib.sessions.backends.' + engine):
+                    client = Client()
+                    client.force_login(user)
+                    client.get(url)
+                    queries = QueryCounter()
+                    with connection.execute_wrapper(queries):
+                        client.get(url)
+                    stats = summarize(measure(lambda: client.get(url), options['repeat']))
+                    client.logout()
+                label = '{} {}'.format(engine, 'cached user' if timeout else 'database user')
+                self.stdout.write('  {:<30} mean {mean_ms:>8.3f} ms  p50 {p50_ms:>8.3f} ms  p95 {p95_ms:>8.3f} ms  '
+                                  'queries {queries}'.format(label, queries=queries.count, **stats))
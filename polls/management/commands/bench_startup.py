@@ -0,0 +1,146 @@
+"""This script is use to measure the cold start of a KU Polls worker."""
+import json
+import os
+import subprocess
+import sys
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from polls.benchmark import import_profile, summarize
+
+# Run by a new interpreter: import the application like the server do, then answer the
+# first request in a forked process like a worker of `gunicorn --preload`.
+CHILD = '''
+import asyncio, json, os, resource, sys, time, wsgiref.util
+profile, path = sys.argv[1:]
+started = time.perf_counter()
+if profile == 'wsgi':
+    from mysite.wsgi import application
+else:
+    from mysite.asgi import application
+imported = time.perf_counter()
+
+
+async def asgi_get():
+    scope = {'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET',
+             'scheme': 'http', 'path': path, 'raw_path': path.encode(), 'root_path': '', 'query_string': b'',
+             'headers': [(b'host', b'127.0.0.1')], 'client': ('127.0.0.1', 50000), 'server': ('127.0.0.1', 80)}
+    body = [{'type': 'http.request', 'body': b'', 'more_body': False}]
+    messages = []
+
+    async def receive():
+        if body:
+            return body.pop()
+        await asyncio.Event().wait()
+
+    async def send(message):
+        messages.append(message)
+
+    await application(scope, receive, send)
+    return messages[0]['status']
+
+
+def first_request():
+    begin = time.perf_counter()
+    if profile == 'wsgi':
+        environ = {'PATH_INFO': path}
+        wsgiref.util.setup_testing_defaults(environ)
+        statuses = []
+        response = application(environ, lambda status, headers, exc_info=None: statuses.append(status))
+        b''.join(response)
+        response.close()
+        status = int(statuses[0].split()[0])
+    else:
+        status = asyncio.run(asgi_get())
+    return {'first_request': time.perf_counter() - begin, 'status': status}
+
+
+if hasattr(os, 'fork'):
+    read, write = os.pipe()
+    pid = os.fork()
+    if not pid:
+        os.close(read)
+        os.write(write, json.dumps(first_request()).encode())
+        os._exit(0)
+    os.close(write)
+    with os.fdopen(read) as stream:
+        result = json.load(stream)
+    os.waitpid(pid, 0)
+else:
+    result = first_request()
+result.update(startup=imported - started, memory_kb=resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+print(json.dumps(result))
+'''
+
+
+class Command(BaseCommand):
+    """Command that start new interpreters and time the import of the application and its first request.
+
+    Every run import mysite/wsgi.py (or mysite/asgi.py) in a new process, which create
+    the application and preload it, then fork and answer one GET request in the child
+    like a worker of `gunicorn --preload`. Compare with `--no-preload`. One more run
+    with `python -X importtime` show the packages that take the import time. With
+    `--budget` the command fail when the median cold start is slower, for the CI.
+    """
+
+    help = 'Benchmark the cold start of the WSGI or ASGI application and profile its imports.'
+
+    def add_arguments(self, parser):
+        """Add the options of the command."""
+        parser.add_argument('--profile', choices=['wsgi', 'asgi'], default='wsgi', help='Application to start.')
+        parser.add_argument('--runs', type=int, default=10, help='Number of new processes.')
+        parser.add_argument('--path', default='/polls/', help='Path of the first request.')
+        parser.add_argument('--no-preload', action='store_false', dest='preload',
+                            help='Start with POLLS_PRELOAD=false.')
+        parser.add_argument('--top', type=int, default=10, help='Number of packages in the import profile.')
+        parser.add_argument('--budget', type=float, help='Fail when the median cold start take more milliseconds.')
+
+    def handle(self, *args, **options):
+        """Run the benchmark, print the timings and the import profile and check the budget."""
+        env = dict(os.environ, ALLOWED_HOSTS='127.0.0.1', POLLS_PRELOAD=str(options['preload']).lower(),
+                   POLLS_ASYNC_VIEWS=str(options['profile'] == 'asgi').lower())
+        samples = {'process': [], 'startup': [], 'first_request': [], 'cold_start': []}
+        memory = []
+        for _ in range(options['runs']):
+            started = time.perf_counter()
+            result = self.start(options, env)
+            samples['process'].append(time.perf_counter() - started)
+            samples['startup'].append(result['startup'])
+            samples['first_request'].append(result['first_request'])
+            samples['cold_start'].append(result['startup'] + result['first_request'])
+            memory.append(result['memory_kb'])
+        self.stdout.write('{} with{} preload, first request {} answered {}:'.format(
+            options['profile'].upper(), '' if options['preload'] else 'out', options['path'], result['status']))
+        for name, durations in samples.items():
+            self.stdout.write('  {:<16} mean {mean_ms:>8.3f} ms  p50 {p50_ms:>8.3f} ms  p95 {p95_ms:>8.3f} ms'
+                              .format(name, **summarize(durations)))
+        self.stdout.write('  {:<16} {:>8.1f} MB'.format('master memory', max(memory) / 1024))
+
+        child = subprocess.run([sys.executable, '-X', 'importtime', '-c', CHILD, options['profile'], options['path']],
+                               cwd=settings.BASE_DIR, env=env, capture_output=True, text=True)
+        packages = import_profile(child.stderr)
+        total = sum(seconds for _, seconds, _ in packages)
+        self.stdout.write(self.style.MIGRATE_HEADING('Import time by package ({:.1f} ms in total):'.format(
+            total * 1000)))
+        for package, seconds, count in packages[:options['top']]:
+            self.stdout.write('  {:<24} {:>8.1f} ms  {:>5.1f}%  {} modules'.format(
+                package, seconds * 1000, seconds / total * 100, count))
+
+        median = summarize(samples['cold_start'])['p50_ms']
+        if options['budget'] is not None and median > options['budget']:
+            raise CommandError('The median cold start took {:.1f} ms, more than the budget of {:.1f} ms.'.format(
+                median, options['budget']))
+
+    @staticmethod
+    def start(options, env):
+        """Run one new process and return what it measured."""
+        child = subprocess.run([sys.executable, '-c', CHILD, options['profile'], options['path']],
+                               cwd=settings.BASE_DIR, env=env, capture_output=True, text=True)
+        if child.returncode or not child.stdout.strip():
+            raise CommandError('The application did not start:\n{}'.format(child.stderr[-2000:]))
+        result = json.loads(child.stdout.strip().splitlines()[-1])
+        if result['status'] >= 400:
+            raise CommandError('The first request of {} answered {}.'.format(options['path'], result['status']))
+        return result
@@ -0,0 +1,87 @@
+"""This script is use to measure the rendering time of the polls templates."""
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.contrib.sessions.backends.signed_cookies import SessionStore
+from django.core.management.base import BaseCommand, CommandError
+from django.template.backends.django import DjangoTemplates
+from django.test import RequestFactory
+
+from polls.benchmark import measure, summarize
+from polls.caching import expire_results, invalidate_index
+from polls.forms import CreateUserForm
+from polls.models import Question
+from polls.views import IndexView, ResultsView
+
+
+def template_backend(cached):
+    """Return a template backend like the one of the settings, with or without the cached loader."""
+    params = dict(settings.TEMPLATES[0], NAME='bench', APP_DIRS=False)
+    del params['BACKEND']
+    loaders = list(settings.TEMPLATE_LOADERS)
+    params['OPTIONS'] = dict(params['OPTIONS'],
+                             loaders=[('django.template.loaders.cached.Loader', loaders)] if cached else loaders)
+    return DjangoTemplates(params)
+
+
+class Command(BaseCommand):
+    """Command that time the rendering of every polls template with its view context.
+
+    Every template is rendered with the plain and the cached template loader. The index
+    and result pages are rendered with their cached fragment missing and present, the
+    time include the queries that their context make while rendering. Run
+    `manage.py seed_polls` first.
+    """
+
+    help = 'Benchmark the rendering of the polls templates.'
+
+    def add_arguments(self, parser):
+        """Add the options of the command."""
+        parser.add_argument('--repeat', type=int, default=500, help='Renders per template and setup.')
+
+    def handle(self, *args, **options):
+        """Render every template and print one line per template and setup."""
+        question = Question.objects.published().filter(choice__isnull=False).order_by('-pub_date').first()
+        if question is None:
+            raise CommandError('No published question with choices, run "manage.py seed_polls" first.')
+        request = RequestFactory().get('/polls/')
+        request.user = AnonymousUser()
+        request.session = SessionStore()
+
+        def index_context():
+            view = IndexView()
+            view.setup(request)
+            view.object_list = view.get_queryset()
+            return view.get_context_data()
+
+        def results_context():
+            view = ResultsView()
+            view.setup(request, pk=question.pk)
+            view.object = view.get_queryset().get(pk=question.pk)
+            return view.get_context_data(object=view.object)
+
+        pages = [
+            ('polls/index.html', index_context, invalidate_index),
+            ('polls/detail.html', lambda: {'question': question}, None),
+            ('polls/results.html', results_context, lambda: expire_results(question)),
+            ('polls/login.html', dict, None),
+            ('polls/registration.html', lambda: {'form': CreateUserForm()}, None),
+        ]
+        for cached in (False, True):
+            backend = template_backend(cached)
+            loader = 'cached loader' if cached else 'plain loader'
+            self.stdout.write(self.style.MIGRATE_HEADING('Templates with the {}:'.format(loader)))
+            for name, context, expire in pages:
+                render = self.renderer(backend, name, context, request)
+                setups = [('', None)] if expire is None else [('fragment miss', expire), ('fragment hit', None)]
+                for label, setup in setups:
+                    render()
+                    stats = summarize(measure(render, options['repeat'], setup=setup))
+                    self.stdout.write('  {:<24} {:<14} mean {mean_ms:>8.3f} ms  p50 {p50_ms:>8.3f} ms  '
+                                      'p95 {p95_ms:>8.3f} ms'.format(name, label, **stats))
+
+    @staticmethod
+    def renderer(backend, name, context, request):
+        """Return a function that load the template and render it with a new context."""
+        def render():
+            return backend.get_template(name).render(context(), request)
+        return render
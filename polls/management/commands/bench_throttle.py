@@ -0,0 +1,61 @@
+"""This script is use to measure the CPU time that a login attack cost with and without the rate limit."""
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth.models import AnonymousUser
+from django.contrib.messages.storage import default_storage
+from django.contrib.sessions.backends.signed_cookies import SessionStore
+from django.core.management.base import BaseCommand
+from django.test import RequestFactory
+from django.test.utils import override_settings
+
+from polls.benchmark import summarize
+from polls.views import login_page
+
+
+class Command(BaseCommand):
+    """Command that send many wrong passwords to the login view from a few addresses.
+
+    The attack is run once without limits and once with `POLLS_RATE_LIMITS`. Every wrong
+    password that reach `authenticate()` cost a full password hash, so without the limit
+    the CPU time grow with the number of attempts, with the limit it stay near the cost
+    of the allowed attempts.
+    """
+
+    help = 'Benchmark the login view under a password guessing attack with and without rate limits.'
+
+    def add_arguments(self, parser):
+        """Add the options of the command."""
+        parser.add_argument('--attempts', type=int, default=300, help='Number of login attempts.')
+        parser.add_argument('--addresses', type=int, default=4, help='Number of attacking addresses.')
+        parser.add_argument('--concurrency', type=int, default=8, help='Number of concurrent attackers.')
+
+    def handle(self, *args, **options):
+        """Run the attack twice and print the CPU time, the rejected attempts and the latency."""
+        factory = RequestFactory()
+
+        def attempt(number):
+            request = factory.post('/polls/login/', {'username': 'user{}'.format(number % 10), 'password': 'guess'},
+                                   REMOTE_ADDR='10.0.0.{}'.format(number % options['addresses'] + 1))
+            request.user = AnonymousUser()
+            request.session = SessionStore()
+            request._messages = default_storage(request)
+            started = time.perf_counter()
+            status = login_page(request).status_code
+            return status, time.perf_counter() - started
+
+        for label, limits in (('without limits', {}), ('with limits', None)):
+            overrides = {'POLLS_RATE_LIMITER': 'polls.throttle.LocalLimiter'}
+            if limits is not None:
+                overrides['POLLS_RATE_LIMITS'] = limits
+            with override_settings(**overrides):
+                cpu = time.process_time()
+                started = time.perf_counter()
+                with ThreadPoolExecutor(max_workers=options['concurrency']) as executor:
+                    results = list(executor.map(attempt, range(options['attempts'])))
+                elapsed = time.perf_counter() - started
+                cpu = time.process_time() - cpu
+            rejected = sum(1 for status, _ in results if status == 429)
+            stats = summarize([duration for _, duration in results])
+            self.stdout.write('{:<15} {} attempts in {:.2f} s  cpu {:.2f} s  rejected {}  mean {mean_ms:.3f} ms  '
+                              'p95 {p95_ms:.3f} ms'.format(label, len(results), elapsed, cpu, rejected, **stats))
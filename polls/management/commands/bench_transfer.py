@@ -0,0 +1,71 @@
+"""This script is use to measure the throughput of the poll export and import."""
+import os
+import tempfile
+import time
+import tracemalloc
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Count
+
+from polls.models import Question
+from polls.transfer import FORMATS, export_records, import_records, read_records, write_records
+
+
+class Command(BaseCommand):
+    """Command that export the largest poll in every format and import it back.
+
+    Run `manage.py seed_polls` first. The imports are rolled back, so the database is
+    not changed. With `--trace-memory` the peak memory of every step is shown too, it
+    slow the steps down.
+    """
+
+    help = 'Benchmark the export and import of a poll in CSV and JSON Lines.'
+
+    def add_arguments(self, parser):
+        """Add the options of the command."""
+        parser.add_argument('--question', type=int, help='Id of the question, default the one with most votes.')
+        parser.add_argument('--batch-size', type=int, default=2000, help='Rows per chunk and per batch.')
+        parser.add_argument('--trace-memory', action='store_true', help='Show the peak memory of every step.')
+
+    def handle(self, *args, **options):
+        """Run the benchmark and print one line per step."""
+        questions = Question.objects.all()
+        if options['question']:
+            questions = questions.filter(pk=options['question'])
+        question = questions.annotate(votes=Count('vote')).order_by('-votes').first()
+        if question is None:
+            raise CommandError('No question to export, run "manage.py seed_polls" first.')
+        heading = 'Question {} with {} votes:'.format(question.id, question.votes)
+        self.stdout.write(self.style.MIGRATE_HEADING(heading))
+        with tempfile.TemporaryDirectory() as directory:
+            for fmt in FORMATS:
+                path = os.path.join(directory, 'poll.' + fmt)
+
+                def export():
+                    with open(path, 'w', encoding='utf-8', newline='') as stream:
+                        return write_records(export_records(question, options['batch_size']), stream, fmt)
+
+                def restore():
+                    with transaction.atomic():
+                        with open(path, encoding='utf-8', newline='') as stream:
+                            result = import_records(read_records(stream, fmt), options['batch_size'])
+                        transaction.set_rollback(True)
+                    return result['votes']
+
+                self.step('export ' + fmt, export, options['trace_memory'])
+                self.step('import ' + fmt, restore, options['trace_memory'])
+
+    def step(self, label, function, trace_memory):
+        """Run one step and write its throughput."""
+        if trace_memory:
+            tracemalloc.start()
+        started = time.perf_counter()
+        count = function()
+        elapsed = time.perf_counter() - started
+        line = '  {:<12} {:>10} rows in {:>7.2f} s  {:>10.0f} rows/s'.format(
+            label, count, elapsed, count / elapsed if elapsed else 0)
+        if trace_memory:
+            line += '  peak {:>8.1f} KiB'.format(tracemalloc.get_traced_memory()[1] / 1024)
+            tracemalloc.stop()
+        self.stdout.write(line)
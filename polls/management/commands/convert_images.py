@@ -0,0 +1,91 @@
+"""This script is use to convert the GIF images of the static files to smaller formats."""
+import os
+import re
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Pillow format and encoder options of every output, in the order of the CSS image-set.
+ENCODERS = {
+    'avif': ('AVIF', {'speed': 8}),
+    'webp': ('WEBP', {'method': 4}),
+}
+# The relative url of a converted image in a stylesheet, like url("images/background2.avif").
+CSS_IMAGE = re.compile(r'url\(\s*["\']?([^"\')]+)\.({})["\']?\s*\)'.format('|'.join(ENCODERS)))
+
+
+def referenced_images(directories):
+    """Return the (GIF, format) pairs of the converted images that the stylesheets use.
+
+    Args:
+        directories: the directories of the static files.
+
+    Returns: the sorted pairs of the GIF path and the format of the copy.
+    """
+    images = set()
+    for directory in directories:
+        for stylesheet in Path(directory).rglob('*.css'):
+            for name, fmt in CSS_IMAGE.findall(stylesheet.read_text(encoding='utf-8')):
+                source = (stylesheet.parent / name).with_suffix('.gif')
+                if source.exists():
+                    images.add((source, fmt))
+    return sorted(images)
+
+
+class Command(BaseCommand):
+    """Command that write the AVIF and WebP copies of the GIF images that the stylesheets use.
+
+    It is run after a GIF or a stylesheet change, and its output is committed with the
+    stylesheet, so the static files work before `collectstatic` too. Only the formats that
+    a stylesheet reference are written. The animation is kept, and an output that does
+    not save enough bytes on its GIF is not written, the GIF stay the fallback of the
+    browsers that read none of the formats.
+    """
+
+    help = 'Convert the static GIF images used by the stylesheets to AVIF and WebP.'
+
+    def add_arguments(self, parser):
+        """Add the options of the command."""
+        parser.add_argument('directories', nargs='*', help='Directories to convert, STATICFILES_DIRS if not given.')
+        parser.add_argument('--format', action='append', dest='formats', choices=sorted(ENCODERS),
+                            help='Output format, can be repeated. All of them if not given.')
+        parser.add_argument('--quality', type=int, default=60, help='Quality of the lossy encoders, from 0 to 100.')
+        parser.add_argument('--min-saving', type=float, default=0.2,
+                            help='Fraction of the GIF size an output must save to be kept.')
+        parser.add_argument('--force', action='store_true', help='Convert the images that are up to date again.')
+
+    def handle(self, *args, **options):
+        """Convert the images that changed since their last conversion."""
+        try:
+            from PIL import Image, features
+        except ImportError:
+            raise CommandError('Converting the images needs Pillow, run `pip install Pillow`.')
+        formats = set()
+        for fmt in options['formats'] or ENCODERS:
+            if features.check(fmt):
+                formats.add(fmt)
+            else:
+                self.stderr.write('Pillow cannot write {}, skipped.'.format(fmt))
+        directories = options['directories'] or settings.STATICFILES_DIRS
+        saved = 0
+        for source, fmt in referenced_images(directories):
+            if fmt not in formats:
+                continue
+            size = source.stat().st_size
+            target = source.with_suffix('.' + fmt)
+            if not options['force'] and target.exists() and target.stat().st_mtime >= source.stat().st_mtime:
+                continue
+            name, encoder_options = ENCODERS[fmt]
+            partial = target.with_name(target.name + '.partial')
+            with Image.open(source) as image:
+                image.save(partial, format=name, save_all=True, quality=options['quality'], **encoder_options)
+            converted = partial.stat().st_size
+            if converted > size * (1 - options['min_saving']):
+                partial.unlink()
+                self.stdout.write('{}: {} bytes as {}, not kept.'.format(source, converted, fmt))
+                continue
+            os.replace(partial, target)
+            saved += size - converted
+            self.stdout.write('{}: {} bytes, {} bytes as {}.'.format(source, size, converted, fmt))
+        self.stdout.write(self.style.SUCCESS('{} bytes saved.'.format(saved)))
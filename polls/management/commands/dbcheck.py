@@ -0,0 +1,56 @@
+"""This script is use to check the health and the latency of the database."""
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError, connections
+
+from polls.benchmark import summarize
+
+
+class Command(BaseCommand):
+    """Command that connect to the database, run small queries and report the latency.
+
+    It exit with an error when the database cannot be reached, so it can be used
+    as the health check of a deployment.
+    """
+
+    help = 'Check the database connection and measure the query latency.'
+
+    def add_arguments(self, parser):
+        """Add the options of the command."""
+        parser.add_argument('--database', default='default')
+        parser.add_argument('--repeat', type=int, default=100, help='Number of round trips to measure.')
+        parser.add_argument('--max-p95', type=float, help='Fail when the p95 latency in ms is higher.')
+
+    def handle(self, *args, **options):
+        """Run the checks and print the report."""
+        connection = connections[options['database']]
+        settings = connection.settings_dict
+        try:
+            started = time.perf_counter()
+            connection.ensure_connection()
+            connect_ms = (time.perf_counter() - started) * 1000
+            samples = []
+            with connection.cursor() as cursor:
+                for _ in range(options['repeat']):
+                    started = time.perf_counter()
+                    cursor.execute('SELECT 1')
+                    cursor.fetchone()
+                    samples.append(time.perf_counter() - started)
+                pragmas = {}
+                if connection.vendor == 'sqlite':
+                    for pragma in ('journal_mode', 'synchronous', 'busy_timeout'):
+                        cursor.execute('PRAGMA {}'.format(pragma))
+                        pragmas[pragma] = cursor.fetchone()[0]
+        except DatabaseError as error:
+            raise CommandError('Database {!r} is not reachable: {}'.format(options['database'], error))
+        stats = summarize(samples)
+        self.stdout.write('Backend: {} ({})'.format(connection.vendor, settings['NAME']))
+        self.stdout.write('Persistent connections: CONN_MAX_AGE={}'.format(settings['CONN_MAX_AGE']))
+        for pragma, value in pragmas.items():
+            self.stdout.write('PRAGMA {}: {}'.format(pragma, value))
+        self.stdout.write('Connect: {:.3f} ms'.format(connect_ms))
+        self.stdout.write('SELECT 1: p50 {p50_ms:.3f} ms, p95 {p95_ms:.3f} ms, p99 {p99_ms:.3f} ms'.format(**stats))
+        if options['max_p95'] is not None and stats['p95_ms'] > options['max_p95']:
+            raise CommandError('p95 latency {:.3f} ms is over {:.3f} ms.'.format(stats['p95_ms'], options['max_p95']))
+        self.stdout.write(self.style.SUCCESS('Database is healthy.'))
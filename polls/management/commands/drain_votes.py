@@ -0,0 +1,30 @@
+"""This script is use to apply the queued votes to the database."""
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from polls.ingest import VoteQueue
+
+
+class Command(BaseCommand):
+    """Command that apply the vote journals, including the ones left by crashed processes.
+
+    Run it after a crash or from a scheduler when the drainer thread is disabled
+    with `POLLS_VOTE_QUEUE_INTERVAL=0`.
+    """
+
+    help = 'Apply the queued votes of the write-behind vote queue.'
+
+    def add_arguments(self, parser):
+        """Add the options of the command."""
+        parser.add_argument('--force', action='store_true',
+                            help='Also take the journals whose owner cannot be checked (stop the workers first).')
+
+    def handle(self, *args, **options):
+        """Recover the journals of the stopped processes and apply them."""
+        queue = VoteQueue(settings.POLLS_VOTE_QUEUE_DIR, batch_size=settings.POLLS_VOTE_QUEUE_BATCH_SIZE,
+                          interval=0)
+        if options['force']:
+            queue.recover(force=True)
+        applied = queue.drain()
+        queue.stop()
+        self.stdout.write(self.style.SUCCESS('Applied {} queued vote(s).'.format(applied)))
@@ -0,0 +1,41 @@
+"""This script is use to export a poll with its choices and votes to a file."""
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from polls.models import Question
+from polls.transfer import FORMATS, export_records, guess_format, write_records
+
+
+class Command(BaseCommand):
+    """Command that write a question, its choices and its votes as CSV or JSON Lines."""
+
+    help = 'Export a question with its choices and votes to CSV or JSON Lines.'
+
+    def add_arguments(self, parser):
+        """Add the options of the command."""
+        parser.add_argument('question', type=int, help='Id of the question to export.')
+        parser.add_argument('--output', default='-', help='File to write, "-" for the standard output.')
+        parser.add_argument('--format', choices=FORMATS, help='Format of the file, default from its extension.')
+        parser.add_argument('--chunk-size', type=int, default=2000, help='Rows read from the database at once.')
+
+    def handle(self, *args, **options):
+        """Export the question and report the throughput."""
+        try:
+            question = Question.objects.get(pk=options['question'])
+        except Question.DoesNotExist:
+            raise CommandError('Question {} does not exist.'.format(options['question']))
+        fmt = options['format'] or guess_format(options['output'])
+        started = time.perf_counter()
+        records = export_records(question, chunk_size=options['chunk_size'])
+        if options['output'] == '-':
+            count = write_records(records, sys.stdout, fmt)
+            report = self.stderr
+        else:
+            with open(options['output'], 'w', encoding='utf-8', newline='') as stream:
+                count = write_records(records, stream, fmt)
+            report = self.stdout
+        elapsed = time.perf_counter() - started
+        report.write('Exported {} records in {:.2f} s ({:.0f} records/s).'.format(
+            count, elapsed, count / elapsed if elapsed else 0))
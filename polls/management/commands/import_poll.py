@@ -0,0 +1,40 @@
+"""This script is use to import a poll with its choices and votes from a file."""
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from polls.transfer import FORMATS, TransferError, guess_format, import_records, read_records
+
+
+class Command(BaseCommand):
+    """Command that create a new question from a file written by `export_poll`."""
+
+    help = 'Import a question with its choices and votes from CSV or JSON Lines.'
+
+    def add_arguments(self, parser):
+        """Add the options of the command."""
+        parser.add_argument('input', help='File to read, "-" for the standard input.')
+        parser.add_argument('--format', choices=FORMATS, help='Format of the file, default from its extension.')
+        parser.add_argument('--batch-size', type=int, default=2000, help='Votes inserted at once.')
+        parser.add_argument('--create-users', action='store_true',
+                            help='Create the missing users instead of skipping their votes.')
+
+    def handle(self, *args, **options):
+        """Import the question and report the throughput."""
+        fmt = options['format'] or guess_format(options['input'])
+        started = time.perf_counter()
+        try:
+            if options['input'] == '-':
+                result = import_records(read_records(sys.stdin, fmt), options['batch_size'], options['create_users'])
+            else:
+                with open(options['input'], encoding='utf-8', newline='') as stream:
+                    result = import_records(read_records(stream, fmt), options['batch_size'],
+                                            options['create_users'])
+        except (TransferError, ValueError, KeyError) as error:
+            raise CommandError('Cannot import {}: {}'.format(options['input'], error))
+        elapsed = time.perf_counter() - started
+        self.stdout.write('Imported question {} with {} choices and {} votes, skipped {} votes of unknown users, '
+                          'replaced {} earlier votes of the same user, in {:.2f} s ({:.0f} votes/s).'.format(
+                              result['question'].id, result['choices'], result['votes'], result['skipped'],
+                              result['replaced'], elapsed, result['votes'] / elapsed if elapsed else 0))
@@ -0,0 +1,243 @@
+"""This script is use to measure the throughput of a running KU Polls server."""
+import collections
+import http.cookiejar
+import itertools
+import json
+import random
+import shlex
+import subprocess
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from polls.benchmark import BENCH_PASSWORD, BENCH_USER_PREFIX, compare_runs, parse_mix, summarize
+from polls.models import Choice, Question
+
+DEFAULT_MIX = 'index=40,detail=20,vote=10,results=30'
+
+# The endpoints that need a logged in user.
+LOGIN_ENDPOINTS = {'detail', 'vote'}
+
+
+class NoRedirect(urllib.request.HTTPRedirectHandler):
+    """Handler that return the redirect of a vote or a login instead of following it."""
+
+    def redirect_request(self, *args, **kwargs):
+        """Do not follow the redirect."""
+        return None
+
+
+class VirtualUser:
+    """Client of one load test thread, with its own cookies and login."""
+
+    def __init__(self, base, timeout):
+        """Create the client of the server at the base URL."""
+        self.base = base
+        self.timeout = timeout
+        self.cookies = http.cookiejar.CookieJar()
+        self.opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(self.cookies), NoRedirect)
+
+    def request(self, path, data=None):
+        """Send a GET, or a POST with the CSRF token when there is data, and return the status code."""
+        body = None
+        if data is not None:
+            body = urllib.parse.urlencode(dict(data, csrfmiddlewaretoken=self.csrf_token())).encode()
+        request = urllib.request.Request(self.base + path, data=body)
+        try:
+            with self.opener.open(request, timeout=self.timeout) as response:
+                response.read()
+                return response.status
+        except urllib.error.HTTPError as error:
+            error.read()
+            return error.code
+
+    def csrf_token(self):
+        """Return the CSRF token that the server set in the cookies."""
+        return next((cookie.value for cookie in self.cookies if cookie.name == 'csrftoken'), '')
+
+    def login(self, username, password):
+        """Log in and return True if the server accepted the password."""
+        self.request('/polls/login/')
+        return self.request('/polls/login/', {'username': username, 'password': password}) == 302
+
+
+class Command(BaseCommand):
+    """Command that replay a mix of index, detail, vote and results requests and report the latency.
+
+    Every concurrent client is a virtual user that log in as one of the users of
+    `manage.py seed_polls` and send its share of the requests one after the other. Start
+    the server with the WSGI profile (`gunicorn mysite.wsgi`) or the ASGI profile
+    (`uvicorn mysite.asgi:application`), or let `--start` start it, and disable the rate
+    limits of the server with `POLLS_RATE_LIMITS=`. Save the report with `--output` and
+    compare a later run with `--baseline`.
+    """
+
+    help = 'Load test a running server with a mix of the polls pages and save the report as JSON.'
+
+    def add_arguments(self, parser):
+        """Add the options of the command."""
+        parser.add_argument('url', help='Base URL of the server, for example http://127.0.0.1:8000.')
+        parser.add_argument('--requests', type=int, default=2000, help='Total number of requests.')
+        parser.add_argument('--concurrency', type=int, default=32, help='Number of concurrent virtual users.')
+        parser.add_argument('--mix', default=DEFAULT_MIX,
+                            help='Weight of each endpoint, default "{}".'.format(DEFAULT_MIX))
+        parser.add_argument('--path', action='append', dest='paths',
+                            help='Path to request anonymously instead of the mix, can be repeated.')
+        parser.add_argument('--timeout', type=float, default=30, help='Timeout of one request in seconds.')
+        parser.add_argument('--seed', type=int, default=0, help='Seed of the random generator.')
+        parser.add_argument('--start', help='Command that start the server, stopped after the run.')
+        parser.add_argument('--output', help='File where the report is saved as JSON.')
+        parser.add_argument('--baseline', help='Report of an earlier run to compare with.')
+
+    def handle(self, *args, **options):
+        """Run the load test, print the summary and save the report."""
+        base = options['url'].rstrip('/')
+        baseline = None
+        if options['baseline']:
+            with open(options['baseline']) as stream:
+                baseline = json.load(stream)
+        plan = self.plan(options)
+        server = self.start_server(options['start'], base) if options['start'] else None
+        try:
+            report = self.run(base, plan, options)
+        finally:
+            if server is not None:
+                server.terminate()
+                server.wait(timeout=30)
+        for name, stats in sorted(report['endpoints'].items()) + [('total', report['total'])]:
+            self.stdout.write('  {:<24} {count:>6} req  {errors:>4} errors  {throughput:>8.1f} req/s  '
+                              'mean {mean_ms:>8.3f} ms  p50 {p50_ms:>8.3f} ms  p95 {p95_ms:>8.3f} ms  '
+                              'p99 {p99_ms:>8.3f} ms'.format(name, **stats))
+            if stats['errors']:
+                self.stdout.write('  {:<24} status {}'.format('', stats['statuses']))
+        if options['output']:
+            with open(options['output'], 'w') as stream:
+                json.dump(report, stream, indent=2)
+            self.stdout.write('Report saved to {}.'.format(options['output']))
+        if baseline is not None:
+            self.stdout.write(self.style.MIGRATE_HEADING('Change since {}:'.format(baseline.get('commit'))))
+            for name, metric, old, new, change in compare_runs(baseline, report):
+                self.stdout.write('  {:<24} {:<11} {:>10.3f} -> {:>10.3f}  {:+.1f}%'.format(name, metric, old, new,
+                                                                                            change))
+
+    def plan(self, options):
+        """Return the list of (endpoint, path, data) of every request, the same for the same seed."""
+        if options['paths']:
+            paths = itertools.islice(itertools.cycle(options['paths']), options['requests'])
+            return [(path, path, None) for path in paths]
+        try:
+            mix = parse_mix(options['mix'])
+        except ValueError as error:
+            raise CommandError(error)
+        unknown = set(mix) - {'index', 'detail', 'vote', 'results'}
+        if unknown:
+            raise CommandError('Unknown endpoints in the mix: {}'.format(', '.join(sorted(unknown))))
+        now = timezone.now()
+        published = list(Question.objects.published(now).order_by('-pub_date').values_list('id', flat=True)[:1000])
+        open_choices = list(Choice.objects.filter(question__in=Question.objects.open_now(now))
+                            .values_list('question_id', 'id')[:1000])
+        if not published or (mix.get('vote') and not open_choices):
+            raise CommandError('No published or open question, run "manage.py seed_polls" first.')
+        rng = random.Random(options['seed'])
+        names, weights = zip(*mix.items())
+        plan = []
+        for name in rng.choices(names, weights, k=options['requests']):
+            if name == 'index':
+                plan.append((name, '/polls/', None))
+            elif name == 'vote':
+                question_id, choice_id = rng.choice(open_choices)
+                plan.append((name, '/polls/{}/vote/'.format(question_id), {'choice': choice_id}))
+            else:
+                path = '/polls/{}/' if name == 'detail' else '/polls/{}/results/'
+                plan.append((name, path.format(rng.choice(published)), None))
+        return plan
+
+    def run(self, base, plan, options):
+        """Send the requests of the plan with the virtual users and return the report."""
+        concurrency = options['concurrency']
+        users = [VirtualUser(base, options['timeout']) for _ in range(concurrency)]
+        if any(name in LOGIN_ENDPOINTS for name, _, _ in plan):
+            usernames = ['{}{}'.format(BENCH_USER_PREFIX, number) for number in range(concurrency)]
+            for user, username in zip(users, usernames):
+                if not user.login(username, BENCH_PASSWORD):
+                    raise CommandError('{} cannot log in, run "manage.py seed_polls" with at least {} users and '
+                                       'disable the rate limits of the server.'.format(username, concurrency))
+        samples = collections.defaultdict(list)
+        statuses = collections.defaultdict(collections.Counter)
+        lock = threading.Lock()
+
+        def work(user, requests):
+            for name, path, data in requests:
+                started = time.perf_counter()
+                try:
+                    status = user.request(path, data)
+                except OSError as error:
+                    status = type(error).__name__
+                duration = time.perf_counter() - started
+                with lock:
+                    statuses[name][status] += 1
+                    if isinstance(status, int) and status < 400:
+                        samples[name].append(duration)
+
+        threads = [threading.Thread(target=work, args=(user, plan[number::concurrency]))
+                   for number, user in enumerate(users)]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+        if not any(samples.values()):
+            raise CommandError('Every request failed: {}'.format(dict(statuses)))
+
+        def stats(durations, counter):
+            result = summarize(durations)
+            result.update(errors=sum(counter.values()) - len(durations), throughput=len(durations) / elapsed,
+                          statuses={str(status): count for status, count in counter.items()})
+            return result
+
+        total = collections.Counter()
+        for counter in statuses.values():
+            total.update(counter)
+        return {
+            'commit': self.commit(),
+            'created': timezone.now().isoformat(),
+            'url': base,
+            'requests': len(plan),
+            'concurrency': concurrency,
+            'mix': options['paths'] or options['mix'],
+            'elapsed': elapsed,
+            'endpoints': {name: stats(samples[name], counter) for name, counter in statuses.items()},
+            'total': stats([duration for durations in samples.values() for duration in durations], total),
+        }
+
+    @staticmethod
+    def commit():
+        """Return the git commit of the code, or None outside of a git checkout."""
+        try:
+            return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR, check=True,
+                                  capture_output=True, text=True).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
+
+    def start_server(self, command, base, wait=30):
+        """Start the server command and return its process once the index page answer."""
+        server = subprocess.Popen(shlex.split(command))
+        deadline = time.monotonic() + wait
+        while time.monotonic() < deadline:
+            if server.poll() is not None:
+                raise CommandError('The server stopped with exit code {}.'.format(server.returncode))
+            try:
+                with urllib.request.urlopen(base + '/polls/', timeout=1) as response:
+                    response.read()
+                return server
+            except OSError:
+                time.sleep(0.2)
+        server.terminate()
+        raise CommandError('The server did not answer within {} seconds.'.format(wait))
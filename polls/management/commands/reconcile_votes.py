@@ -0,0 +1,40 @@
+"""This script is use to rebuild the vote tally of each choice from the vote rows."""
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from polls.models import Choice, Question, Vote
+
+
+class Command(BaseCommand):
+    """Command that fix the vote tally of the choices that drift away from the vote rows."""
+
+    help = 'Rebuild Choice.vote_count from the Vote table.'
+
+    def add_arguments(self, parser):
+        """Add the options of the command."""
+        parser.add_argument('--question', type=int, help='Only reconcile the choices of this question id.')
+        parser.add_argument('--dry-run', action='store_true', help='Report the drift without fixing it.')
+
+    def handle(self, *args, **options):
+        """Find every choice whose tally is different from its vote rows and correct it."""
+        # The votes of the archived questions are not in the Vote table anymore.
+        choices = Choice.objects.filter(question__archived=False)
+        if options['question'] is not None:
+            choices = choices.filter(question_id=options['question'])
+        drifted = list(choices.annotate(actual=Count('vote')).filter(~Q(vote_count=F('actual'))))
+        for choice in drifted:
+            self.stdout.write('Choice {}: {} -> {}'.format(choice.id, choice.vote_count, choice.actual))
+        if not options['dry_run']:
+            # Count again inside the update so a vote cast meanwhile is not lost.
+            counts = Vote.objects.filter(choice=OuterRef('pk')).values('choice').annotate(total=Count('pk'))
+            with transaction.atomic():
+                for start in range(0, len(drifted), 500):
+                    Choice.objects.filter(pk__in=[choice.pk for choice in drifted[start:start + 500]]).update(
+                        vote_count=Coalesce(Subquery(counts.values('total')), 0))
+                question_ids = {choice.question_id for choice in drifted}
+                Question.objects.filter(pk__in=question_ids).update(last_vote_at=timezone.now())
+        self.stdout.write(self.style.SUCCESS('{} choice(s) {}.'.format(
+            len(drifted), 'drifted' if options['dry_run'] else 'reconciled')))
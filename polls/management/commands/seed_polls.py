@@ -0,0 +1,29 @@
+"""This script is use to fill the database with generated polls for the benchmarks."""
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from polls.benchmark import seed
+
+
+class Command(BaseCommand):
+    """Command that create questions, choices, users and votes at a configurable scale."""
+
+    help = 'Generate benchmark questions, choices, users and votes.'
+
+    def add_arguments(self, parser):
+        """Add the options of the command."""
+        parser.add_argument('--questions', type=int, default=10000)
+        parser.add_argument('--choices', type=int, default=4)
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--votes', type=int, default=1000000)
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--seed', type=int, default=0, help='Seed of the random generator.')
+
+    def handle(self, *args, **options):
+        """Generate the data in one transaction."""
+        with transaction.atomic():
+            created = seed(questions=options['questions'], choices=options['choices'], users=options['users'],
+                           votes=options['votes'], batch_size=options['batch_size'], seed_value=options['seed'],
+                           stdout=self.stdout)
+        message = 'Seeded {} questions and {} votes.'.format(options['questions'], created)
+        self.stdout.write(self.style.SUCCESS(message))
@@ -0,0 +1,96 @@
+"""This script is use to download the third party CSS, JavaScript and fonts of the templates."""
+import base64
+import hashlib
+import os
+import urllib.error
+import urllib.request
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+NPM = 'https://cdn.jsdelivr.net/npm/'
+BOOTSTRAP = NPM + 'bootstrap@4.1.3/dist/'
+JQUERY = NPM + 'jquery@3.3.1/dist/'
+FONTAWESOME = NPM + '@fortawesome/fontawesome-free@5.15.4/'
+
+# The files served from static/vendor: path, source and Subresource Integrity hash.
+ASSETS = (
+    ('bootstrap/css/bootstrap.min.css', BOOTSTRAP + 'css/bootstrap.min.css',
+     'sha384-MCw98/SFnGE8fJT3GXwEOngsV7Zt27NXFoaoApmYm81iuXoPkFOJwJ8ERdknLPMO'),
+    ('bootstrap/css/bootstrap.min.css.map', BOOTSTRAP + 'css/bootstrap.min.css.map',
+     'sha384-TtmCq+HZXw+2C4HNAVoN0ZvSlsSzG0n/7UC1l04W4fJL/9isy95nH5dVZ2rttZY1'),
+    ('bootstrap/js/bootstrap.bundle.min.js', BOOTSTRAP + 'js/bootstrap.bundle.min.js',
+     'sha384-pjaaA8dDz/5BgdFUPX6M/9SUZv4d12SUPF0axWc+VRZkx5xU3daN+lYb49+Ax+Tl'),
+    ('bootstrap/js/bootstrap.bundle.min.js.map', BOOTSTRAP + 'js/bootstrap.bundle.min.js.map',
+     'sha384-bf6eW+iDA67AD+5JL8VnCvlKAJkG5oNeVK8z4e/Xrex+D0S78fClWVzHXs8l7Dy9'),
+    ('jquery/jquery.min.js', JQUERY + 'jquery.min.js',
+     'sha384-tsQFqpEReu7ZLhBV2VZlAu7zcOV+rXbYlF2cqB8txI/8aZajjp4Bqd+V6D5IgvKT'),
+    ('jquery/jquery.slim.min.js', JQUERY + 'jquery.slim.min.js',
+     'sha384-q8i/X+965DzO0rT7abK41JStQIAqVgRVzpbzo5smXKp4YfRvH+8abtTE1Pi6jizo'),
+    ('fontawesome/css/fontawesome.min.css', FONTAWESOME + 'css/fontawesome.min.css',
+     'sha384-jLKHWM3JRmfMU0A5x5AkjWkw/EYfGUAGagvnfryNV3F9VqM98XiIH7VBGVoxVSc7'),
+    ('fontawesome/css/solid.min.css', FONTAWESOME + 'css/solid.min.css',
+     'sha384-Tv5i09RULyHKMwX0E8wJUqSOaXlyu3SQxORObAI08iUwIalMmN5L6AvlPX2LMoSE'),
+    ('fontawesome/webfonts/fa-solid-900.eot', FONTAWESOME + 'webfonts/fa-solid-900.eot',
+     'sha384-Isn3HvL5LRQY0I7TT17jJcUfqgQcsL8q8wutwIfENC9HsJskVdpHjJiM8xalwzAw'),
+    ('fontawesome/webfonts/fa-solid-900.svg', FONTAWESOME + 'webfonts/fa-solid-900.svg',
+     'sha384-PqhE+beEMAcHtdZ03v2DSm3p71LFmT1QqT+dbtha3ZGioNmxAAmIHWLuLLTrdLvI'),
+    ('fontawesome/webfonts/fa-solid-900.ttf', FONTAWESOME + 'webfonts/fa-solid-900.ttf',
+     'sha384-ugSKcSBNjwVs/fk4YJ7sAZP7jXPvqjTyo+1iZtOl/iakH0k5ADgM+LrEnYEk40Sl'),
+    ('fontawesome/webfonts/fa-solid-900.woff', FONTAWESOME + 'webfonts/fa-solid-900.woff',
+     'sha384-8yvOn0Nc6x628D4z+3k0d+jXkJreZ3x8Vobm9frG+jCSR4BUjh48xEIYTOLfR04k'),
+    ('fontawesome/webfonts/fa-solid-900.woff2', FONTAWESOME + 'webfonts/fa-solid-900.woff2',
+     'sha384-J+Hec+Cl+N/SJPtXkxffygzO3i2HKS6radtcWe9DhOd+0yka4r/u4y+I4+g29xKn'),
+)
+
+
+def integrity(data):
+    """Return the Subresource Integrity hash of the bytes."""
+    return 'sha384-' + base64.b64encode(hashlib.sha384(data).digest()).decode()
+
+
+class Command(BaseCommand):
+    """Command that download the pinned files the templates used to load from the CDNs.
+
+    A file is only written when its content match its integrity hash, so a changed
+    release on the CDN is refused instead of being served.
+    """
+
+    help = 'Download the vendored CSS, JavaScript and fonts to static/vendor and check their hashes.'
+
+    def add_arguments(self, parser):
+        """Add the options of the command."""
+        parser.add_argument('--directory', default=str(Path(settings.STATICFILES_DIRS[0]) / 'vendor'),
+                            help='Directory of the vendored files.')
+        parser.add_argument('--check', action='store_true',
+                            help='Only check the files already downloaded, without the network.')
+        parser.add_argument('--force', action='store_true', help='Download the valid files again.')
+        parser.add_argument('--timeout', type=float, default=30, help='Timeout of one download in seconds.')
+
+    def handle(self, *args, **options):
+        """Download the missing or modified files."""
+        directory = Path(options['directory'])
+        invalid = []
+        for name, url, expected in ASSETS:
+            path = directory / name
+            if not options['force'] and path.exists() and integrity(path.read_bytes()) == expected:
+                continue
+            if options['check']:
+                invalid.append(name)
+                continue
+            try:
+                with urllib.request.urlopen(url, timeout=options['timeout']) as response:
+                    data = response.read()
+            except (urllib.error.URLError, OSError) as error:
+                raise CommandError('Cannot download {}: {}'.format(url, error))
+            if integrity(data) != expected:
+                raise CommandError('{} does not match its integrity hash.'.format(url))
+            path.parent.mkdir(parents=True, exist_ok=True)
+            partial = path.with_name(path.name + '.partial')
+            partial.write_bytes(data)
+            os.replace(partial, path)
+            self.stdout.write('Downloaded {} ({} bytes).'.format(name, len(data)))
+        if invalid:
+            raise CommandError('Missing or modified vendored files: {}.'.format(', '.join(invalid)))
+        self.stdout.write(self.style.SUCCESS('{} vendored file(s) are valid.'.format(len(ASSETS))))
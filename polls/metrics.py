@@ -0,0 +1,212 @@
+"""This script is use to measure where the time of the requests of the KU Polls web application go.
+
+For a sampled request the middleware record the wall time of the view, the number and
+the time of the database queries and the time of the template rendering. The last
+samples of every polls view are kept and shown as Prometheus summaries with the p50,
+p95 and p99. When `POLLS_METRICS_SAMPLE_RATE` is 0 the middleware is not loaded and
+the query and template hooks only check that no request is measured.
+"""
+import asyncio
+import collections
+import contextvars
+import random
+import threading
+import time
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.template.backends.django import DjangoTemplates
+from django.utils.decorators import sync_and_async_middleware
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+QUANTILES = (50, 95, 99)
+
+# Name and help of every metric of a view.
+METRICS = (
+    ('polls_view_seconds', 'Wall time of the polls views.'),
+    ('polls_db_queries', 'Database queries per request of the polls views.'),
+    ('polls_db_seconds', 'Database time per request of the polls views.'),
+    ('polls_template_seconds', 'Template rendering time per request of the polls views.'),
+)
+
+current = contextvars.ContextVar('polls_metrics', default=None)
+
+
+class RequestMetrics:
+    """Database and template time of the request that is measured."""
+
+    __slots__ = ('queries', 'db_seconds', 'template_seconds')
+
+    def __init__(self):
+        """Start from zero."""
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.template_seconds = 0.0
+
+
+class Series:
+    """The last samples of one metric, with the count and the sum of every sample."""
+
+    def __init__(self, size):
+        """Create the series that keep `size` samples."""
+        self.samples = collections.deque(maxlen=size)
+        self.count = 0
+        self.total = 0.0
+
+    def add(self, value):
+        """Add a sample."""
+        self.samples.append(value)
+        self.count += 1
+        self.total += value
+
+
+class MetricsRegistry:
+    """Rolling samples of the metrics of every view."""
+
+    def __init__(self, size=1024):
+        """Create the registry that keep the last `size` samples of every metric."""
+        self.size = size
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, view, seconds, metrics):
+        """Add the samples of one request of the view.
+
+        Args:
+            view: the URL name of the view, like `polls:index`.
+            seconds: the wall time of the request.
+            metrics: the `RequestMetrics` of the request.
+        """
+        values = (seconds, metrics.queries, metrics.db_seconds, metrics.template_seconds)
+        with self._lock:
+            for (name, _), value in zip(METRICS, values):
+                series = self._series.get((name, view))
+                if series is None:
+                    series = self._series[(name, view)] = Series(self.size)
+                series.add(value)
+
+    def clear(self):
+        """Forget every sample."""
+        with self._lock:
+            self._series = {}
+
+    def render(self):
+        """Return the metrics in the Prometheus text format."""
+        # The benchmark helpers are not imported at the start of every process.
+        from .benchmark import percentile
+
+        with self._lock:
+            series = {key: (list(value.samples), value.count, value.total) for key, value in self._series.items()}
+        lines = []
+        for name, description in METRICS:
+            lines.append('# HELP {} {}'.format(name, description))
+            lines.append('# TYPE {} summary'.format(name))
+            for (metric, view), (samples, count, total) in sorted(series.items()):
+                if metric != name:
+                    continue
+                for quantile in QUANTILES:
+                    lines.append('{}{{view="{}",quantile="{}"}} {}'.format(
+                        name, view, quantile / 100, percentile(samples, quantile)))
+                lines.append('{}_sum{{view="{}"}} {}'.format(name, view, total))
+                lines.append('{}_count{{view="{}"}} {}'.format(name, view, count))
+        return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
+
+
+def record_query(execute, sql, params, many, context):
+    """Database execute wrapper that time the queries of the measured request."""
+    metrics = current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.queries += 1
+        metrics.db_seconds += time.perf_counter() - started
+
+
+class TimedTemplate:
+    """Template of the Django backend whose rendering time is added to the measured request."""
+
+    def __init__(self, template):
+        """Wrap the template of the backend."""
+        self.template = template
+
+    def __getattr__(self, name):
+        """Return the attributes of the wrapped template, like `origin`."""
+        return getattr(self.template, name)
+
+    def render(self, context=None, request=None):
+        """Render the template and add the time to the measured request."""
+        metrics = current.get()
+        if metrics is None:
+            return self.template.render(context, request)
+        started = time.perf_counter()
+        try:
+            return self.template.render(context, request)
+        finally:
+            metrics.template_seconds += time.perf_counter() - started
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    """Django template backend that time the rendering of the measured requests.
+
+    The queries run by the lazy querysets of a template count in both times.
+    """
+
+    def from_string(self, template_code):
+        """Return the wrapped template of the code."""
+        return TimedTemplate(super().from_string(template_code))
+
+    def get_template(self, template_name):
+        """Return the wrapped template of the name."""
+        return TimedTemplate(super().get_template(template_name))
+
+
+def start_measure():
+    """Return the context token of a new measured request, or None when it is not sampled."""
+    rate = settings.POLLS_METRICS_SAMPLE_RATE
+    if rate < 1 and random.random() >= rate:
+        return None
+    return current.set(RequestMetrics())
+
+
+def finish_measure(request, token, started):
+    """Add the samples of the measured request to the registry if its view is watched."""
+    metrics = current.get()
+    current.reset(token)
+    match = request.resolver_match
+    if match is not None and match.view_name in settings.POLLS_METRICS_VIEWS:
+        registry.observe(match.view_name, time.perf_counter() - started, metrics)
+
+
+@sync_and_async_middleware
+def metrics_middleware(get_response):
+    """Measure a sample of the requests of the polls views, see `POLLS_METRICS_SAMPLE_RATE`."""
+    if not settings.POLLS_METRICS_SAMPLE_RATE:
+        raise MiddlewareNotUsed()
+    if asyncio.iscoroutinefunction(get_response):
+        async def middleware(request):
+            started = time.perf_counter()
+            token = start_measure()
+            if token is None:
+                return await get_response(request)
+            try:
+                return await get_response(request)
+            finally:
+                finish_measure(request, token, started)
+    else:
+        def middleware(request):
+            started = time.perf_counter()
+            token = start_measure()
+            if token is None:
+                return get_response(request)
+            try:
+                return get_response(request)
+            finally:
+                finish_measure(request, token, started)
+    return middleware
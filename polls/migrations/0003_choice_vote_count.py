@@ -0,0 +1,27 @@
+# Generated by Django 3.2.25 on 2026-10-17 11:26
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def fill_vote_count(apps, schema_editor):
+    Choice = apps.get_model('polls', 'Choice')
+    Vote = apps.get_model('polls', 'Vote')
+    counts = Vote.objects.filter(choice=OuterRef('pk')).values('choice').annotate(total=Count('pk')).values('total')
+    Choice.objects.update(vote_count=Coalesce(Subquery(counts), 0))
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ('polls', '0002_auto_20201102_0003'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='choice',
+            name='vote_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(fill_vote_count, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 3.2.25 on 2026-10-17 11:48
+
+from django.db import migrations, models
+from django.db.models import Count, Max, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def remove_duplicate_votes(apps, schema_editor):
+    Choice = apps.get_model('polls', 'Choice')
+    Vote = apps.get_model('polls', 'Vote')
+    duplicates = (Vote.objects.filter(question__isnull=False, user__isnull=False)
+                  .values('question', 'user')
+                  .annotate(latest=Max('pk'), total=Count('pk'))
+                  .filter(total__gt=1))
+    for group in duplicates.iterator():
+        # Keep the newest vote of the user and drop the others.
+        Vote.objects.filter(question=group['question'], user=group['user']).exclude(pk=group['latest']).delete()
+    counts = Vote.objects.filter(choice=OuterRef('pk')).values('choice').annotate(total=Count('pk')).values('total')
+    Choice.objects.update(vote_count=Coalesce(Subquery(counts), 0))
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ('polls', '0003_choice_vote_count'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_votes, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='vote',
+            constraint=models.UniqueConstraint(fields=('question', 'user'), name='unique_vote_per_question_user'),
+        ),
+    ]
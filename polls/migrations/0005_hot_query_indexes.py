@@ -0,0 +1,31 @@
+# Generated by Django 3.2.25 on 2026-10-17 11:28
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ('polls', '0004_unique_vote'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='vote',
+            name='question',
+            field=models.ForeignKey(blank=True, db_index=False, null=True,
+                                    on_delete=django.db.models.deletion.CASCADE, to='polls.question'),
+        ),
+        migrations.AddIndex(
+            model_name='question',
+            index=models.Index(fields=['pub_date'], name='polls_question_pub_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='question',
+            index=models.Index(fields=['end_date'], name='polls_question_end_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='vote',
+            index=models.Index(fields=['question', 'choice'], name='polls_vote_question_choice_idx'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 3.2.25 on 2026-10-17 11:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ('polls', '0005_hot_query_indexes'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='question',
+            name='polls_question_pub_date_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='question',
+            name='polls_question_end_date_idx',
+        ),
+        migrations.AddIndex(
+            model_name='question',
+            index=models.Index(fields=['pub_date', 'id'], name='polls_question_pub_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='question',
+            index=models.Index(fields=['end_date', 'pub_date'], name='polls_question_end_pub_idx'),
+        ),
+    ]
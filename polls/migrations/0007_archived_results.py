@@ -0,0 +1,30 @@
+# Generated by Django 3.2.25 on 2026-10-17 11:53
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('polls', '0006_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedResult',
+            fields=[
+                ('question', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='archive', serialize=False, to='polls.question')),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+                ('total_votes', models.PositiveIntegerField()),
+                ('totals', models.JSONField()),
+                ('ballots', models.BinaryField()),
+                ('path', models.CharField(blank=True, max_length=500)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='question',
+            name='archived',
+            field=models.BooleanField(default=False),
+        ),
+    ]
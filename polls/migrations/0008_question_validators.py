@@ -0,0 +1,23 @@
+# Generated by Django 3.2.25 on 2026-10-17 12:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('polls', '0007_archived_results'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='question',
+            name='last_vote_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='question',
+            name='modified',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
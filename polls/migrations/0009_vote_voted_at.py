@@ -0,0 +1,18 @@
+# Generated by Django 3.2.25 on 2026-10-17 12:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('polls', '0008_question_validators'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='vote',
+            name='voted_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
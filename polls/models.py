@@ -6,15 +6,82 @@ Date: 10/9/2020
 import datetime
 
 from django.contrib.auth.models import User
-from django.db import models
+from django.db import IntegrityError, models, transaction
+from django.db.models import Case, ExpressionWrapper, F, Q, Value, When
+from django.dispatch import Signal
 from django.utils import timezone
 
+# Sent with `deltas`, the number of votes added to each choice id, and the `question_ids`
+# of the choices when a tally change.
+tally_changed = Signal()
+
+
+class QuestionQuerySet(models.QuerySet):
+    """Queryset of question that can compute the state of the questions in the database."""
+
+    def published(self, now=None):
+        """Return the questions that are already published."""
+        return self.filter(pub_date__lte=now or timezone.now())
+
+    def open_now(self, now=None):
+        """Return the questions that can be voted now."""
+        now = now or timezone.now()
+        return self.filter(pub_date__lte=now, end_date__gte=now)
+
+    def closed(self, now=None):
+        """Return the questions whose end date is already passed."""
+        return self.filter(end_date__lt=now or timezone.now())
+
+    def recent(self, now=None):
+        """Return the questions that are published within the last day."""
+        now = now or timezone.now()
+        return self.filter(pub_date__gte=now - datetime.timedelta(days=1), pub_date__lte=now)
+
+    def with_status(self, now=None):
+        """Annotate the state of each question against one timestamp.
+
+        The annotations `published`, `published_recently` and `voting_open` have the
+        same meaning as `is_published()`, `was_published_recently()` and `can_vote()`,
+        but they are computed by the database so a long list of questions need no
+        work per row in Python.
+
+        Args:
+            now: the time to compare with, the current time if it is not given.
+
+        Returns: the annotated queryset.
+        """
+        now = now or timezone.now()
+        return self.annotate(
+            published=ExpressionWrapper(Q(pub_date__lte=now), output_field=models.BooleanField()),
+            published_recently=ExpressionWrapper(Q(pub_date__gte=now - datetime.timedelta(days=1),
+                                                   pub_date__lte=now), output_field=models.BooleanField()),
+            voting_open=ExpressionWrapper(Q(pub_date__lte=now, end_date__gte=now),
+                                          output_field=models.BooleanField()),
+        )
+
 
 class Question(models.Model):
     """Class that create the model of question for using in database layout and at admin index page."""
     question_text = models.CharField(max_length=200)
     pub_date = models.DateTimeField('date published')
     end_date = models.DateTimeField('end date')
+    # Set when the votes of the closed question are moved to its `ArchivedResult`.
+    archived = models.BooleanField(default=False)
+    # Changed when the question or one of its choices is changed, for the HTTP validators.
+    modified = models.DateTimeField(auto_now=True)
+    # Changed in the transaction of every change of the tally of its choices.
+    last_vote_at = models.DateTimeField(null=True, blank=True)
+
+    objects = QuestionQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # The index and detail pages filter on the publish date and the index page
+            # sort and continue the keyset pages on (pub_date, id).
+            models.Index(fields=['pub_date', 'id'], name='polls_question_pub_id_idx'),
+            # The open and closed filters and the next end date read the end date first.
+            models.Index(fields=['end_date', 'pub_date'], name='polls_question_end_pub_idx'),
+        ]
 
     def __str__(self):
         """To display the text or content of the question."""
@@ -77,13 +144,132 @@ class Choice(models.Model):
 
     question = models.ForeignKey(Question, on_delete=models.CASCADE)
     choice_text = models.CharField(max_length=200)
+    vote_count = models.PositiveIntegerField(default=0)
 
     def __str__(self):
         """To display the choice of a poll."""
         return self.choice_text
 
 
+class VoteManager(models.Manager):
+    """Manager that keep the vote tally of each choice in step with the vote rows."""
+
+    def cast(self, user, question, choice):
+        """Record the vote of the user for the choice of the question.
+
+        If the user never vote this question a new vote is created, if the user
+        already vote it the vote is switch to the new choice. The tally of the
+        choices is update in the same transaction with the vote row, and the
+        unique constraint of the vote make concurrent votes of the same user
+        end up as one vote.
+
+        Args:
+            user: the user that vote.
+            question: the question that the user vote.
+            choice: the choice that the user select.
+
+        Returns: the vote object of the user for the question.
+
+        """
+        now = timezone.now()
+        with transaction.atomic():
+            if question.archived:
+                # A reopened question get its archived votes back before the duplicate check.
+                from .archive import restore_question
+                restore_question(question)
+            try:
+                # Insert first so the write lock is taken by the first statement,
+                # the unique constraint reject the insert if the user already vote.
+                with transaction.atomic():
+                    vote = self.create(question=question, user=user, choice=choice, voted_at=now)
+            except IntegrityError:
+                vote = self.select_for_update().get(question=question, user=user)
+                if vote.choice_id != choice.id:
+                    adjust_vote_counts({vote.choice_id: -1, choice.id: 1}, [question.id])
+                self.filter(pk=vote.pk).update(choice=choice, voted_at=now)
+                vote.choice = choice
+                vote.voted_at = now
+            else:
+                adjust_vote_count(choice.id, 1, question.id)
+        return vote
+
+
+def adjust_vote_count(choice_id, delta, question_id):
+    """Add the delta to the tally of the choice in the database without reading it first.
+
+    Args:
+        choice_id: the id of the choice that need to update.
+        delta: the number of votes to add (negative to remove votes).
+        question_id: the id of the question of the choice.
+    """
+    if choice_id is not None:
+        Choice.objects.filter(pk=choice_id).update(vote_count=F('vote_count') + delta)
+        Question.objects.filter(pk=question_id).update(last_vote_at=timezone.now())
+        tally_changed.send(sender=Choice, deltas={choice_id: delta}, question_ids=[question_id])
+
+
+def adjust_vote_counts(deltas, question_ids):
+    """Add many deltas to the tally of the choices with one update statement.
+
+    Args:
+        deltas: dictionary that map the id of the choice to the number of votes to add.
+        question_ids: the ids of the questions of the choices.
+    """
+    deltas = {choice_id: delta for choice_id, delta in deltas.items() if choice_id is not None and delta}
+    if len(deltas) > 1:
+        # Lock the choices in the order of their id, so two transactions that change
+        # the same choices wait for each other instead of deadlocking.
+        list(Choice.objects.select_for_update().filter(pk__in=deltas).order_by('pk').values_list('pk'))
+    if deltas:
+        change = Case(*[When(pk=choice_id, then=Value(delta)) for choice_id, delta in deltas.items()],
+                      default=Value(0), output_field=models.IntegerField())
+        Choice.objects.filter(pk__in=deltas).update(vote_count=F('vote_count') + change)
+        Question.objects.filter(pk__in=question_ids).update(last_vote_at=timezone.now())
+        tally_changed.send(sender=Choice, deltas=deltas, question_ids=list(question_ids))
+
+
 class Vote(models.Model):
+    """Class that create the model of vote of each user for a choice of the question."""
+
     user = models.ForeignKey(User, null=True, blank=True, on_delete=models.CASCADE)
     choice = models.ForeignKey(Choice, null=True, blank=True, on_delete=models.CASCADE)
-    question = models.ForeignKey(Question, null=True, blank=True, on_delete=models.CASCADE)
+    # The unique (question, user) index already serve lookups by question.
+    question = models.ForeignKey(Question, null=True, blank=True, on_delete=models.CASCADE, db_index=False)
+    # The time of the last vote of the user, so an older queued vote does not replace it.
+    voted_at = models.DateTimeField(null=True, blank=True)
+
+    objects = VoteManager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['question', 'user'], name='unique_vote_per_question_user'),
+        ]
+        indexes = [
+            # Counting the votes of a question by choice read only the index.
+            models.Index(fields=['question', 'choice'], name='polls_vote_question_choice_idx'),
+        ]
+
+
+class ArchivedResult(models.Model):
+    """Class that create the model of the frozen result of a closed question.
+
+    The votes of an archived question are removed from the vote table. `totals` list
+    the [choice id, votes] of every choice in id order and `ballots` keep the choice
+    of every user in the compact form of polls/archive.py.
+    """
+
+    question = models.OneToOneField(Question, on_delete=models.CASCADE, primary_key=True, related_name='archive')
+    archived_at = models.DateTimeField(auto_now_add=True)
+    total_votes = models.PositiveIntegerField()
+    totals = models.JSONField()
+    ballots = models.BinaryField()
+    # The file where the vote rows were written, in the format of polls/transfer.py.
+    path = models.CharField(max_length=500, blank=True)
+
+    def __str__(self):
+        """To display the question of the result."""
+        return str(self.question)
+
+    def tally(self):
+        """Return the dictionary of choice id to the number of votes."""
+        return {choice_id: votes for choice_id, votes in self.totals}
@@ -0,0 +1,191 @@
+"""This script is use to keep the questions and their choices in memory for the vote of the KU Polls web application.
+
+A vote only need the question and its choices to be validated, and they almost never
+change while the poll is open. `get_poll()` read them through two tiers: a least
+recently used dictionary in the memory of the process, then the shared cache of
+`POLLS_OBJECT_CACHE_ALIAS`, then the database.
+
+Every question has a version number in the shared cache that is incremented when the
+question or one of its choices is saved or deleted, or when it is archived or restored.
+An entry of the process tier is used only while its version is current, so a change
+made by another process is seen on the next read. Without a shared cache the entries
+of the process tier are removed by the signals of this process and expire after
+`POLLS_OBJECT_CACHE_TIMEOUT` seconds, so the settings turn the poll cache off by default.
+"""
+import collections
+import random
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.signals import setting_changed
+from django.db import transaction
+from django.dispatch import receiver
+
+from .models import Question
+
+VERSION_KEY = 'polls:poll:{}:version'
+ENTRY_KEY = 'polls:poll:{}:{}'
+
+
+class Poll:
+    """A question with its choices by id, read together from the database.
+
+    The objects are shared by the requests, they must not be changed and their
+    `vote_count` is not kept up to date.
+    """
+
+    __slots__ = ('question', 'choices')
+
+    def __init__(self, question, choices):
+        """Create the poll from the question and the list of its choices."""
+        self.question = question
+        self.choices = {choice.pk: choice for choice in choices}
+
+
+class PollCache:
+    """Two-tier read-through cache of the polls with hit counters."""
+
+    def __init__(self, size=1000, timeout=60, alias=None):
+        """Create the cache.
+
+        Args:
+            size: the number of polls kept in the process, the least recently used are removed.
+            timeout: the seconds that a poll stay in the process tier without a shared cache,
+                and in the shared cache.
+            alias: the name of the shared cache, None to keep the polls only in the process.
+        """
+        self.size = size
+        self.timeout = timeout
+        self.shared = caches[alias] if alias else None
+        self._polls = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self.counts = {'local': 0, 'shared': 0, 'miss': 0}
+
+    def get(self, question_id):
+        """Return the poll of the question id.
+
+        Raises:
+            Question.DoesNotExist: if the question does not exist.
+        """
+        version = self.version(question_id)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._polls.get(question_id)
+            if entry is not None and entry[0] == version and entry[1] > now:
+                self._polls.move_to_end(question_id)
+                self.counts['local'] += 1
+                return entry[2]
+        poll = None
+        if self.shared is not None:
+            poll = self.shared.get(ENTRY_KEY.format(question_id, version))
+        tier = 'shared' if poll is not None else 'miss'
+        if poll is None:
+            question = Question.objects.get(pk=question_id)
+            poll = Poll(question, question.choice_set.all())
+            if self.shared is not None:
+                self.shared.set(ENTRY_KEY.format(question_id, version), poll, self.timeout)
+        expires = now + self.timeout if self.shared is None else float('inf')
+        with self._lock:
+            self.counts[tier] += 1
+            self._polls[question_id] = (version, expires, poll)
+            self._polls.move_to_end(question_id)
+            while len(self._polls) > self.size:
+                self._polls.popitem(last=False)
+        return poll
+
+    def version(self, question_id):
+        """Return the version of the question in the shared cache, None without a shared cache."""
+        if self.shared is None:
+            return None
+        key = VERSION_KEY.format(question_id)
+        version = self.shared.get(key)
+        if version is None:
+            self.shared.add(key, random.getrandbits(48), None)
+            version = self.shared.get(key)
+        return version
+
+    def invalidate(self, question_ids):
+        """Forget the polls of the questions in every tier."""
+        with self._lock:
+            for question_id in question_ids:
+                self._polls.pop(question_id, None)
+        if self.shared is not None:
+            for question_id in question_ids:
+                try:
+                    self.shared.incr(VERSION_KEY.format(question_id))
+                except ValueError:
+                    # The version was evicted, the next read start a new one.
+                    pass
+
+    def clear(self):
+        """Forget every poll of the process and reset the counters."""
+        with self._lock:
+            self._polls.clear()
+            self.counts = {'local': 0, 'shared': 0, 'miss': 0}
+
+    def render(self):
+        """Return the hit counters in the Prometheus text format."""
+        with self._lock:
+            counts = dict(self.counts)
+        lines = ['# HELP polls_object_cache_reads_total Reads of the poll cache by the tier that answered.',
+                 '# TYPE polls_object_cache_reads_total counter']
+        lines += ['polls_object_cache_reads_total{{tier="{}"}} {}'.format(tier, count)
+                  for tier, count in counts.items()]
+        total = sum(counts.values())
+        lines += ['# HELP polls_object_cache_hit_ratio Reads of the poll cache answered without the database.',
+                  '# TYPE polls_object_cache_hit_ratio gauge',
+                  'polls_object_cache_hit_ratio {}'.format((total - counts['miss']) / total if total else 0.0)]
+        return '\n'.join(lines) + '\n'
+
+
+def get_poll(question_id):
+    """Return the poll of the question id, from the poll cache when it is enabled.
+
+    Raises:
+        Question.DoesNotExist: if the question does not exist.
+    """
+    cache = get_poll_cache()
+    if cache is None:
+        question = Question.objects.get(pk=question_id)
+        return Poll(question, question.choice_set.all())
+    return cache.get(question_id)
+
+
+def invalidate_poll(question_ids):
+    """Forget the polls of the questions, now and again when the transaction commit.
+
+    The second time remove a copy read by another request before the commit.
+    """
+    cache = get_poll_cache()
+    if cache is None:
+        return
+    question_ids = list(question_ids)
+    cache.invalidate(question_ids)
+    transaction.on_commit(lambda: cache.invalidate(question_ids))
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_poll_cache():
+    """Return the poll cache of the process, created from the settings on first use, or None if disabled."""
+    global _cache
+    if not settings.POLLS_OBJECT_CACHE_SIZE:
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = PollCache(size=settings.POLLS_OBJECT_CACHE_SIZE, timeout=settings.POLLS_OBJECT_CACHE_TIMEOUT,
+                               alias=settings.POLLS_OBJECT_CACHE_ALIAS or None)
+        return _cache
+
+
+@receiver(setting_changed)
+def reset_poll_cache(setting, **kwargs):
+    """Forget the poll cache when its settings are changed, for example in the tests."""
+    global _cache
+    if setting.startswith('POLLS_OBJECT_CACHE'):
+        with _cache_lock:
+            _cache = None
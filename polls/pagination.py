@@ -0,0 +1,138 @@
+"""This script is use to split the question list of the KU Polls web application into pages.
+
+The offset mode number the pages like the Django paginator. The keyset mode continue
+after the (pub_date, id) of the last question of the previous page, so a deep page read
+as few rows as the first page. The previous page is read the same way backward, before
+the first question of the page.
+"""
+import datetime
+
+from django.core.paginator import InvalidPage, Paginator
+from django.http import Http404
+from django.utils.http import urlencode
+
+ORDERING = ('-pub_date', '-id')
+REVERSE_ORDERING = ('pub_date', 'id')
+EPOCH = datetime.datetime(1970, 1, 1, tzinfo=datetime.timezone.utc)
+MICROSECOND = datetime.timedelta(microseconds=1)
+
+
+class IndexPage:
+    """One page of questions with the query strings of the next and previous pages."""
+
+    def __init__(self, object_list, number=1, next_params=None, previous_params=None, base_params=None):
+        """Create the page.
+
+        Args:
+            object_list: the questions of the page.
+            number: the page number, or 1 for the first keyset page.
+            next_params: the query parameters of the next page, None if it is the last page.
+            previous_params: the query parameters of the previous page, None if it is the first page.
+            base_params: the query parameters that every page keep, like the filter.
+        """
+        self.object_list = object_list
+        self.number = number
+        self.has_next = next_params is not None
+        self.has_previous = previous_params is not None
+        self.next_query = urlencode({**(base_params or {}), **(next_params or {})})
+        self.previous_query = urlencode({**(base_params or {}), **(previous_params or {})})
+
+
+def encode_cursor(question):
+    """Return the keyset cursor that point after the question."""
+    return '{}_{}'.format((question.pub_date - EPOCH) // MICROSECOND, question.id)
+
+
+def decode_cursor(cursor):
+    """Return the publish date and id of a keyset cursor.
+
+    Raises:
+        Http404: if the cursor is not valid.
+    """
+    try:
+        micro, pk = cursor.split('_')
+        return EPOCH + int(micro) * MICROSECOND, int(pk)
+    except (ValueError, OverflowError):
+        raise Http404('Invalid cursor.')
+
+
+def offset_page(queryset, number, size, base_params=None):
+    """Return the page with the given number using LIMIT and OFFSET.
+
+    Raises:
+        Http404: if the page does not exist.
+    """
+    paginator = Paginator(queryset.order_by(*ORDERING), size)
+    try:
+        page = paginator.page(number)
+    except InvalidPage:
+        raise Http404('Invalid page.')
+    return IndexPage(list(page.object_list), page.number,
+                     next_params={'page': page.number + 1} if page.has_next() else None,
+                     previous_params={'page': page.number - 1} if page.has_previous() else None,
+                     base_params=base_params)
+
+
+def after_cursor(queryset, cursor):
+    """Return the questions that come after the keyset cursor.
+
+    Apply it before the other filters on the publish date, SQLite use only the first
+    upper bound of `pub_date` as the range of the index.
+
+    Args:
+        queryset: the questions to filter.
+        cursor: the cursor of the previous page.
+
+    Returns: the filtered questions.
+    """
+    pub_date, pk = decode_cursor(cursor)
+    return queryset.filter(pub_date__lte=pub_date).exclude(pub_date=pub_date, id__gte=pk)
+
+
+def before_cursor(queryset, cursor):
+    """Return the questions that come before the keyset cursor, like `after_cursor` backward.
+
+    Args:
+        queryset: the questions to filter.
+        cursor: the cursor of the first question of the next page.
+
+    Returns: the filtered questions.
+    """
+    pub_date, pk = decode_cursor(cursor)
+    return queryset.filter(pub_date__gte=pub_date).exclude(pub_date=pub_date, id__lte=pk)
+
+
+def keyset_page(queryset, size, after=None, base_params=None, before=None):
+    """Return a page of the questions, the next page continue after its last question.
+
+    The page before a cursor is read in the reverse order and flipped, so it is the
+    `size` questions just before the cursor and the previous page go on before its
+    first question.
+
+    Args:
+        queryset: the questions to split, already filtered with `after_cursor` or `before_cursor`
+            after the first page.
+        size: the number of questions per page.
+        after: the cursor of the previous page, or None.
+        base_params: the query parameters that every page keep.
+        before: the cursor of the next page, or None.
+
+    Returns: the page of questions.
+    """
+    if before:
+        questions = list(queryset.order_by(*REVERSE_ORDERING)[:size + 1])
+        has_previous = len(questions) > size
+        questions = questions[:size][::-1]
+        # The question of the cursor come after this page.
+        has_next = bool(questions)
+    else:
+        questions = list(queryset.order_by(*ORDERING)[:size + 1])
+        has_previous = bool(after)
+        has_next = len(questions) > size
+        questions = questions[:size]
+    next_params = {'after': encode_cursor(questions[-1])} if has_next else None
+    previous_params = None
+    if has_previous:
+        previous_params = {'before': encode_cursor(questions[0])} if questions else {}
+    return IndexPage(questions, next_params=next_params, previous_params=previous_params,
+                     base_params=base_params)
@@ -0,0 +1,84 @@
+"""This script is use to handle the signals of the KU Polls web application."""
+import functools
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .auth import forget_user
+from .caching import invalidate_index
+from .live import get_broker
+from .metrics import record_query
+from .models import Choice, Question, Vote, adjust_vote_count, tally_changed
+from .objectcache import invalidate_poll
+
+
+@receiver(post_delete, sender=Vote)
+def remove_deleted_vote(sender, instance, **kwargs):
+    """Remove the deleted vote from the tally of its choice."""
+    adjust_vote_count(instance.choice_id, -1, instance.question_id)
+
+
+@receiver(tally_changed)
+def publish_tally(sender, deltas, **kwargs):
+    """Send the change of the tally to the live result pages once the vote is committed."""
+    transaction.on_commit(functools.partial(get_broker().publish, dict(deltas)))
+
+
+@receiver(post_save, sender=Question)
+@receiver(post_delete, sender=Question)
+@receiver(post_save, sender=Choice)
+@receiver(post_delete, sender=Choice)
+def expire_index_cache(sender, **kwargs):
+    """Make the cached index page stale when a question or a choice is changed."""
+    invalidate_index()
+
+
+@receiver(post_save, sender=Question)
+@receiver(post_delete, sender=Question)
+@receiver(post_save, sender=Choice)
+@receiver(post_delete, sender=Choice)
+def expire_cached_poll(sender, instance, **kwargs):
+    """Remove the question of the changed question or choice from the poll cache."""
+    invalidate_poll([instance.pk if sender is Question else instance.question_id])
+
+
+@receiver(post_save, sender=Choice)
+@receiver(post_delete, sender=Choice)
+def touch_question(sender, instance, **kwargs):
+    """Change the modified time of the question when one of its choices is changed."""
+    Question.objects.filter(pk=instance.question_id).update(modified=timezone.now())
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def expire_cached_user(sender, instance, **kwargs):
+    """Remove the cached copy of the changed user, now and when the change is committed."""
+    forget_user(instance.pk)
+    transaction.on_commit(functools.partial(forget_user, instance.pk))
+
+
+@receiver(connection_created)
+def tune_sqlite(sender, connection, **kwargs):
+    """Apply the SQLite PRAGMA settings to every new SQLite connection.
+
+    The write-ahead log let the readers continue while a vote is written, and the
+    busy timeout let a writer wait for the lock instead of failing at once.
+    """
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for pragma, value in settings.POLLS_SQLITE_PRAGMAS.items():
+            cursor.execute('PRAGMA {} = {}'.format(pragma, value))
+
+
+@receiver(connection_created)
+def instrument_queries(sender, connection, **kwargs):
+    """Time the queries of the requests measured by the metrics middleware."""
+    # The same wrapper object get the signal again when it reconnect.
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
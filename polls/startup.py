@@ -0,0 +1,47 @@
+"""This script is use to load the KU Polls web application before its first request.
+
+Django import the URLconf and the views, compile the templates and read the manifest of
+the static files only when the first request need them, so every new worker pay for
+them while a user wait. `preload()` is called by mysite/wsgi.py and mysite/asgi.py
+after the application is created. With `gunicorn --preload` the master process run it
+once and the forked workers share the loaded code and templates as copy-on-write memory.
+
+Nothing here open a database connection, a cache connection or start a thread, because
+those cannot be shared by the forked workers.
+"""
+import gc
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.template import engines
+from django.urls import get_resolver
+
+
+def preload():
+    """Load the URLconf, the views, the templates and the static manifest if `POLLS_PRELOAD` is set.
+
+    Returns: the names of the templates that were compiled.
+    """
+    if not settings.POLLS_PRELOAD:
+        return []
+    resolver = get_resolver()
+    # Build the reverse lookups of the root URLconf and of every namespace, like `reverse()` do.
+    resolver.reverse_dict
+    for _, namespace in resolver.namespace_dict.values():
+        namespace.reverse_dict
+    # The cached loader keep the compiled templates of the project for the process.
+    names = []
+    for engine in engines.all():
+        for directory in map(Path, getattr(engine, 'dirs', [])):
+            for path in sorted(directory.rglob('*.html')):
+                name = path.relative_to(directory).as_posix()
+                engine.get_template(name)
+                names.append(name)
+    # The manifest of the hashed static files is read once.
+    getattr(staticfiles_storage, 'hashed_files', None)
+    if hasattr(gc, 'freeze'):
+        # The collector would write to every loaded object and copy its page in each worker.
+        gc.collect()
+        gc.freeze()
+    return names
@@ -0,0 +1,22 @@
+"""This script is use to store the static files of the KU Polls web application.
+
+`collectstatic` copy every file with the hash of its content in its name, write a gzip
+and a brotli copy next to it and save the names in a manifest. WhiteNoise serve the
+hashed files with a cache header of one year, because their content never change.
+"""
+from whitenoise.storage import CompressedManifestStaticFilesStorage
+
+
+class PollsStaticFilesStorage(CompressedManifestStaticFilesStorage):
+    """Storage of the hashed and compressed static files.
+
+    Before `collectstatic` ran there is no manifest and the urls use the names of the
+    source files, so the tests and `runserver` work without it. Once the manifest exist,
+    a file missing from it is an error like in the parent storage.
+    """
+
+    def stored_name(self, name):
+        """Return the hashed name of the file, or its name when nothing was collected yet."""
+        if not self.hashed_files:
+            return name
+        return super().stored_name(name)
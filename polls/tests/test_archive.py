@@ -0,0 +1,91 @@
+"""This script is use to test the logic of KU Polls web application.
+
+Test about the archive of the closed polls.
+"""
+import array
+import datetime
+import gzip
+import tempfile
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from polls.archive import archive_question, archived_choice, pack_ballots, unpack_ballots
+from polls.models import ArchivedResult, Vote
+from polls.transfer import read_records
+from .test_detail import create_user
+from .test_question_model import create_question
+
+
+class ArchiveTests(TestCase):
+    """Test the votes of a closed question move to its archive and back."""
+
+    def setUp(self) -> None:
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        settings = override_settings(POLLS_ARCHIVE_DIR=directory.name)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.question = create_question(question_text="Archive question.", date_time=datetime.timedelta(days=-10))
+        self.first = self.question.choice_set.create(choice_text="First")
+        self.second = self.question.choice_set.create(choice_text="Second")
+        self.users = [create_user('user{}'.format(number), 'user{}@gmail.com'.format(number), 'testPassword')
+                      for number in range(3)]
+        for user, choice in zip(self.users, (self.first, self.second, self.second)):
+            Vote.objects.cast(user, self.question, choice)
+        self.question.end_date = timezone.now() - datetime.timedelta(days=1)
+        self.question.save()
+
+    def test_pack_ballots(self):
+        """The packed ballots give back the same users and choices."""
+        users, positions = unpack_ballots(pack_ballots(array.array('I', [3, 1, 200]), array.array('H', [0, 2, 1])))
+        self.assertEqual(users, [3, 4, 204])
+        self.assertEqual(list(positions), [0, 2, 1])
+
+    def test_archive(self):
+        """The votes leave the vote table and the result page show the frozen tally."""
+        result = archive_question(self.question)
+        self.assertFalse(Vote.objects.filter(question=self.question).exists())
+        self.assertEqual(result.tally(), {self.first.id: 1, self.second.id: 2})
+        self.assertEqual(archived_choice(result, self.users[1].id), self.second.id)
+        self.assertIsNone(archived_choice(result, 0))
+        with gzip.open(result.path, 'rt', encoding='utf-8') as stream:
+            self.assertEqual(sum(record['type'] == 'vote' for record in read_records(stream, 'jsonl')), 3)
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('polls:results', args=(self.question.id,)))
+        self.assertEqual([choice.vote_count for choice in response.context['choice_list']], [1, 2])
+
+    def test_open_question_not_archived(self):
+        """A question that can still be voted is not archived."""
+        self.question.end_date = timezone.now() + datetime.timedelta(days=1)
+        self.question.save()
+        with self.assertRaises(ValueError):
+            archive_question(self.question)
+
+    def test_vote_on_reopened_question(self):
+        """A vote on a question opened again restore the votes, so the duplicate check still work."""
+        archive_question(self.question)
+        self.question.refresh_from_db()
+        self.question.end_date = timezone.now() + datetime.timedelta(days=1)
+        self.question.save()
+        Vote.objects.cast(self.users[0], self.question, self.second)
+        self.first.refresh_from_db()
+        self.second.refresh_from_db()
+        self.assertEqual((self.first.vote_count, self.second.vote_count), (0, 3))
+        self.assertEqual(Vote.objects.filter(question=self.question).count(), 3)
+        self.assertFalse(ArchivedResult.objects.exists())
+
+    def test_command(self):
+        """The command archive the questions closed long enough and keep the tally from the recount."""
+        call_command('archive_polls', days=2, stdout=StringIO())
+        self.question.refresh_from_db()
+        self.assertFalse(self.question.archived)
+        call_command('archive_polls', days=0, stdout=StringIO())
+        call_command('reconcile_votes', stdout=StringIO())
+        self.question.refresh_from_db()
+        self.assertTrue(self.question.archived)
+        self.first.refresh_from_db()
+        self.assertEqual(self.first.vote_count, 1)
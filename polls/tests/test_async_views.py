@@ -0,0 +1,72 @@
+"""This script is use to test the logic of KU Polls web application.
+
+Test about the async views of the ASGI profile for website.
+"""
+import datetime
+
+from django.core.cache import cache
+from django.test import AsyncClient, TestCase, override_settings
+from django.urls import reverse
+from django.utils.http import urlencode
+
+from .test_detail import create_user
+from .test_question_model import create_poll, create_question
+
+# The async test client of Django 3.2 cannot send a multipart body.
+FORM = 'application/x-www-form-urlencoded'
+
+
+@override_settings(ROOT_URLCONF='mysite.async_urls', POLLS_LIVE_MAX_DURATION=0)
+class AsyncViewTests(TestCase):
+    """Test the async views show the same pages as the sync views."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user('test', 'test@gmail.com', 'testPassword')
+        cls.question, [cls.choice] = create_poll("Async question.", datetime.timedelta(days=-1), ["Async choice"])
+        cls.future = create_question(question_text="Future question.", date_time=datetime.timedelta(days=5))
+
+    def setUp(self) -> None:
+        cache.clear()
+        self.user_client = AsyncClient()
+        self.user_client.force_login(self.user)
+
+    async def test_index(self):
+        """The async index page list the published questions."""
+        response = await self.async_client.get(reverse('polls:index'))
+        self.assertContains(response, "Async question.")
+        self.assertNotContains(response, "Future question.")
+
+    async def test_detail_need_login(self):
+        """The async detail page redirect the anonymous user to the login page."""
+        response = await self.async_client.get(reverse('polls:detail', args=(self.question.id,)))
+        self.assertEqual(response.status_code, 302)
+        self.assertTrue(response.url.startswith(reverse('polls:login')))
+
+    async def test_detail(self):
+        """The async detail page show the choices and hide the future question."""
+        response = await self.user_client.get(reverse('polls:detail', args=(self.question.id,)))
+        self.assertContains(response, "Async choice")
+        response = await self.user_client.get(reverse('polls:detail', args=(self.future.id,)))
+        self.assertEqual(response.status_code, 404)
+
+    async def test_vote_and_results(self):
+        """The async vote save the vote and the async result page count it."""
+        response = await self.user_client.post(reverse('polls:vote', args=(self.question.id,)),
+                                               urlencode({'choice': self.choice.id}), content_type=FORM)
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(response.url, reverse('polls:results', args=(self.question.id,)))
+        response = await self.user_client.get(response.url)
+        self.assertEqual([choice.vote_count for choice in response.context['choice_list']], [1])
+
+    async def test_vote_without_choice(self):
+        """The async vote show the error when no choice is selected."""
+        response = await self.user_client.post(reverse('polls:vote', args=(self.question.id,)), '', content_type=FORM)
+        self.assertEqual(response.context['error_message'], "You didn't select a choice.")
+
+    async def test_live_results(self):
+        """The async live result send the snapshot of the tally as server-sent events."""
+        response = await self.async_client.get(reverse('polls:results_live', args=(self.question.id,)))
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        content = b''.join(response.streaming_content) if response.streaming else response.content
+        self.assertIn(b'event: snapshot', content)
@@ -8,7 +8,10 @@ Date: 10/31/2020
 import datetime
 
 from django.contrib.auth import authenticate
-from django.test import TestCase
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
 from .test_detail import create_user, create_question
@@ -16,8 +19,9 @@ from .test_detail import create_user, create_question
 
 class TestAuth(TestCase):
 
-    def setUp(self) -> None:
-        user = create_user('test', 'test@gmail.com', 'testPassword')
+    @classmethod
+    def setUpTestData(cls):
+        create_user('test', 'test@gmail.com', 'testPassword')
 
     def test_detail_auth(self):
         time = datetime.timedelta(days=-5)
@@ -44,3 +48,58 @@ class TestAuth(TestCase):
     def test_wrong_password(self):
         user = authenticate(username='test', password='wrong')
         self.assertFalse(user is not None and user.is_authenticated)
+
+
+@override_settings(POLLS_USER_CACHE_TIMEOUT=300)
+class CachedUserTests(TestCase):
+    """Test the user of a session is read from the cache until the user change."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user('test', 'test@gmail.com', 'testPassword')
+
+    def setUp(self) -> None:
+        cache.clear()
+        self.client.force_login(self.user)
+        self.url = reverse('polls:index')
+
+    def tables(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url)
+        return response, ' '.join(query['sql'] for query in queries)
+
+    def test_user_cached(self):
+        """Only the first request read the user table."""
+        self.assertIn('auth_user', self.tables()[1])
+        response, sql = self.tables()
+        self.assertContains(response, "Hello, test")
+        self.assertNotIn('auth_user', sql)
+
+    def test_password_change_log_out(self):
+        """Changing the password end the other sessions."""
+        self.tables()
+        self.user.set_password('newPassword')
+        self.user.save()
+        self.assertContains(self.client.get(self.url), "You are not logged in")
+
+    def test_inactive_user(self):
+        """A deactivated user is logged out on the next request."""
+        self.tables()
+        self.user.is_active = False
+        self.user.save()
+        self.assertContains(self.client.get(self.url), "You are not logged in")
+
+    def test_model_backend_session(self):
+        """A session logged in with the ModelBackend stay logged in."""
+        self.client.force_login(self.user, backend='django.contrib.auth.backends.ModelBackend')
+        self.assertContains(self.client.get(self.url), "Hello, test")
+
+    @override_settings(SESSION_ENGINE='django.contrib.sessions.backends.signed_cookies')
+    def test_signed_cookie_session(self):
+        """With the signed cookie sessions a cached request does not touch the database."""
+        self.client.force_login(self.user)
+        self.tables()
+        response, sql = self.tables()
+        self.assertContains(response, "Hello, test")
+        self.assertNotIn('django_session', sql)
+        self.assertNotIn('auth_user', sql)
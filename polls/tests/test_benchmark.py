@@ -0,0 +1,83 @@
+"""This script is use to test the logic of KU Polls web application.
+
+Test about the data generator of the benchmarks.
+"""
+import datetime
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import Sum
+from django.test import LiveServerTestCase, SimpleTestCase, TestCase, override_settings
+
+from polls.benchmark import compare_runs, parse_mix
+from polls.models import Choice, Question, Vote
+from .test_question_model import create_question
+
+
+class SeedPollsTests(TestCase):
+    """Test the seed_polls command create consistent data."""
+
+    def test_seed_polls(self):
+        """The generated votes match the generated tally."""
+        call_command('seed_polls', questions=20, choices=3, users=10, votes=100, stdout=StringIO())
+        self.assertEqual(Question.objects.count(), 20)
+        self.assertEqual(Choice.objects.count(), 60)
+        self.assertEqual(Vote.objects.count(), 100)
+        self.assertEqual(Choice.objects.aggregate(total=Sum('vote_count'))['total'], 100)
+
+    def test_bench_endpoints(self):
+        """Every vote of the benchmark is saved, more than the rate limit of one user."""
+        call_command('seed_polls', questions=20, choices=3, users=10, votes=100, stdout=StringIO())
+        stdout = StringIO()
+        call_command('bench_endpoints', repeat=40, stdout=stdout)
+        self.assertIn('vote', stdout.getvalue())
+
+
+class LoadTestReportTests(SimpleTestCase):
+    """Test the traffic mix and the comparison of two load test reports."""
+
+    def test_parse_mix(self):
+        """The mix is a weight per endpoint."""
+        self.assertEqual(parse_mix('index=40, vote=10'), {'index': 40.0, 'vote': 10.0})
+        for text in ('index', 'index=0', 'index=-1,vote=2'):
+            with self.subTest(text=text), self.assertRaises(ValueError):
+                parse_mix(text)
+
+    def test_compare_runs(self):
+        """The change is given in percent for the endpoints of both runs."""
+        stats = {'throughput': 100.0, 'p50_ms': 10.0, 'p95_ms': 20.0, 'p99_ms': 40.0}
+        baseline = {'endpoints': {'index': stats}}
+        current = {'endpoints': {'index': dict(stats, p95_ms=15.0), 'vote': stats}}
+        rows = compare_runs(baseline, current)
+        self.assertEqual(len(rows), 4)
+        self.assertIn(('index', 'p95_ms', 20.0, 15.0, -25.0), rows)
+
+
+@override_settings(POLLS_RATE_LIMITS={})
+class LoadTestCommandTests(LiveServerTestCase):
+    """Test the load test replay the traffic mix against a running server."""
+
+    def setUp(self) -> None:
+        if connection.vendor == 'sqlite' and connection.is_in_memory_db():
+            # The threads of the live server share the one connection of an in-memory database.
+            self.skipTest('Concurrent requests need a database file or a database server.')
+
+    def test_loadtest(self):
+        """Every request of the mix succeed and the report is saved as JSON."""
+        call_command('seed_polls', questions=5, choices=2, users=2, votes=4, stdout=StringIO())
+        question = create_question(question_text="Open question.", date_time=datetime.timedelta(days=-1))
+        question.choice_set.create(choice_text="Choice")
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'report.json')
+            call_command('loadtest', self.live_server_url, requests=40, concurrency=2, output=path,
+                         stdout=StringIO())
+            with open(path) as stream:
+                report = json.load(stream)
+        self.assertEqual(report['total']['count'], 40)
+        self.assertEqual(report['total']['errors'], 0)
+        self.assertEqual(set(report['endpoints']), {'index', 'detail', 'vote', 'results'})
+        self.assertTrue(Vote.objects.filter(question=question).exists())
@@ -6,12 +6,16 @@ Author: Vichisorn Wejsupakul
 Date: 10/31/2020
 """
 import datetime
+import tempfile
 
 from django.contrib.auth.models import User
 from django.test import TestCase
 from django.urls import reverse
+from django.utils import timezone
 
-from .test_question_model import create_question
+from polls.archive import archive_question
+from polls.models import Vote
+from .test_question_model import create_poll, create_question
 
 
 def create_user(username, email, password):
@@ -22,8 +26,9 @@ def create_user(username, email, password):
 class QuestionDetailViewTests(TestCase):
     """Test the question inside of detail page that is correctly display."""
 
-    def setUp(self) -> None:
-        user = create_user('test', 'test@gmail.com', 'testPassword')
+    @classmethod
+    def setUpTestData(cls):
+        create_user('test', 'test@gmail.com', 'testPassword')
 
     def test_future_question(self):
         """The detail view of a question with a pub_date in the future returns a 404 not found."""
@@ -44,3 +49,49 @@ class QuestionDetailViewTests(TestCase):
         url = reverse('polls:detail', args=(past_question.id,))
         response = self.client.get(url)
         self.assertContains(response, past_question.question_text)
+
+
+class QuestionDetailQueryTests(TestCase):
+    """Test the detail page read the question, the choices and the vote with two queries."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user('test', 'test@gmail.com', 'testPassword')
+        cls.question, cls.choices = create_poll("Detail question.", datetime.timedelta(days=-1),
+                                                ["Choice {}".format(number) for number in range(3)])
+
+    def setUp(self) -> None:
+        self.client.force_login(self.user)
+        self.url = reverse('polls:detail', args=(self.question.id,))
+
+    def test_query_count(self):
+        """The number of queries does not depend on the number of choices."""
+        Vote.objects.cast(self.user, self.question, self.choices[1])
+        self.client.get(self.url)
+        # The session and the user, then the question with the vote and the choices.
+        with self.assertNumQueries(4):
+            response = self.client.get(self.url)
+        for number in range(10):
+            self.question.choice_set.create(choice_text="Extra {}".format(number))
+        with self.assertNumQueries(4):
+            self.client.get(self.url)
+        self.assertEqual(response.context['user_choice'], self.choices[1].id)
+
+    def test_current_choice_checked(self):
+        """Only the choice that the user already vote is selected."""
+        self.assertNotContains(self.client.get(self.url), 'checked')
+        Vote.objects.cast(self.user, self.question, self.choices[2])
+        response = self.client.get(self.url)
+        self.assertContains(response, 'value="{}" checked'.format(self.choices[2].id))
+        self.assertContains(response, 'checked', count=1)
+
+    def test_archived_vote_checked(self):
+        """The vote of an archived question is read from the archived result."""
+        Vote.objects.cast(self.user, self.question, self.choices[0])
+        self.question.end_date = timezone.now() - datetime.timedelta(hours=1)
+        self.question.save()
+        with tempfile.TemporaryDirectory() as directory:
+            archive_question(self.question, directory)
+        self.assertFalse(Vote.objects.exists())
+        response = self.client.get(self.url)
+        self.assertContains(response, 'value="{}" checked'.format(self.choices[0].id))
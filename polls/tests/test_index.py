@@ -7,15 +7,21 @@ Date: 10/31/2020
 """
 import datetime
 
-from django.test import TestCase
+from django.core.cache import cache
+from django.test import TestCase, override_settings
 from django.urls import reverse
 
+from polls.caching import index_cache_state
+from polls.tests.test_detail import create_user
 from polls.tests.test_question_model import create_question
 
 
 class QuestionIndexViewTests(TestCase):
     """Test the view of question that it correctly display in the index pages."""
 
+    def setUp(self) -> None:
+        cache.clear()
+
     def test_no_questions(self):
         """If no questions exist, an appropriate message is displayed."""
         response = self.client.get(reverse('polls:index'))
@@ -58,3 +64,151 @@ class QuestionIndexViewTests(TestCase):
         response = self.client.get(reverse('polls:index'))
         self.assertQuerysetEqual(response.context['latest_question_list'],
                                  ['<Question: Past question 2.>', '<Question: Past question 1.>'])
+
+
+class QuestionIndexCacheTests(TestCase):
+    """Test the cached index page is reused and expire at the right time."""
+
+    def setUp(self) -> None:
+        cache.clear()
+
+    def test_cached_list_does_not_query_questions(self):
+        """The second request use the cached question list."""
+        create_question(question_text="Cached question.", date_time=datetime.timedelta(days=-1))
+        self.client.get(reverse('polls:index'))
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('polls:index'))
+        self.assertContains(response, "Cached question.")
+
+    def test_save_question_expire_cache(self):
+        """Changing a question show the change on the next request."""
+        question = create_question(question_text="Old text.", date_time=datetime.timedelta(days=-1))
+        self.client.get(reverse('polls:index'))
+        question.question_text = "New text."
+        question.save()
+        self.assertContains(self.client.get(reverse('polls:index')), "New text.")
+
+    def test_cache_expire_at_next_publish_date(self):
+        """The cache live only until the next question is published."""
+        create_question(question_text="Soon question.", date_time=datetime.timedelta(minutes=5))
+        self.assertLessEqual(index_cache_state()['timeout'], 5 * 60 + 1)
+
+    def test_banner_per_user(self):
+        """The login banner is cached for each user."""
+        create_question(question_text="Question.", date_time=datetime.timedelta(days=-1))
+        self.assertContains(self.client.get(reverse('polls:index')), "You are not logged in")
+        create_user('test', 'test@gmail.com', 'testPassword')
+        self.client.login(username='test', password='testPassword')
+        self.assertContains(self.client.get(reverse('polls:index')), "Hello, test")
+
+
+class QuestionIndexConditionalTests(TestCase):
+    """Test the index page answer 304 to the client that already have it."""
+
+    @classmethod
+    def setUpTestData(cls):
+        create_question(question_text="Question.", date_time=datetime.timedelta(days=-1))
+
+    def setUp(self) -> None:
+        cache.clear()
+
+    def test_not_modified(self):
+        """The same entity tag is not sent again until a question change."""
+        response = self.client.get(reverse('polls:index'))
+        self.assertEqual(response['Cache-Control'], 'no-cache, private')
+        response = self.client.get(reverse('polls:index'), HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+        create_question(question_text="New question.", date_time=datetime.timedelta(hours=-1))
+        response = self.client.get(reverse('polls:index'), HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertContains(response, "New question.")
+
+    def test_entity_tag_per_user(self):
+        """The page of a logged in user is not validated by the page of anonymous."""
+        etag = self.client.get(reverse('polls:index'))['ETag']
+        create_user('test', 'test@gmail.com', 'testPassword')
+        self.client.login(username='test', password='testPassword')
+        response = self.client.get(reverse('polls:index'), HTTP_IF_NONE_MATCH=etag)
+        self.assertContains(response, "Hello, test")
+        self.assertNotEqual(response['ETag'], etag)
+
+
+class QuestionIndexPaginationTests(TestCase):
+    """Test the index page is split into pages and can be filtered."""
+
+    @classmethod
+    def setUpTestData(cls):
+        for number in range(25):
+            create_question(question_text="Question {}.".format(number),
+                            date_time=datetime.timedelta(hours=-number - 1))
+
+    def setUp(self) -> None:
+        cache.clear()
+
+    def test_keyset_pages(self):
+        """The next link of a page continue after the last question of the page."""
+        response = self.client.get(reverse('polls:index'))
+        page = response.context['page_obj']
+        self.assertEqual(len(page.object_list), 20)
+        self.assertTrue(page.has_next)
+        response = self.client.get(reverse('polls:index') + '?' + page.next_query)
+        questions = response.context['latest_question_list']
+        self.assertEqual([question.question_text for question in questions],
+                         ["Question {}.".format(number) for number in range(20, 25)])
+        self.assertFalse(response.context['page_obj'].has_next)
+
+    @override_settings(POLLS_INDEX_PAGE_SIZE=10)
+    def test_keyset_previous_pages(self):
+        """The previous link of a page go back one page before its first question."""
+        url = reverse('polls:index')
+        page = self.client.get(url).context['page_obj']
+        page = self.client.get(url + '?' + page.next_query).context['page_obj']
+        third = self.client.get(url + '?' + page.next_query).context['page_obj']
+        response = self.client.get(url + '?' + third.previous_query)
+        page = response.context['page_obj']
+        self.assertEqual([question.question_text for question in page.object_list],
+                         ["Question {}.".format(number) for number in range(10, 20)])
+        self.assertTrue(page.has_next)
+        self.assertEqual(self.client.get(url + '?' + page.next_query).context['page_obj'].object_list,
+                         third.object_list)
+        page = self.client.get(url + '?' + page.previous_query).context['page_obj']
+        self.assertEqual([question.question_text for question in page.object_list],
+                         ["Question {}.".format(number) for number in range(10)])
+        self.assertFalse(page.has_previous)
+
+    @override_settings(POLLS_INDEX_PAGE_SIZE=10)
+    def test_keyset_previous_page_cache(self):
+        """A page read backward is not cached as the first page."""
+        url = reverse('polls:index')
+        page = self.client.get(url).context['page_obj']
+        page = self.client.get(url + '?' + page.next_query).context['page_obj']
+        third = self.client.get(url + '?' + page.next_query).context['page_obj']
+        cache.clear()
+        self.assertContains(self.client.get(url + '?' + third.previous_query), "Question 10.")
+        response = self.client.get(url)
+        self.assertContains(response, "Question 0.")
+        self.assertNotContains(response, "Question 10.")
+
+    def test_offset_pages(self):
+        """The page parameter select the page by number."""
+        response = self.client.get(reverse('polls:index') + '?page=2')
+        self.assertEqual(len(response.context['latest_question_list']), 5)
+        self.assertEqual(response.context['page_obj'].previous_query, 'page=1')
+
+    def test_invalid_page(self):
+        """An invalid page or cursor return 404."""
+        self.assertEqual(self.client.get(reverse('polls:index') + '?page=9').status_code, 404)
+        self.assertEqual(self.client.get(reverse('polls:index') + '?after=bad').status_code, 404)
+
+    def test_filters(self):
+        """The status parameter keep only the open, closed or recent questions."""
+        closed = create_question(question_text="Closed question.", date_time=datetime.timedelta(days=-3))
+        closed.end_date = closed.pub_date + datetime.timedelta(days=1)
+        closed.save()
+        response = self.client.get(reverse('polls:index') + '?status=closed')
+        self.assertQuerysetEqual(response.context['latest_question_list'], ['<Question: Closed question.>'])
+        response = self.client.get(reverse('polls:index') + '?status=open&page=2')
+        self.assertEqual(len(response.context['latest_question_list']), 5)
+        response = self.client.get(reverse('polls:index') + '?status=recent')
+        self.assertNotContains(response, "Closed question.")
+        self.assertIn('status=recent', response.context['page_obj'].next_query)
@@ -0,0 +1,124 @@
+"""This script is use to test the logic of KU Polls web application.
+
+Test about the write-behind vote queue for website.
+"""
+import datetime
+import json
+import os
+import tempfile
+import time
+
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from polls.ingest import PENDING_SESSION_KEY, VoteQueue, apply_votes, get_vote_queue
+from polls.models import Vote
+from .test_detail import create_user
+from .test_question_model import create_question
+
+
+class VoteQueueTests(TestCase):
+    """Test the votes in the queue mode are applied and shown to the user."""
+
+    def setUp(self) -> None:
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        settings = override_settings(POLLS_VOTE_INGESTION='queue', POLLS_VOTE_QUEUE_DIR=self.directory,
+                                     POLLS_VOTE_QUEUE_INTERVAL=0)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.user = create_user('test', 'test@gmail.com', 'testPassword')
+        self.question = create_question(question_text="Queue question.", date_time=datetime.timedelta(days=-1))
+        self.first = self.question.choice_set.create(choice_text="First")
+        self.second = self.question.choice_set.create(choice_text="Second")
+        self.client.login(username='test', password='testPassword')
+
+    def vote(self, choice):
+        return self.client.post(reverse('polls:vote', args=(self.question.id,)), {'choice': choice.id})
+
+    def results(self):
+        response = self.client.get(reverse('polls:results', args=(self.question.id,)))
+        return [choice.vote_count for choice in response.context['choice_list']]
+
+    def test_vote_is_queued(self):
+        """The vote is written to the journal and not to the database."""
+        response = self.vote(self.first)
+        self.assertRedirects(response, reverse('polls:results', args=(self.question.id,)))
+        self.assertFalse(Vote.objects.exists())
+        self.assertEqual(get_vote_queue().pending, 1)
+
+    def test_results_show_own_queued_vote(self):
+        """The user see the queued vote in the result before and after it is applied."""
+        Vote.objects.cast(self.user, self.question, self.first)
+        self.vote(self.second)
+        self.assertEqual(self.results(), [0, 1])
+        self.assertEqual(get_vote_queue().drain(), 1)
+        self.first.refresh_from_db()
+        self.second.refresh_from_db()
+        self.assertEqual((self.first.vote_count, self.second.vote_count), (0, 1))
+        self.assertEqual(self.results(), [0, 1])
+
+    def test_back_pressure(self):
+        """When the queue is full the request apply the queued votes first."""
+        with override_settings(POLLS_VOTE_QUEUE_MAX_PENDING=1):
+            self.vote(self.first)
+            self.vote(self.second)
+            self.assertEqual(Vote.objects.get().choice, self.first)
+            self.assertEqual(get_vote_queue().pending, 1)
+
+    def test_recover_journal_of_stopped_process(self):
+        """A new queue apply the journal that a crashed process left and skip a damaged line."""
+        with open(os.path.join(self.directory, 'votes-999999.log'), 'w') as journal:
+            journal.write(json.dumps({'q': self.question.id, 'u': self.user.id, 'c': self.second.id}) + '\n')
+            journal.write('{"q": ')
+        queue = VoteQueue(self.directory, interval=0)
+        self.addCleanup(queue.stop)
+        self.assertEqual(queue.pending, 1)
+        queue.drain()
+        self.assertEqual(Vote.objects.get().choice, self.second)
+        self.assertEqual(os.listdir(self.directory), ['votes-{}.lock'.format(os.getpid())])
+
+    def test_apply_votes_twice(self):
+        """Applying the same entries again does not change the tally."""
+        entries = [{'q': self.question.id, 'u': self.user.id, 'c': self.first.id},
+                   {'q': self.question.id, 'u': self.user.id, 'c': self.second.id}]
+        self.assertEqual(apply_votes(entries), 1)
+        self.assertEqual(apply_votes(entries), 0)
+        self.second.refresh_from_db()
+        self.assertEqual(self.second.vote_count, 1)
+
+    def test_apply_latest_vote_of_every_process(self):
+        """The newest entry win even when its segment is applied first, and an old segment change nothing."""
+        newer = [{'q': self.question.id, 'u': self.user.id, 'c': self.second.id, 't': 200.0}]
+        older = [{'q': self.question.id, 'u': self.user.id, 'c': self.first.id, 't': 100.0}]
+        self.assertEqual(apply_votes(older + newer), 1)
+        self.assertEqual(Vote.objects.get().choice, self.second)
+        self.assertEqual(apply_votes(older), 0)
+        self.assertEqual(Vote.objects.get().choice, self.second)
+        self.first.refresh_from_db()
+        self.second.refresh_from_db()
+        self.assertEqual((self.first.vote_count, self.second.vote_count), (0, 1))
+
+    def test_queued_vote_older_than_saved_vote(self):
+        """A queued vote made before the saved vote does not replace it."""
+        queued_at = time.time()
+        Vote.objects.cast(self.user, self.question, self.second)
+        apply_votes([{'q': self.question.id, 'u': self.user.id, 'c': self.first.id, 't': queued_at - 1}])
+        self.assertEqual(Vote.objects.get().choice, self.second)
+
+    def test_pending_vote_of_deleted_choice(self):
+        """A queued vote that the drainer dropped is not counted and is removed from the session."""
+        self.vote(self.second)
+        self.second.delete()
+        get_vote_queue().drain()
+        self.assertEqual(self.results(), [0])
+        self.assertNotIn(str(self.question.id), self.client.session.get(PENDING_SESSION_KEY, {}))
+
+    def test_pending_vote_expire(self):
+        """A queued vote is counted only for POLLS_VOTE_QUEUE_PENDING_AGE seconds."""
+        self.vote(self.second)
+        self.assertEqual(self.results(), [0, 1])
+        with override_settings(POLLS_VOTE_QUEUE_PENDING_AGE=-1):
+            self.assertEqual(self.results(), [0, 0])
+        self.assertNotIn(str(self.question.id), self.client.session.get(PENDING_SESSION_KEY, {}))
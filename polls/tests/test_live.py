@@ -0,0 +1,113 @@
+"""This script is use to test the logic of KU Polls web application.
+
+Test about the live result stream for website.
+"""
+import datetime
+import json
+
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from polls.live import LocalBroker, get_broker
+from polls.models import Vote
+from .test_detail import create_user
+from .test_question_model import create_question
+
+
+def parse_events(text):
+    """Return the name and the data of the server-sent events in the text."""
+    events = []
+    for block in text.split('\n\n'):
+        fields = dict(line.split(': ', 1) for line in block.splitlines() if not line.startswith(':'))
+        if 'event' in fields:
+            events.append((fields['event'], json.loads(fields['data'])))
+    return events
+
+
+class LiveResultTests(TestCase):
+    """Test the vote changes are batched and sent to every viewer of the question."""
+
+    def setUp(self) -> None:
+        # Every test get a new broker without its background thread.
+        settings = override_settings(POLLS_LIVE_WINDOW=0)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.user = create_user('test', 'test@gmail.com', 'testPassword')
+        self.question = create_question(question_text="Live question.", date_time=datetime.timedelta(days=-1))
+        self.first = self.question.choice_set.create(choice_text="First")
+        self.second = self.question.choice_set.create(choice_text="Second")
+
+    def test_snapshot_first(self):
+        """A new subscription start with the current tally."""
+        Vote.objects.cast(self.user, self.question, self.first)
+        subscription = LocalBroker(window=0).subscribe(self.question.id)
+        [event] = subscription.take()
+        self.assertEqual(event['event'], 'snapshot')
+        self.assertEqual(event['data']['counts'], {self.first.id: 1, self.second.id: 0})
+
+    def test_window_is_batched(self):
+        """The changes of one window reach every viewer as one event, with no query."""
+        broker = LocalBroker(window=0)
+        viewers = [broker.subscribe(self.question.id) for _ in range(3)]
+        for viewer in viewers:
+            viewer.take()
+        broker.publish({self.first.id: 1})
+        broker.publish({self.first.id: 1, self.second.id: 1})
+        broker.publish({self.second.id: -1})
+        with self.assertNumQueries(0):
+            broker.flush()
+        for viewer in viewers:
+            [event] = viewer.get(0)
+            self.assertEqual(event['data']['deltas'], {self.first.id: 2})
+            self.assertEqual(event['data']['counts'], {self.first.id: 2, self.second.id: 0})
+
+    def test_committed_vote_is_published(self):
+        """A vote is sent to the viewers only after its transaction commit."""
+        subscription = get_broker().subscribe(self.question.id)
+        subscription.take()
+        with self.captureOnCommitCallbacks(execute=True):
+            Vote.objects.cast(self.user, self.question, self.second)
+        get_broker().flush()
+        [event] = subscription.get(0)
+        self.assertEqual(event['data']['deltas'], {self.second.id: 1})
+
+    def test_resync_see_other_process(self):
+        """A change made outside the process is found when the tally is read again."""
+        broker = LocalBroker(window=0, resync=0)
+        subscription = broker.subscribe(self.question.id)
+        subscription.take()
+        self.first.vote_count = 5
+        self.first.save()
+        broker.flush()
+        broker.flush()
+        [event] = subscription.get(0)
+        self.assertEqual(event['data']['counts'][self.first.id], 5)
+
+    def test_idle_question_is_forgotten(self):
+        """The question is dropped once its last viewer left."""
+        broker = LocalBroker(window=0, idle=0)
+        broker.subscribe(self.question.id).close()
+        self.assertFalse(broker.flush())
+
+    def test_stream(self):
+        """The sync live result answer the snapshot as a server-sent event and close."""
+        response = self.client.get(reverse('polls:results_live', args=(self.question.id,)))
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        self.assertFalse(response.streaming)
+        text = response.content.decode()
+        self.assertTrue(text.startswith('retry: '))
+        [(name, data)] = parse_events(text)
+        self.assertEqual(name, 'snapshot')
+        self.assertEqual(data['counts'], {str(self.first.id): 0, str(self.second.id): 0})
+
+    def test_result_page_stream(self):
+        """The result page open the live stream only when the views are async."""
+        url = reverse('polls:results', args=(self.question.id,))
+        self.assertNotContains(self.client.get(url), 'EventSource')
+        with override_settings(POLLS_ASYNC_VIEWS=True):
+            self.assertContains(self.client.get(url), 'EventSource')
+
+    def test_stream_unknown_question(self):
+        """The live result of a question that does not exist is not found."""
+        response = self.client.get(reverse('polls:results_live', args=(999,)))
+        self.assertEqual(response.status_code, 404)
@@ -0,0 +1,73 @@
+"""This script is use to test the logic of KU Polls web application.
+
+Test about the structured logging for website.
+"""
+import json
+import logging
+import os
+import tempfile
+from unittest import mock
+
+from django.test import TestCase
+from django.urls import reverse
+
+from polls.log import BackgroundHandler, JsonFormatter, RequestIdFilter, SamplingFilter, request_id
+
+
+class LoggingTests(TestCase):
+    """Test the log records are written by the background thread as JSON lines."""
+
+    def setUp(self) -> None:
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'test.log')
+        self.handler = BackgroundHandler(filename=self.path, console=False)
+        self.handler.setFormatter(JsonFormatter())
+        self.handler.addFilter(RequestIdFilter())
+        self.addCleanup(self.handler.close)
+        self.logger = logging.getLogger('polls.tests.log')
+        self.logger.propagate = False
+        self.logger.setLevel(logging.INFO)
+        self.logger.addHandler(self.handler)
+        self.addCleanup(self.logger.removeHandler, self.handler)
+
+    def records(self):
+        self.handler.flush()
+        with open(self.path, encoding='utf-8') as handle:
+            return [json.loads(line) for line in handle]
+
+    def test_json_record(self):
+        """The record is written as JSON with its lazy arguments, extra fields and request id."""
+        token = request_id.set('abc')
+        try:
+            self.logger.info('Vote: This %s vote at question id:%s', 'test', 3, extra={'event': 'vote'})
+        finally:
+            request_id.reset(token)
+        [record] = self.records()
+        self.assertEqual(record['message'], 'Vote: This test vote at question id:3')
+        self.assertEqual(record['level'], 'INFO')
+        self.assertEqual(record['event'], 'vote')
+        self.assertEqual(record['request_id'], 'abc')
+
+    def test_sampling(self):
+        """The sampled out events are dropped but their errors are kept."""
+        self.handler.addFilter(SamplingFilter({'vote': 0}))
+        self.logger.info('sampled out', extra={'event': 'vote'})
+        self.logger.info('kept', extra={'event': 'login'})
+        self.logger.error('error kept', extra={'event': 'vote'})
+        self.assertEqual([record['message'] for record in self.records()], ['kept', 'error kept'])
+
+    def test_full_queue_drop(self):
+        """A record that does not fit in the queue is dropped instead of blocking."""
+        handler = BackgroundHandler(console=False, max_size=1, handlers=[])
+        with mock.patch.object(handler, 'start'):
+            handler.enqueue(logging.makeLogRecord({'msg': 'kept'}))
+            handler.enqueue(logging.makeLogRecord({'msg': 'dropped'}))
+        self.assertEqual(handler.dropped, 1)
+
+    def test_request_id_header(self):
+        """The response carry the id of the request, taken from the request header if given."""
+        response = self.client.get(reverse('polls:login'), HTTP_X_REQUEST_ID='request-1')
+        self.assertEqual(response['X-Request-ID'], 'request-1')
+        response = self.client.get(reverse('polls:login'))
+        self.assertEqual(len(response['X-Request-ID']), 32)
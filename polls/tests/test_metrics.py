@@ -0,0 +1,52 @@
+"""This script is use to test the logic of KU Polls web application.
+
+Test about the request metrics for website.
+"""
+import datetime
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from polls.metrics import registry
+from .test_question_model import create_poll
+
+
+class MetricsTests(TestCase):
+    """Test the timing of the polls views is shown in the Prometheus format."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.question, _ = create_poll("Metric question.", datetime.timedelta(days=-1), ["Choice"])
+
+    def setUp(self) -> None:
+        # The results table that the last test cached is not read from the database.
+        cache.clear()
+        registry.clear()
+        self.addCleanup(registry.clear)
+
+    def metrics(self):
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response['Content-Type'], 'text/plain; version=0.0.4; charset=utf-8')
+        return response.content.decode()
+
+    @override_settings(POLLS_METRICS_SAMPLE_RATE=1.0)
+    def test_view_metrics(self):
+        """A measured request add its time, queries and template time to its view."""
+        self.client.get(reverse('polls:results', args=(self.question.id,)))
+        text = self.metrics()
+        self.assertIn('# TYPE polls_view_seconds summary', text)
+        self.assertIn('polls_view_seconds{view="polls:results",quantile="0.99"}', text)
+        self.assertIn('polls_db_queries{view="polls:results",quantile="0.5"} 2', text)
+        self.assertIn('polls_template_seconds_count{view="polls:results"} 1', text)
+        self.assertNotIn('view="metrics"', text)
+
+    def test_sampling_off(self):
+        """No request is measured when the sampling is off."""
+        self.client.get(reverse('polls:results', args=(self.question.id,)))
+        self.assertNotIn('view="polls:results"', self.metrics())
+
+    def test_remote_client_forbidden(self):
+        """Only the local clients can read the metrics."""
+        response = self.client.get(reverse('metrics'), REMOTE_ADDR='10.0.0.1')
+        self.assertEqual(response.status_code, 403)
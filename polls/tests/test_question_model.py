@@ -33,6 +33,21 @@ def create_question(question_text, date_time):
                                    end_date=end_time)
 
 
+def create_poll(question_text, date_time, choice_texts=("First", "Second")):
+    """Create a question with its choices for using in the `setUpTestData` of a test case.
+
+    Args:
+        question_text: text of the question in the question model.
+        date_time: days for public date and end date, like `create_question`.
+        choice_texts: text of each choice of the question.
+
+    Returns: the question and the list of its choices.
+
+    """
+    question = create_question(question_text=question_text, date_time=date_time)
+    return question, [question.choice_set.create(choice_text=text) for text in choice_texts]
+
+
 class QuestionModelTests(TestCase):
     """Test for model of question that can use correctly or not."""
 
@@ -88,3 +103,20 @@ class QuestionModelTests(TestCase):
         end_time = pub_time + datetime.timedelta(minutes=30)
         close_question = Question(pub_date=pub_time, end_date=end_time)
         self.assertIs(close_question.can_vote(), False)
+
+
+class QuestionQuerySetTests(TestCase):
+    """Test the state annotated by the database match the methods of the question."""
+
+    def test_with_status(self):
+        """with_status() annotate the same state as is_published(), was_published_recently() and can_vote()."""
+        create_question(question_text="Future", date_time=datetime.timedelta(days=30))
+        create_question(question_text="Recent", date_time=datetime.timedelta(hours=-1))
+        create_question(question_text="Old", date_time=datetime.timedelta(days=-30))
+        closed = create_question(question_text="Closed", date_time=datetime.timedelta(days=-30))
+        closed.end_date = timezone.now() - datetime.timedelta(days=1)
+        closed.save()
+        for question in Question.objects.with_status():
+            self.assertEqual((question.published, question.published_recently, question.voting_open),
+                             (question.is_published(), question.was_published_recently(), question.can_vote()),
+                             question.question_text)
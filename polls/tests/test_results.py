@@ -0,0 +1,139 @@
+"""This script is use to test the logic of KU Polls web application.
+
+Test about results page and results API for website.
+"""
+import datetime
+
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from polls.models import Choice, Question, Vote
+from .test_detail import create_user
+from .test_question_model import create_poll, create_question
+
+
+class QuestionResultsViewTests(TestCase):
+    """Test the result of the question is display with a fixed number of queries."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.question = create_question(question_text="Results question.", date_time=datetime.timedelta(days=-1))
+        cls.question.choice_set.create(choice_text="First", vote_count=1)
+        cls.question.choice_set.create(choice_text="Second", vote_count=3)
+
+    def test_results_query_count(self):
+        """The result page use the same number of queries no matter how many choices."""
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('polls:results', args=(self.question.id,)))
+        self.assertContains(response, "Second")
+        for number in range(10):
+            self.question.choice_set.create(choice_text="Extra {}".format(number))
+        with self.assertNumQueries(2):
+            self.client.get(reverse('polls:results', args=(self.question.id,)))
+
+    def test_results_json(self):
+        """The result API return the vote count and the percentage of each choice."""
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('polls:results_json', args=(self.question.id,)))
+        data = response.json()
+        self.assertEqual(data['total_votes'], 4)
+        self.assertEqual([(c['choice_text'], c['votes'], c['percentage']) for c in data['choices']],
+                         [("First", 1, 25.0), ("Second", 3, 75.0)])
+
+    def test_results_json_without_votes(self):
+        """The percentage is zero when nobody vote the question."""
+        question = create_question(question_text="Empty question.", date_time=datetime.timedelta(days=-1))
+        question.choice_set.create(choice_text="Only")
+        data = self.client.get(reverse('polls:results_json', args=(question.id,))).json()
+        self.assertEqual(data['choices'][0]['percentage'], 0.0)
+
+    def test_results_json_not_found(self):
+        """The result API return 404 for question that does not exist."""
+        response = self.client.get(reverse('polls:results_json', args=(999,)))
+        self.assertEqual(response.status_code, 404)
+
+
+class QuestionResultsCacheTests(TestCase):
+    """Test the result table is cached until the tally of the question change."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.question = create_question(question_text="Cached results.", date_time=datetime.timedelta(days=-1))
+        cls.choice = cls.question.choice_set.create(choice_text="Only", vote_count=3)
+        cls.url = reverse('polls:results', args=(cls.question.id,))
+
+    def setUp(self) -> None:
+        cache.clear()
+
+    def test_cached_table_does_not_query_choices(self):
+        """The second request only read the question."""
+        self.client.get(self.url)
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url)
+        self.assertContains(response, '<p id="choice-{}-votes">3</p>'.format(self.choice.id), html=True)
+
+    def test_vote_expire_cache(self):
+        """A vote show the new tally on the next request."""
+        self.client.get(self.url)
+        Vote.objects.cast(create_user('test', 'test@gmail.com', 'testPassword'), self.question, self.choice)
+        response = self.client.get(self.url)
+        self.assertContains(response, '<p id="choice-{}-votes">4</p>'.format(self.choice.id), html=True)
+
+    def test_vote_of_other_process(self):
+        """A vote saved by another process, which does not touch the cache of this one, show the new tally."""
+        etag = self.client.get(self.url)['ETag']
+        Choice.objects.filter(pk=self.choice.pk).update(vote_count=4)
+        Question.objects.filter(pk=self.question.pk).update(last_vote_at=timezone.now())
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertContains(response, '<p id="choice-{}-votes">4</p>'.format(self.choice.id), html=True)
+        data = self.client.get(reverse('polls:results_json', args=(self.question.id,))).json()
+        self.assertEqual(data['total_votes'], 4)
+
+
+class QuestionResultsConditionalTests(TestCase):
+    """Test the result page answer 304 until the question or its tally change."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.question, [cls.choice] = create_poll("Validated results.", datetime.timedelta(days=-1), ["Only"])
+        cls.url = reverse('polls:results', args=(cls.question.id,))
+
+    def setUp(self) -> None:
+        cache.clear()
+
+    def test_not_modified(self):
+        """The client that send the entity tag get 304 with only the question read."""
+        response = self.client.get(self.url)
+        self.assertEqual(response['Cache-Control'], 'no-cache')
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_vote_change_entity_tag(self):
+        """A vote make the page of the client stale."""
+        etag = self.client.get(self.url)['ETag']
+        Vote.objects.cast(create_user('test', 'test@gmail.com', 'testPassword'), self.question, self.choice)
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertContains(response, '<p id="choice-{}-votes">1</p>'.format(self.choice.id), html=True)
+
+    def test_if_modified_since(self):
+        """The page is not sent again when it did not change since the Last-Modified date."""
+        last_modified = self.client.get(self.url)['Last-Modified']
+        self.assertEqual(self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=last_modified).status_code, 304)
+        self.choice.choice_text = "Renamed"
+        self.choice.save()
+        self.question.refresh_from_db()
+        self.assertGreater(self.question.modified, self.question.pub_date)
+        self.assertContains(self.client.get(self.url, HTTP_IF_MODIFIED_SINCE='Thu, 01 Jan 1970 00:00:00 GMT'),
+                            "Renamed")
+
+    def test_json_entity_tag(self):
+        """The result API and the result page do not share the entity tag."""
+        page = self.client.get(self.url)['ETag']
+        url = reverse('polls:results_json', args=(self.question.id,))
+        api = self.client.get(url)
+        self.assertNotEqual(api['ETag'], page)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=api['ETag'])
+        self.assertEqual(response.status_code, 304)
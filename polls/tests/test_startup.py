@@ -0,0 +1,59 @@
+"""This script is use to test the logic of KU Polls web application.
+
+Test about the preload of the application and the cold start benchmark.
+"""
+import gc
+from io import StringIO
+
+from django.core.management import CommandError, call_command
+from django.template import engines
+from django.test import TestCase, override_settings
+
+from polls.benchmark import import_profile
+from polls.startup import preload
+
+
+class PreloadTests(TestCase):
+    """Test the application is loaded before its first request without touching the database."""
+
+    def setUp(self) -> None:
+        if hasattr(gc, 'unfreeze'):
+            self.addCleanup(gc.unfreeze)
+
+    @override_settings(POLLS_PRELOAD=True)
+    def test_preload(self):
+        """The templates of the project are compiled and no query is sent."""
+        with self.assertNumQueries(0):
+            names = preload()
+        self.assertIn('polls/index.html', names)
+        self.assertIn('polls/results.html', names)
+        loader = engines.all()[0].engine.template_loaders[0]
+        self.assertIn('polls/index.html', loader.get_template_cache)
+
+    @override_settings(POLLS_PRELOAD=False)
+    def test_disabled(self):
+        """Nothing is loaded when the preload is off."""
+        self.assertEqual(preload(), [])
+
+    def test_import_profile(self):
+        """The import time of the modules is added up by top-level package."""
+        text = ('import time: self [us] | cumulative | imported package\n'
+                'import time:       300 |        300 |   django.utils\n'
+                'import time:       200 |        500 | django\n'
+                'import time:      1000 |       1000 | polls.views\n'
+                'UserWarning: something else\n')
+        self.assertEqual(import_profile(text), [('polls', 0.001, 1), ('django', 0.0005, 2)])
+
+
+class StartupBenchmarkTests(TestCase):
+    """Test the cold start benchmark start the application in a new process."""
+
+    def test_budget(self):
+        """The timings and the import profile are printed, and a too small budget fail."""
+        stdout = StringIO()
+        with self.assertRaisesMessage(CommandError, 'more than the budget of 0.0 ms'):
+            call_command('bench_startup', runs=1, path='/polls/login/', top=3, budget=0, stdout=stdout)
+        output = stdout.getvalue()
+        self.assertIn('WSGI with preload, first request /polls/login/ answered 200:', output)
+        self.assertIn('cold_start', output)
+        self.assertIn('django', output)
@@ -0,0 +1,59 @@
+"""This script is use to test the logic of KU Polls web application.
+
+Test about the static files pipeline.
+"""
+import gzip
+import os
+import tempfile
+from io import StringIO
+
+from django.conf import settings
+from django.core.management import call_command
+from django.templatetags.static import static
+from django.test import SimpleTestCase, override_settings
+from PIL import Image
+
+
+class StaticFilesTests(SimpleTestCase):
+    """Test the static files are hashed, compressed and cached forever."""
+
+    def setUp(self) -> None:
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        settings_override = override_settings(STATIC_ROOT=directory.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def test_vendored_assets(self):
+        """The files that replace the CDNs match their integrity hash."""
+        call_command('vendor_static', check=True, stdout=StringIO())
+
+    def test_convert_referenced_images(self):
+        """Only the copies of the GIF images that a stylesheet use are written."""
+        directory = os.path.join(settings.STATIC_ROOT, 'source')
+        os.makedirs(os.path.join(directory, 'images'))
+        for name in ('used', 'unused'):
+            Image.new('RGB', (8, 8), 'white').save(os.path.join(directory, 'images', name + '.gif'))
+        with open(os.path.join(directory, 'style.css'), 'w') as stream:
+            stream.write('body { background-image: image-set(url("images/used.webp") type("image/webp")); }\n')
+        call_command('convert_images', directory, format=['webp', 'avif'], min_saving=-100, stdout=StringIO())
+        images = sorted(os.listdir(os.path.join(directory, 'images')))
+        self.assertEqual(images, ['unused.gif', 'used.gif', 'used.webp'])
+
+    def test_not_collected(self):
+        """Before collectstatic the urls use the names of the source files."""
+        self.assertEqual(static('polls/style.css'), '/static/polls/style.css')
+
+    @override_settings(STATICFILES_DIRS=[('polls', os.path.join(settings.BASE_DIR, 'static', 'polls'))],
+                       STATICFILES_FINDERS=['django.contrib.staticfiles.finders.FileSystemFinder'])
+    def test_collected(self):
+        """The collected files are served compressed with an immutable cache header."""
+        call_command('collectstatic', interactive=False, verbosity=0)
+        url = static('polls/style.css')
+        self.assertRegex(url, r'^/static/polls/style\.[0-9a-f]{12}\.css$')
+        response = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('immutable', response['Cache-Control'])
+        content = gzip.decompress(b''.join(response.streaming_content)).decode()
+        self.assertIn(static('polls/images/background2.avif').rsplit('/', 1)[1], content)
+        self.assertEqual(self.client.get('/static/polls/style.css').status_code, 404)
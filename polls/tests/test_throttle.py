@@ -0,0 +1,98 @@
+"""This script is use to test the logic of KU Polls web application.
+
+Test about the rate limit of the login, registration and vote.
+"""
+import datetime
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from polls.throttle import CacheLimiter, LocalLimiter, parse_rate, take_token
+from .test_detail import create_user
+from .test_question_model import create_question
+
+LIMITS = {'login.ip': '3/m', 'login.user': '2/m', 'register.ip': '1/h', 'vote.user': '1/m'}
+
+
+class TokenBucketTests(SimpleTestCase):
+    """Test the tokens are taken and filled again at the rate."""
+
+    def test_parse_rate(self):
+        """The rate is a count per unit of time."""
+        self.assertEqual(parse_rate('10/m'), (10, 60))
+        self.assertEqual(parse_rate('5/hour'), (5, 3600))
+        self.assertIsNone(parse_rate(''))
+
+    def test_refill(self):
+        """An empty bucket get one token back after the period divided by the capacity."""
+        state = None
+        for _ in range(2):
+            state, wait = take_token(state, 2, 60, 100.0)
+            self.assertEqual(wait, 0)
+        state, wait = take_token(state, 2, 60, 100.0)
+        self.assertEqual(wait, 30)
+        self.assertEqual(take_token(state, 2, 60, 130.0)[1], 0)
+
+    def test_limiters(self):
+        """Both limiters keep a bucket per key."""
+        for limiter in (LocalLimiter(), CacheLimiter()):
+            with self.subTest(limiter=type(limiter).__name__):
+                self.assertEqual(limiter.take('test:a', 1, 60), 0)
+                self.assertGreater(limiter.take('test:a', 1, 60), 0)
+                self.assertEqual(limiter.take('test:b', 1, 60), 0)
+        cache.clear()
+
+
+class ThrottleViewTests(TestCase):
+    """Test the limited requests are rejected before the password is checked."""
+
+    @classmethod
+    def setUpTestData(cls):
+        create_user('test', 'test@gmail.com', 'testPassword')
+
+    def setUp(self) -> None:
+        # Every test start with a new limiter and full buckets.
+        settings_override = override_settings(POLLS_RATE_LIMITS=LIMITS)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def login(self, username='test', address='127.0.0.1'):
+        return self.client.post(reverse('polls:login'), {'username': username, 'password': 'wrong'},
+                                REMOTE_ADDR=address)
+
+    def test_login_per_user(self):
+        """The third attempt on one user is rejected without hashing the password."""
+        self.assertEqual(self.login().status_code, 200)
+        self.assertEqual(self.login(address='10.0.0.2').status_code, 200)
+        with mock.patch('polls.views.authenticate') as authenticate, self.assertNumQueries(0):
+            response = self.login(username='TEST', address='10.0.0.3')
+        self.assertEqual(response.status_code, 429)
+        self.assertIn('Retry-After', response)
+        authenticate.assert_not_called()
+
+    def test_login_per_address(self):
+        """One address cannot try many users."""
+        for username in ('a', 'b', 'c'):
+            self.assertEqual(self.login(username=username).status_code, 200)
+        self.assertEqual(self.login(username='d').status_code, 429)
+        self.assertEqual(self.login(username='d', address='10.0.0.2').status_code, 200)
+
+    def test_register(self):
+        """The second registration of an address is rejected."""
+        data = {'username': 'new', 'email': 'new@gmail.com', 'password1': 'Secret-1234', 'password2': 'Secret-1234'}
+        self.assertRedirects(self.client.post(reverse('polls:register'), data), reverse('polls:login'))
+        data['username'] = 'other'
+        self.assertEqual(self.client.post(reverse('polls:register'), data).status_code, 429)
+
+    def test_vote(self):
+        """A user cannot send votes faster than the rate."""
+        question = create_question(question_text="Limited question.", date_time=datetime.timedelta(days=-1))
+        choice = question.choice_set.create(choice_text="Only")
+        self.client.login(username='test', password='testPassword')
+        url = reverse('polls:vote', args=(question.id,))
+        self.assertEqual(self.client.post(url, {'choice': choice.id}).status_code, 302)
+        with self.assertNumQueries(2):
+            # Only the session and the user of the login are read.
+            self.assertEqual(self.client.post(url, {'choice': choice.id}).status_code, 429)
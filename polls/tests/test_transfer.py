@@ -0,0 +1,107 @@
+"""This script is use to test the logic of KU Polls web application.
+
+Test about the export and import of the polls.
+"""
+import datetime
+import os
+import tempfile
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+from django.utils import timezone
+
+from polls.archive import archive_question
+from polls.models import Choice, Question, Vote
+from .test_detail import create_user
+from .test_question_model import create_poll
+
+
+class TransferTests(TestCase):
+    """Test a poll exported to a file is imported back with the same votes."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.question, (cls.first, cls.second) = create_poll("Transfer question.", datetime.timedelta(days=-1))
+        for number in range(5):
+            user = create_user('user{}'.format(number), 'user{}@gmail.com'.format(number), 'testPassword')
+            Vote.objects.cast(user, cls.question, cls.first if number < 3 else cls.second)
+
+    def setUp(self) -> None:
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+
+    def round_trip(self, name, **options):
+        path = os.path.join(self.directory, name)
+        call_command('export_poll', self.question.id, output=path, chunk_size=2, stdout=StringIO())
+        call_command('import_poll', path, batch_size=2, stdout=StringIO(), **options)
+        return Question.objects.exclude(pk=self.question.pk).get()
+
+    def assert_same_poll(self, question):
+        self.assertEqual(question.question_text, self.question.question_text)
+        self.assertEqual(question.pub_date, self.question.pub_date)
+        self.assertEqual([(choice.choice_text, choice.vote_count) for choice in question.choice_set.order_by('id')],
+                         [("First", 3), ("Second", 2)])
+        votes = Vote.objects.values_list('user__username', 'choice__choice_text')
+        self.assertEqual(set(votes.filter(question=question)), set(votes.filter(question=self.question)))
+
+    def test_csv(self):
+        """A poll exported as CSV is imported as a new question."""
+        self.assert_same_poll(self.round_trip('poll.csv'))
+
+    def test_jsonl(self):
+        """A poll exported as JSON Lines is imported as a new question."""
+        self.assert_same_poll(self.round_trip('poll.jsonl'))
+
+    def test_archived(self):
+        """The votes of an archived question are exported from its ballots."""
+        Question.objects.filter(pk=self.question.pk).update(end_date=timezone.now() - datetime.timedelta(hours=1))
+        archive_question(self.question, directory='')
+        self.question.refresh_from_db()
+        question = self.round_trip('poll.jsonl')
+        self.assertEqual([(choice.choice_text, choice.vote_count) for choice in question.choice_set.order_by('id')],
+                         [("First", 3), ("Second", 2)])
+        votes = Vote.objects.filter(question=question).values_list('user__username', 'choice__choice_text')
+        self.assertEqual(set(votes), {('user0', "First"), ('user1', "First"), ('user2', "First"),
+                                      ('user3', "Second"), ('user4', "Second")})
+
+    def test_unknown_users(self):
+        """The votes of unknown users are skipped, or their users are created when asked."""
+        path = os.path.join(self.directory, 'poll.jsonl')
+        call_command('export_poll', self.question.id, output=path, stdout=StringIO())
+        User.objects.filter(username='user0').delete()
+        call_command('import_poll', path, stdout=StringIO())
+        imported = Question.objects.order_by('-id').first()
+        self.assertEqual(Vote.objects.filter(question=imported).count(), 4)
+        call_command('import_poll', path, create_users=True, stdout=StringIO())
+        imported = Question.objects.order_by('-id').first()
+        self.assertEqual(Vote.objects.filter(question=imported).count(), 5)
+        self.assertFalse(User.objects.get(username='user0').has_usable_password())
+
+    def test_duplicate_votes(self):
+        """The last vote of a user in the file is kept, also when it is in a later batch."""
+        path = os.path.join(self.directory, 'poll.jsonl')
+        call_command('export_poll', self.question.id, output=path, stdout=StringIO())
+        with open(path, 'a') as stream:
+            stream.write('{{"type": "vote", "id": 90, "choice": {}, "user": "user0"}}\n'.format(self.second.id))
+            stream.write('{{"type": "vote", "id": 91, "choice": {}, "user": "user4"}}\n'.format(self.second.id))
+            stream.write('{{"type": "vote", "id": 92, "choice": {}, "user": "user4"}}\n'.format(self.first.id))
+        out = StringIO()
+        call_command('import_poll', path, batch_size=2, stdout=out)
+        self.assertIn('replaced 3 earlier votes', out.getvalue())
+        imported = Question.objects.exclude(pk=self.question.pk).get()
+        self.assertEqual([choice.vote_count for choice in imported.choice_set.order_by('id')], [3, 2])
+        votes = Vote.objects.filter(question=imported).values_list('user__username', 'choice__choice_text')
+        self.assertEqual(dict(votes), {'user0': "Second", 'user1': "First", 'user2': "First",
+                                       'user3': "Second", 'user4': "First"})
+
+    def test_invalid_file(self):
+        """A file that does not start with a question is refused and nothing is created."""
+        path = os.path.join(self.directory, 'poll.jsonl')
+        with open(path, 'w') as stream:
+            stream.write('{"type": "choice", "id": 1, "text": "Orphan"}\n')
+        with self.assertRaises(CommandError):
+            call_command('import_poll', path, stdout=StringIO())
+        self.assertEqual(Choice.objects.count(), 2)
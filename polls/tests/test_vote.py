@@ -0,0 +1,182 @@
+"""This script is use to test the logic of KU Polls web application.
+
+Test about vote system and vote tally for website.
+"""
+import datetime
+import threading
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from polls.models import Vote
+from polls.objectcache import PollCache, get_poll_cache
+from .test_detail import create_user
+from .test_question_model import create_poll, create_question
+
+
+class VoteTallyTests(TestCase):
+    """Test the vote tally of each choice is kept in step with the votes."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user('test', 'test@gmail.com', 'testPassword')
+        cls.question, (cls.first, cls.second) = create_poll("Tally question.", datetime.timedelta(days=-1))
+
+    def vote(self, choice):
+        self.client.login(username='test', password='testPassword')
+        return self.client.post(reverse('polls:vote', args=(self.question.id,)), {'choice': choice.id})
+
+    def test_vote_increase_tally(self):
+        """A new vote add one to the tally of the selected choice."""
+        response = self.vote(self.first)
+        self.assertRedirects(response, reverse('polls:results', args=(self.question.id,)))
+        self.first.refresh_from_db()
+        self.assertEqual(self.first.vote_count, 1)
+
+    def test_switch_vote_move_tally(self):
+        """Voting again move the vote from the old choice to the new choice."""
+        self.vote(self.first)
+        self.vote(self.second)
+        self.first.refresh_from_db()
+        self.second.refresh_from_db()
+        self.assertEqual((self.first.vote_count, self.second.vote_count), (0, 1))
+        self.assertEqual(Vote.objects.filter(user=self.user).count(), 1)
+
+    def test_vote_on_two_questions(self):
+        """The user can vote on more than one question."""
+        other = create_question(question_text="Other question.", date_time=datetime.timedelta(days=-1))
+        other_choice = other.choice_set.create(choice_text="Other")
+        self.vote(self.first)
+        self.client.post(reverse('polls:vote', args=(other.id,)), {'choice': other_choice.id})
+        self.vote(self.second)
+        self.assertEqual(Vote.objects.filter(user=self.user).count(), 2)
+        other_choice.refresh_from_db()
+        self.assertEqual(other_choice.vote_count, 1)
+
+    def test_delete_vote_decrease_tally(self):
+        """Deleting a vote remove it from the tally."""
+        self.vote(self.first)
+        Vote.objects.filter(user=self.user).delete()
+        self.first.refresh_from_db()
+        self.assertEqual(self.first.vote_count, 0)
+
+    def test_results_show_tally(self):
+        """The result page display the tally of each choice."""
+        self.vote(self.second)
+        response = self.client.get(reverse('polls:results', args=(self.question.id,)))
+        self.assertEqual([(c.choice_text, c.vote_count) for c in response.context['choice_list']],
+                         [("First", 0), ("Second", 1)])
+
+    def test_reconcile_votes(self):
+        """The reconcile command rebuild the tally that drift from the vote rows."""
+        Vote.objects.create(question=self.question, user=self.user, choice=self.second)
+        self.first.vote_count = 7
+        self.first.save()
+        out = StringIO()
+        call_command('reconcile_votes', stdout=out)
+        self.first.refresh_from_db()
+        self.second.refresh_from_db()
+        self.assertEqual((self.first.vote_count, self.second.vote_count), (0, 1))
+        self.assertIn('2 choice(s) reconciled', out.getvalue())
+
+
+@override_settings(POLLS_OBJECT_CACHE_SIZE=1000)
+class PollCacheTests(TestCase):
+    """Test the vote read the question and its choices from the poll cache."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user('test', 'test@gmail.com', 'testPassword')
+        cls.question, [cls.choice] = create_poll("Cached poll.", datetime.timedelta(days=-1), ["First"])
+        cls.url = reverse('polls:vote', args=(cls.question.id,))
+
+    def setUp(self) -> None:
+        cache.clear()
+        # The rollback of the last test does not send the signals that expire its polls.
+        get_poll_cache().clear()
+        self.client.force_login(self.user)
+
+    def test_vote_does_not_read_poll(self):
+        """After the first vote the question and the choices are not read again."""
+        self.client.post(self.url, {'choice': self.choice.id})
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(self.url, {'choice': self.choice.id})
+        self.assertRedirects(response, reverse('polls:results', args=(self.question.id,)),
+                             fetch_redirect_response=False)
+        reads = [query['sql'] for query in queries if query['sql'].startswith('SELECT')]
+        tables = [sql.split('WHERE')[0] for sql in reads]
+        self.assertFalse([sql for sql in tables if 'polls_question' in sql or 'polls_choice' in sql], reads)
+
+    def test_changed_choice_expire_poll(self):
+        """A new choice can be voted at once and a deleted choice cannot."""
+        self.client.post(self.url, {'choice': self.choice.id})
+        other = self.question.choice_set.create(choice_text="Second")
+        self.client.post(self.url, {'choice': other.id})
+        self.assertEqual(Vote.objects.get(user=self.user).choice_id, other.id)
+        deleted = self.choice.id
+        self.choice.delete()
+        response = self.client.post(self.url, {'choice': deleted})
+        self.assertContains(response, "You didn&#x27;t select a choice.")
+
+    def test_shared_tier(self):
+        """A poll changed in one process is read again by the other process."""
+        first, second = PollCache(alias='default'), PollCache(alias='default')
+        first.get(self.question.id)
+        with self.assertNumQueries(0):
+            self.assertIn(self.choice.id, second.get(self.question.id).choices)
+            second.get(self.question.id)
+        first.invalidate([self.question.id])
+        with self.assertNumQueries(2):
+            second.get(self.question.id)
+        self.assertEqual(second.counts, {'local': 1, 'shared': 1, 'miss': 1})
+        self.assertIn('polls_object_cache_hit_ratio 0.666', second.render())
+
+    def test_unknown_question(self):
+        """The vote of a question that does not exist is not found."""
+        response = self.client.post(reverse('polls:vote', args=(999,)), {'choice': self.choice.id})
+        self.assertEqual(response.status_code, 404)
+
+
+class ConcurrentVoteTests(TransactionTestCase):
+    """Test that parallel votes of the same user end up as one vote."""
+
+    def setUp(self) -> None:
+        if connection.vendor == 'sqlite' and connection.is_in_memory_db():
+            # The threads of an in-memory database share one cache that lock whole tables.
+            self.skipTest('Parallel votes need a database file or a database server.')
+
+    def test_parallel_votes(self):
+        """Many threads voting for the same users keep one vote per user and a correct tally."""
+        question = create_question(question_text="Busy question.", date_time=datetime.timedelta(days=-1))
+        choices = [question.choice_set.create(choice_text=str(number)) for number in range(3)]
+        users = [create_user('user{}'.format(number), '', 'testPassword') for number in range(4)]
+        barrier = threading.Barrier(12)
+        errors = []
+
+        def worker(index):
+            try:
+                barrier.wait()
+                for round_number in range(5):
+                    user = users[(index + round_number) % len(users)]
+                    Vote.objects.cast(user, question, choices[(index * round_number) % len(choices)])
+            except Exception as error:  # pragma: no cover - reported by the assertion below
+                errors.append(error)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker, args=(index,)) for index in range(12)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(Vote.objects.filter(question=question).count(), len(users))
+        for choice in choices:
+            choice.refresh_from_db()
+            self.assertEqual(choice.vote_count, Vote.objects.filter(choice=choice).count())
@@ -0,0 +1,161 @@
+"""This script is use to limit the rate of the expensive requests of the KU Polls web application.
+
+A limited request take one token from the bucket of its client address and, when it
+name one, from the bucket of its user. A full bucket hold `capacity` tokens and it is
+filled again at `capacity` tokens per `period` seconds, so a client can send a short
+burst but not more than the rate on average. A request that find an empty bucket is
+answered 429 before the password is hashed or the database is touched.
+
+The rates are `POLLS_RATE_LIMITS` and the buckets are kept by `POLLS_RATE_LIMITER`:
+`LocalLimiter` keep them in the memory of the process and `CacheLimiter` in the cache
+of the polls app, shared by every process that use the same cache.
+"""
+import collections
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.http import HttpResponse
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+RATE_UNITS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+
+def parse_rate(rate):
+    """Return the capacity and the period in seconds of a rate like '10/m'.
+
+    Args:
+        rate: number of requests, a slash and a unit of s, m, h or d, or an empty value.
+
+    Returns: tuple of the capacity and the period, or None if the rate is empty.
+    """
+    if not rate:
+        return None
+    count, unit = rate.split('/')
+    return int(count), RATE_UNITS[unit[0]]
+
+
+def take_token(state, capacity, period, now):
+    """Refill the bucket for the time since its last use and take one token from it.
+
+    Args:
+        state: tuple of the tokens and the time of the last use, None for a new bucket.
+        capacity: the number of tokens of a full bucket.
+        period: the seconds to fill the empty bucket.
+        now: the current time in seconds.
+
+    Returns: tuple of the new state and the seconds to wait, 0 when the token was taken.
+    """
+    tokens, last = state if state is not None else (capacity, now)
+    tokens = min(capacity, tokens + (now - last) * capacity / period)
+    if tokens >= 1:
+        return (tokens - 1, now), 0
+    return (tokens, now), (1 - tokens) * period / capacity
+
+
+class LocalLimiter:
+    """Buckets in the memory of the process, the limit is per process.
+
+    Another limiter can be configured with `POLLS_RATE_LIMITER`, it need the method
+    `take` of this class.
+    """
+
+    def __init__(self, max_keys=100000):
+        """Create the limiter.
+
+        Args:
+            max_keys: the number of buckets kept, the least recently used are forgotten.
+        """
+        self.max_keys = max_keys
+        self._buckets = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key, capacity, period):
+        """Take a token from the bucket of the key and return the seconds to wait, 0 if allowed."""
+        with self._lock:
+            state, wait = take_token(self._buckets.pop(key, None), capacity, period, time.monotonic())
+            self._buckets[key] = state
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        return wait
+
+
+class CacheLimiter:
+    """Buckets in the cache of the polls app, the limit is shared by the processes.
+
+    The bucket is read and written back without a lock, so requests of the same client
+    that arrive at the same moment on different processes can get a few more tokens.
+    A bucket expire from the cache when it would be full again.
+    """
+
+    def __init__(self, alias=None):
+        """Create the limiter.
+
+        Args:
+            alias: the cache that keep the buckets, `POLLS_CACHE_ALIAS` if not given.
+        """
+        self.cache = caches[alias or settings.POLLS_CACHE_ALIAS]
+
+    def take(self, key, capacity, period):
+        """Take a token from the bucket of the key and return the seconds to wait, 0 if allowed."""
+        key = 'polls:throttle:' + key
+        state, wait = take_token(self.cache.get(key), capacity, period, time.time())
+        self.cache.set(key, state, int(period) + 1)
+        return wait
+
+
+def throttle(request, scope, username=None):
+    """Take a token of the scope for the client address and the user of the request.
+
+    Args:
+        request: the request to limit.
+        scope: the name of the limited action, 'login', 'register' or 'vote'.
+        username: the user that the request act for, the logged in user if not given.
+
+    Returns: a 429 response with a Retry-After header when a bucket is empty, else None.
+    """
+    if username is None and request.user.is_authenticated:
+        username = request.user.get_username()
+    keys = [('ip', request.META.get('REMOTE_ADDR', '')), ('user', (username or '').lower())]
+    limiter = get_limiter()
+    for kind, value in keys:
+        rate = parse_rate(settings.POLLS_RATE_LIMITS.get('{}.{}'.format(scope, kind)))
+        if rate is None or not value:
+            continue
+        wait = limiter.take('{}:{}:{}'.format(scope, kind, value), *rate)
+        if wait:
+            logger.warning('Throttle: Too many %s requests for %s %s', scope, kind, value,
+                           extra={'event': 'throttle'})
+            response = HttpResponse('Too many requests, please try again later.\n', status=429,
+                                    content_type='text/plain')
+            response['Retry-After'] = str(int(wait) + 1)
+            return response
+    return None
+
+
+_limiter = None
+_limiter_lock = threading.Lock()
+
+
+def get_limiter():
+    """Return the rate limiter, created from the settings on first use."""
+    global _limiter
+    with _limiter_lock:
+        if _limiter is None:
+            _limiter = import_string(settings.POLLS_RATE_LIMITER)()
+        return _limiter
+
+
+@receiver(setting_changed)
+def reset_limiter(setting, **kwargs):
+    """Forget the rate limiter and its buckets when its settings are changed, for example in the tests."""
+    global _limiter
+    if setting.startswith('POLLS_RATE'):
+        with _limiter_lock:
+            _limiter = None
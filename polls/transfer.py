@@ -0,0 +1,195 @@
+"""This script is use to export and import the polls of the KU Polls web application.
+
+A poll is written as one record per row: the question first, then its choices, then
+its votes. The users of the votes are written by username, because the ids are not
+the same in another database. Both directions read the rows in chunks and write them
+in batches, so the memory used does not grow with the number of votes.
+"""
+import csv
+import json
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.utils.dateparse import parse_datetime
+
+from .models import ArchivedResult, Choice, Question, Vote
+
+FORMATS = ('csv', 'jsonl')
+CSV_FIELDS = ('type', 'id', 'text', 'pub_date', 'end_date', 'choice', 'user')
+
+
+class TransferError(Exception):
+    """Raised when an imported file is not a valid poll."""
+
+
+def guess_format(path, default='jsonl'):
+    """Return the format of the file from its extension."""
+    for fmt in FORMATS:
+        if str(path).endswith('.' + fmt):
+            return fmt
+    return default
+
+
+def export_records(question, chunk_size=2000):
+    """Yield the records of the question, its choices and its votes.
+
+    The votes of an archived question are read from the ballots of its archived result,
+    they are numbered in the order of the users because their rows were deleted.
+
+    Args:
+        question: the question to export.
+        chunk_size: number of rows read from the database at once.
+
+    Returns: generator of dictionaries with the `type` of the record.
+    """
+    yield {'type': 'question', 'id': question.id, 'text': question.question_text,
+           'pub_date': question.pub_date.isoformat(), 'end_date': question.end_date.isoformat()}
+    choice_ids = set()
+    for choice_id, text in (Choice.objects.filter(question=question).order_by('id')
+                            .values_list('id', 'choice_text').iterator(chunk_size=chunk_size)):
+        choice_ids.add(choice_id)
+        yield {'type': 'choice', 'id': choice_id, 'text': text}
+    if question.archived:
+        yield from _export_ballots(question, choice_ids, chunk_size)
+        return
+    for vote_id, choice_id, username in (Vote.objects.filter(question=question).order_by('id')
+                                         .values_list('id', 'choice_id', 'user__username')
+                                         .iterator(chunk_size=chunk_size)):
+        yield {'type': 'vote', 'id': vote_id, 'choice': choice_id, 'user': username}
+
+
+def _export_ballots(question, choice_ids, chunk_size):
+    # polls/archive.py import this module to write its files.
+    from .archive import unpack_ballots
+
+    result = ArchivedResult.objects.filter(question_id=question.pk).first()
+    if result is None:
+        return
+    users, positions = unpack_ballots(result.ballots)
+    totals = [choice_id for choice_id, _ in result.totals]
+    for start in range(0, len(users), chunk_size):
+        chunk = users[start:start + chunk_size]
+        usernames = dict(User.objects.filter(pk__in=chunk).values_list('pk', 'username'))
+        # The votes of the users and the choices deleted since the archive are dropped, like in a restore.
+        for number, (user_id, position) in enumerate(zip(chunk, positions[start:start + chunk_size]), start + 1):
+            if user_id in usernames and totals[position] in choice_ids:
+                yield {'type': 'vote', 'id': number, 'choice': totals[position], 'user': usernames[user_id]}
+
+
+def write_records(records, stream, fmt):
+    """Write the records to the text stream in the format and return how many were written."""
+    count = 0
+    if fmt == 'csv':
+        writer = csv.DictWriter(stream, CSV_FIELDS)
+        writer.writeheader()
+        for record in records:
+            writer.writerow(record)
+            count += 1
+    else:
+        for record in records:
+            stream.write(json.dumps(record) + '\n')
+            count += 1
+    return count
+
+
+def read_records(stream, fmt):
+    """Yield the records of the text stream in the format, with the same types as `export_records`."""
+    if fmt == 'jsonl':
+        for line in stream:
+            if line.strip():
+                yield json.loads(line)
+        return
+    for row in csv.DictReader(stream):
+        record = {key: value for key, value in row.items() if value != ''}
+        if 'choice' in record:
+            record['choice'] = int(record['choice'])
+        record['id'] = int(record['id'])
+        yield record
+
+
+def import_records(records, batch_size=2000, create_users=False):
+    """Create a new question from the records, with its choices and its votes.
+
+    The votes are inserted in batches with `bulk_create` and the tally of the choices
+    is set at the end, everything in one transaction. A user has one vote per question,
+    so when the file has several votes of a user the last one is kept.
+
+    Args:
+        records: iterable of records like the ones of `export_records`.
+        batch_size: number of votes inserted at once.
+        create_users: create the users that do not exist, else their votes are skipped.
+
+    Returns: dictionary with the new `question` and the number of `choices`, `votes`, `skipped` votes
+        of unknown users and `replaced` votes of users that vote again later in the file.
+
+    Raises:
+        TransferError: if the records do not start with a question or a vote use an unknown choice.
+    """
+    records = iter(records)
+    first = next(records, None)
+    if first is None or first.get('type') != 'question':
+        raise TransferError('The file does not start with a question.')
+    result = {'choices': 0, 'votes': 0, 'skipped': 0, 'replaced': 0}
+    with transaction.atomic():
+        question = Question.objects.create(question_text=first['text'], pub_date=parse_datetime(first['pub_date']),
+                                           end_date=parse_datetime(first['end_date']))
+        result['question'] = question
+        choices = {}
+        tally = {}
+        batch = []
+        for record in records:
+            if record['type'] == 'choice':
+                choices[record['id']] = Choice.objects.create(question=question, choice_text=record['text']).id
+                result['choices'] += 1
+            elif record['type'] == 'vote':
+                batch.append(record)
+                if len(batch) >= batch_size:
+                    _import_votes(question, batch, choices, tally, create_users, result)
+                    batch = []
+            else:
+                raise TransferError('Unknown record type {!r}.'.format(record['type']))
+        _import_votes(question, batch, choices, tally, create_users, result)
+        Choice.objects.bulk_update([Choice(id=choice_id, vote_count=count) for choice_id, count in tally.items()],
+                                   ['vote_count'], batch_size=batch_size)
+    return result
+
+
+def _import_votes(question, batch, choices, tally, create_users, result):
+    usernames = {record['user'] for record in batch if record.get('user')}
+    users = dict(User.objects.filter(username__in=usernames).values_list('username', 'id'))
+    if create_users and len(users) < len(usernames):
+        # The created users cannot log in until their password is set.
+        password = make_password(None)
+        User.objects.bulk_create([User(username=username, password=password) for username in usernames - set(users)])
+        users = dict(User.objects.filter(username__in=usernames).values_list('username', 'id'))
+    latest = {}
+    for record in batch:
+        user_id = users.get(record.get('user'))
+        if user_id is None:
+            result['skipped'] += 1
+            continue
+        choice_id = None
+        if record.get('choice') is not None:
+            try:
+                choice_id = choices[record['choice']]
+            except KeyError:
+                raise TransferError('Vote {} use an unknown choice.'.format(record['id']))
+        if user_id in latest:
+            result['replaced'] += 1
+        latest[user_id] = choice_id
+    # The users that already voted in an earlier batch get their vote changed.
+    replaced = []
+    for vote in Vote.objects.filter(question=question, user_id__in=latest).only('id', 'user_id', 'choice_id'):
+        if vote.choice_id is not None:
+            tally[vote.choice_id] -= 1
+        vote.choice_id = latest.pop(vote.user_id)
+        replaced.append(vote)
+    Vote.objects.bulk_update(replaced, ['choice'])
+    result['replaced'] += len(replaced)
+    for choice_id in [vote.choice_id for vote in replaced] + list(latest.values()):
+        if choice_id is not None:
+            tally[choice_id] = tally.get(choice_id, 0) + 1
+    Vote.objects.bulk_create([Vote(question=question, user_id=user_id, choice_id=choice_id)
+                              for user_id, choice_id in latest.items()])
+    result['votes'] += len(latest)
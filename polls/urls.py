@@ -13,6 +13,8 @@ urlpatterns = [
     path('', views.IndexView.as_view(), name='index'),
     path('<int:pk>/', login_required(views.DetailView.as_view(), login_url='polls:login'), name='detail'),
     path('<int:pk>/results/', views.ResultsView.as_view(), name='results'),
+    path('<int:pk>/results.json', views.ResultsJsonView.as_view(), name='results_json'),
+    path('<int:pk>/results/live/', views.live_results, name='results_live'),
     path('<int:question_id>/vote/', login_required(views.vote, login_url='polls:login'), name='vote'),
 
     path('login/', views.login_page, name='login'),
@@ -3,31 +3,67 @@
 Author: Vichisorn Wejsupakul
 Date: 10/9/2020
 """
+import hashlib
 import logging
 
+from django.conf import settings
 from django.contrib import messages
 from django.contrib.auth import authenticate, login, logout
-from django.http import HttpResponseRedirect
+from django.db.models import OuterRef, Subquery
+from django.http import (Http404, HttpResponse, HttpResponseForbidden, HttpResponseRedirect, JsonResponse,
+                         StreamingHttpResponse)
 from django.shortcuts import get_object_or_404, render, redirect
 from django.urls import reverse
 from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.functional import SimpleLazyObject
+from django.utils.http import http_date, quote_etag
 from django.views import generic
 
+from .archive import archived_choice
+from .caching import index_cache_state, results_version
 from .forms import CreateUserForm
+from .ingest import get_vote_queue, has_pending_vote, pending_choice, remember_pending_vote, show_pending_vote
+from .live import EVENT_STREAM, get_broker, snapshot_events
+from .metrics import CONTENT_TYPE, registry
 from .models import Choice, Question, Vote
+from .objectcache import get_poll, get_poll_cache
+from .pagination import after_cursor, before_cursor, keyset_page, offset_page
+from .throttle import throttle
 
+# The handlers are configured by LOGGING in the settings, see polls/log.py.
 logger = logging.getLogger(__name__)
-logger.setLevel(logging.INFO)
 
-formatter = logging.Formatter('%(asctime)s: %(name)s:%(message)s')
 
-file_handler = logging.FileHandler('views.log')
-file_handler.setFormatter(formatter)
+def conditional_get(request, etag, last_modified, render, private=False):
+    """Return 304 when the copy of the client is still current, else the rendered page.
 
-stream_handler = logging.StreamHandler()
+    The validators are computed before the page, so a client that refresh a page that
+    did not change cost no rendering. The browsers must ask again on every use.
 
-logger.addHandler(file_handler)
-logger.addHandler(stream_handler)
+    Args:
+        request: the GET or HEAD request.
+        etag: the unquoted entity tag of the page, or None.
+        last_modified: the datetime of the last change of the page, or None.
+        render: callable without argument that return the page.
+        private: True if the page is different for each user.
+
+    Returns: the response with the ETag, Last-Modified and Cache-Control headers.
+    """
+    etag = quote_etag(etag) if etag else None
+    timestamp = int(last_modified.timestamp()) if last_modified else None
+    response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+    if response is None:
+        response = render()
+    if etag:
+        response.headers.setdefault('ETag', etag)
+    if timestamp is not None:
+        response.headers.setdefault('Last-Modified', http_date(timestamp))
+    if private:
+        patch_cache_control(response, no_cache=True, private=True)
+    else:
+        patch_cache_control(response, no_cache=True)
+    return response
 
 
 def login_page(request):
@@ -36,20 +72,21 @@ def login_page(request):
     if request.method == 'POST':
         username = request.POST.get('username')
         password = request.POST.get('password')
+        limited = throttle(request, 'login', username=username)
+        if limited is not None:
+            return limited
 
         user = authenticate(request, username=username, password=password)
 
         if user is not None:
             login(request, user)
-            logger.info(
-                'Login: This {} logged in at {}'.format(request.user.username,
-                                                        request.META.get('REMOTE_ADDR')))
+            logger.info('Login: This %s logged in at %s', request.user.username,
+                        request.META.get('REMOTE_ADDR'), extra={'event': 'login'})
             return redirect('polls:index')
         else:
             messages.info(request, 'Username or Password is incorrect')
-            logger.warning('Login: Unsuccessful login attempt by {} at {}'.format(request.POST['username'],
-                                                                                  request.META.get(
-                                                                                      'REMOTE_ADDR')))
+            logger.warning('Login: Unsuccessful login attempt by %s at %s', request.POST['username'],
+                           request.META.get('REMOTE_ADDR'), extra={'event': 'login'})
 
     context = {}
     return render(request, 'polls/login.html', context)
@@ -59,13 +96,16 @@ def register_page(request):
     form = CreateUserForm()
 
     if request.method == 'POST':
+        limited = throttle(request, 'register', username=request.POST.get('username'))
+        if limited is not None:
+            return limited
         form = CreateUserForm(request.POST)
         if form.is_valid():
             form.save()
             user = form.cleaned_data.get('username')
             messages.success(request, "Account was created for " + user)
-            logger.info('Register: This {} has created user name {}'.format(request.META.get("REMOTE_ADDR"),
-                                                                            request.user.username))
+            logger.info('Register: This %s has created user name %s', request.META.get("REMOTE_ADDR"),
+                        user, extra={'event': 'register'})
 
             return redirect('polls:login')
 
@@ -74,8 +114,8 @@ def register_page(request):
 
 
 def logout_user(request):
-    logger.info(
-        'Logout: This {} has logged out at {}'.format(request.user.username, request.META.get("REMOTE_ADDR")))
+    logger.info('Logout: This %s has logged out at %s', request.user.username,
+                request.META.get("REMOTE_ADDR"), extra={'event': 'logout'})
     logout(request)
     return redirect('polls:login')
 
@@ -91,9 +131,88 @@ class IndexView(generic.ListView):
     def get_queryset(self):
         """Return all published questions (not including those set to be published in the future).
 
-        Returns: all published questions.
+        The `status` parameter keep only the questions that are `open`, `closed` or `recent`.
+
+        Returns: all published questions with their state annotated.
+        """
+        now = timezone.now()
+        questions = Question.objects.with_status(now)
+        if self.request.GET.get('after'):
+            questions = after_cursor(questions, self.request.GET['after'])
+        elif self.request.GET.get('before'):
+            questions = before_cursor(questions, self.request.GET['before'])
+        questions = questions.published(now)
+        status = self.request.GET.get('status')
+        if status == 'open':
+            questions = questions.open_now(now)
+        elif status == 'closed':
+            questions = questions.closed(now)
+        elif status == 'recent':
+            questions = questions.recent(now)
+        return questions.order_by('-pub_date', '-id')
+
+    def get_page(self):
+        """Return the requested page of questions.
+
+        A request with the `after` parameter continue after the keyset cursor of the previous
+        page and a request with the `before` parameter go back before the cursor of the next
+        page, a request with the `page` parameter use the page number.
+
+        Returns: the page of questions.
         """
-        return Question.objects.filter(pub_date__lte=timezone.now()).order_by('-pub_date')
+        size = settings.POLLS_INDEX_PAGE_SIZE
+        status = self.request.GET.get('status')
+        base_params = {'status': status} if status else {}
+        after = self.request.GET.get('after')
+        before = None if after else self.request.GET.get('before')
+        page = self.request.GET.get('page')
+        if after or before or (page is None and settings.POLLS_INDEX_PAGINATION == 'keyset'):
+            return keyset_page(self.object_list, size, after, base_params, before=before)
+        return offset_page(self.object_list, page or 1, size, base_params)
+
+    def get(self, request, *args, **kwargs):
+        """Return the index page, or 304 when the client already have it."""
+        self.object_list = self.get_queryset()
+        return self.respond()
+
+    def respond(self):
+        """Return the page of `self.object_list` with its entity tag."""
+        return conditional_get(self.request, self.get_etag(), None,
+                               lambda: self.render_to_response(self.get_context_data()), private=True)
+
+    def get_etag(self):
+        """Return the entity tag of the page, from the index cache token, the user and the query.
+
+        A timestamp cannot see a deleted question or a login, so the page has no
+        Last-Modified. A page with messages to show is not validated.
+
+        Returns: the entity tag, or None.
+        """
+        if len(messages.get_messages(self.request)):
+            return None
+        key = '{}:{}:{}'.format(index_cache_state()['token'], self.request.user.pk or 'anonymous',
+                                self.request.GET.urlencode())
+        return 'index-' + hashlib.md5(key.encode()).hexdigest()
+
+    def get_context_data(self, **kwargs):
+        """Add the page of questions and the state of the index cache to the context.
+
+        The page is only read when the cached fragment is missing.
+
+        Returns: the context for the index page.
+        """
+        context = super().get_context_data(**kwargs)
+        page = SimpleLazyObject(self.get_page)
+        context['page_obj'] = page
+        context[self.context_object_name] = SimpleLazyObject(lambda: page.object_list)
+        context['status'] = self.request.GET.get('status', '')
+        context['index_cache'] = index_cache_state()
+        context['index_cache']['alias'] = settings.POLLS_CACHE_ALIAS
+        context['index_cache']['variant'] = self.request.user.pk or 'anonymous'
+        context['index_cache']['page'] = '{}:{}:{}:{}'.format(context['status'], self.request.GET.get('page', ''),
+                                                              self.request.GET.get('after', ''),
+                                                              self.request.GET.get('before', ''))
+        return context
 
 
 class DetailView(generic.DetailView):
@@ -104,9 +223,42 @@ class DetailView(generic.DetailView):
     def get_queryset(self):
         """Excludes any questions that aren't published yet.
 
+        The question, the archived result and the choice of the vote of the user are
+        read with one query and the choices with a second one, no matter how many
+        choices the question has.
+
         Returns: the filter for the question that aren't published yet.
         """
-        return Question.objects.filter(pub_date__lte=timezone.now())
+        queryset = Question.objects.published().select_related('archive').prefetch_related('choice_set')
+        if self.request.user.is_authenticated:
+            votes = Vote.objects.filter(question=OuterRef('pk'), user=self.request.user.pk)
+            queryset = queryset.annotate(user_choice=Subquery(votes.values('choice_id')[:1]))
+        return queryset
+
+    def get_context_data(self, **kwargs):
+        """Add the id of the choice that the user already vote to the context."""
+        context = super().get_context_data(**kwargs)
+        context['user_choice'] = current_choice(self.request, self.object)
+        return context
+
+
+def current_choice(request, question):
+    """Return the id of the choice of the user for the question, or None if the user did not vote.
+
+    Args:
+        request: the request of the user.
+        question: a question from `DetailView.get_queryset()`.
+
+    Returns: the queued vote of the user, else its archived or saved vote.
+    """
+    if not request.user.is_authenticated:
+        return None
+    choice_id = pending_choice(request, question)
+    if choice_id is not None:
+        return choice_id
+    if question.archived:
+        return archived_choice(question.archive, request.user.id)
+    return question.user_choice
 
 
 class ResultsView(generic.DetailView):
@@ -114,6 +266,149 @@ class ResultsView(generic.DetailView):
     model = Question
     template_name = 'polls/results.html'
 
+    def get_queryset(self):
+        """Load the question together with its archived result.
+
+        Returns: the question queryset with its state.
+        """
+        return Question.objects.with_status().select_related('archive').defer('archive__ballots')
+
+    def get(self, request, *args, **kwargs):
+        """Return the result page, or 304 when the client already have it."""
+        self.object = self.get_object()
+        return self.respond()
+
+    def respond(self):
+        """Return the page of `self.object` with its validators."""
+        etag, last_modified = self.get_validators()
+        return conditional_get(self.request, etag, last_modified,
+                               lambda: self.render_to_response(self.get_context_data(object=self.object)))
+
+    def get_validators(self):
+        """Return the entity tag and the last change time of the page, from the question row only.
+
+        The page change when the question or a choice is changed, when the tally
+        change and when the voting open or close. A page that count a queued vote of
+        the user is not validated.
+
+        Returns: tuple of the entity tag and the datetime of the last change, or (None, None).
+        """
+        question = self.object
+        if has_pending_vote(self.request, question):
+            return None, None
+        now = timezone.now()
+        changes = [question.modified, question.last_vote_at]
+        changes += [date for date in (question.pub_date, question.end_date) if date <= now]
+        key = '{}:{}:{}:{}:{}'.format(type(self).__name__, question.pk, question.modified.isoformat(),
+                                      question.last_vote_at.isoformat() if question.last_vote_at else '',
+                                      question.voting_open)
+        return 'results-' + hashlib.md5(key.encode()).hexdigest(), max(date for date in changes if date)
+
+    def get_choices(self):
+        """Return the choices of the question with their vote tally.
+
+        The tally is kept in the choice row, so the whole result is read with one
+        query for the question and its archived result and one query for the choices.
+        The tally of an archived question is read from its frozen result. A vote of
+        the user that is still in the vote queue is counted too.
+
+        Returns: the list of choices in id order.
+        """
+        choices = list(Choice.objects.filter(question=self.object).order_by('id'))
+        if self.object.archived:
+            tally = self.object.archive.tally()
+            for choice in choices:
+                choice.vote_count = tally.get(choice.id, 0)
+        show_pending_vote(self.request, self.object, choices)
+        return choices
+
+    def get_context_data(self, **kwargs):
+        """Add the choices of the question and the state of the result table cache to the context.
+
+        The choices are only read when the cached table is missing. The table with a
+        queued vote of the user is not cached.
+
+        Returns: the context for the result page.
+        """
+        context = super().get_context_data(**kwargs)
+        context['choice_list'] = SimpleLazyObject(self.get_choices)
+        # Only the async views keep the live stream open, see `live_results`.
+        context['live_results'] = settings.POLLS_ASYNC_VIEWS
+        version = None if has_pending_vote(self.request, self.object) else results_version(self.object)
+        if version is not None:
+            context['results_cache'] = {'alias': settings.POLLS_CACHE_ALIAS,
+                                        'timeout': settings.POLLS_RESULTS_CACHE_TIMEOUT, 'version': version}
+        return context
+
+
+class ResultsJsonView(ResultsView):
+    """Class that return the result of the polls as JSON for the dashboards."""
+
+    def render_to_response(self, context, **response_kwargs):
+        """Return the vote count and the percentage of each choice.
+
+        Returns: the JSON response of the result.
+        """
+        question = context['question']
+        total = sum(choice.vote_count for choice in context['choice_list'])
+        data = {
+            'id': question.id,
+            'question_text': question.question_text,
+            'total_votes': total,
+            'choices': [
+                {
+                    'id': choice.id,
+                    'choice_text': choice.choice_text,
+                    'votes': choice.vote_count,
+                    'percentage': round(100 * choice.vote_count / total, 2) if total else 0.0,
+                }
+                for choice in context['choice_list']
+            ],
+        }
+        return JsonResponse(data, **response_kwargs)
+
+
+def event_stream_response(events):
+    """Return a streaming response of server-sent events that no proxy buffer or cache."""
+    response = StreamingHttpResponse(events, content_type=EVENT_STREAM)
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+def live_results(request, pk: int):
+    """Send the tally of the question as one `snapshot` server-sent event and close.
+
+    An open stream would hold a thread of the WSGI worker until
+    `POLLS_LIVE_MAX_DURATION`, so the sync view answer at once and the `retry` line
+    make an EventSource ask again, like a poll. The async view keep the stream open.
+
+    Args:
+        request: A HttpRequest object, which contains data about the request.
+        pk: the id of the question.
+
+    Returns: the snapshot event.
+    """
+    get_object_or_404(Question, pk=pk)
+    response = HttpResponse(snapshot_events(get_broker(), pk), content_type=EVENT_STREAM)
+    response['Cache-Control'] = 'no-cache'
+    return response
+
+
+def record_vote(request, question, choice):
+    """Save the vote of the user, or put it in the vote queue in the queue ingestion mode.
+
+    Args:
+        request: A HttpRequest object of the user that vote.
+        question: the question that the user vote.
+        choice: the choice that the user select.
+    """
+    if settings.POLLS_VOTE_INGESTION == 'queue':
+        get_vote_queue().enqueue(request.user.id, question.id, choice.id)
+        remember_pending_vote(request, question.id, choice.id)
+    else:
+        Vote.objects.cast(request.user, question, choice)
+
 
 def vote(request, question_id: int):
     """This function need to handle the vote system and not let the user vote the question that after the end date.
@@ -125,30 +420,48 @@ def vote(request, question_id: int):
     Returns: the vote page that let the user vote a polls that come form the detail page.
 
     """
-    question = get_object_or_404(Question, pk=question_id)
+    limited = throttle(request, 'vote')
+    if limited is not None:
+        return limited
+    try:
+        # The question and its choices are read from the poll cache.
+        poll = get_poll(question_id)
+    except Question.DoesNotExist:
+        raise Http404('No Question matches the given query.')
+    question = poll.question
     if question.can_vote():
         try:
-            select_choice = question.choice_set.get(pk=request.POST['choice'])
-        except (KeyError, Choice.DoesNotExist):
+            select_choice = poll.choices[int(request.POST['choice'])]
+        except (KeyError, ValueError):
             # Redisplay the question voting form
-            logger.exception("{} didn't select a choice.".format(request.user.username))
+            logger.exception("%s didn't select a choice.", request.user.username, extra={'event': 'vote'})
             return render(request, 'polls/detail.html',
                           {'question': question, 'error_message': "You didn't select a choice.", })
         else:
-            check_vote = Vote.objects.filter(question=question_id, user=request.user).exists()
-            if check_vote:
-                get_vote = Vote.objects.get(user=request.user)
-                get_vote.choice_id = select_choice.id
-                get_vote.save()
-            else:
-                get_vote = Vote.objects.create(question=question, user=request.user, choice=select_choice)
-                get_vote.save()
+            record_vote(request, question, select_choice)
             # Always return an HttpResponseRedirect after successfully dealing
             # with POST data. This prevents data from being posted twice if a
             # user hits the Back button.
-            logger.info('Vote: This {} vote at question id:{}'.format(request.user.username, question.id))
+            logger.info('Vote: This %s vote at question id:%s', request.user.username, question.id,
+                        extra={'event': 'vote'})
             return HttpResponseRedirect(reverse('polls:results', args=(question.id,)))
     else:
         messages.error(request, "Polls not published yet or does not exist")
-        logger.error("Vote: This {} tried to access invalid question".format(request.user.username))
+        logger.error("Vote: This %s tried to access invalid question", request.user.username,
+                     extra={'event': 'vote'})
         return redirect('polls:index')
+
+
+def metrics(request):
+    """Show the timing of the polls views in the Prometheus text format.
+
+    Args:
+        request: A HttpRequest object, which contains data about the request.
+
+    Returns: the metrics, or forbidden if the client is not in `POLLS_METRICS_ALLOWED_IPS`.
+    """
+    if request.META.get('REMOTE_ADDR') not in settings.POLLS_METRICS_ALLOWED_IPS:
+        return HttpResponseForbidden()
+    poll_cache = get_poll_cache()
+    text = registry.render() + (poll_cache.render() if poll_cache is not None else '')
+    return HttpResponse(text, content_type=CONTENT_TYPE)